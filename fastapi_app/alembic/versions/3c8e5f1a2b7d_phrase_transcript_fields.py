@@ -0,0 +1,44 @@
+"""phrase_transcript_fields
+
+Revision ID: 3c8e5f1a2b7d
+Revises: 729159f97041
+Create Date: 2026-10-17 12:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3c8e5f1a2b7d'
+down_revision: Union[str, None] = '729159f97041'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('phrase', sa.Column('role', sa.String(length=20),
+                                      nullable=True))
+    op.add_column('phrase', sa.Column('turn_id', sa.Integer(),
+                                      nullable=True))
+    op.add_column('phrase', sa.Column('seq', sa.Integer(), nullable=True))
+    op.add_column('phrase', sa.Column('item_id', sa.String(length=64),
+                                      nullable=True))
+    op.add_column('phrase', sa.Column('spoken_at',
+                                      sa.DateTime(timezone=True),
+                                      nullable=True))
+    op.create_unique_constraint(
+        'phrase_dialog_id_seq_key', 'phrase', ['dialog_id', 'seq'])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_constraint('phrase_dialog_id_seq_key', 'phrase', type_='unique')
+    op.drop_column('phrase', 'spoken_at')
+    op.drop_column('phrase', 'item_id')
+    op.drop_column('phrase', 'seq')
+    op.drop_column('phrase', 'turn_id')
+    op.drop_column('phrase', 'role')
@@ -1,11 +1,12 @@
-import asyncio
-from fastapi import APIRouter
-import uuid
+from fastapi import APIRouter, HTTPException
 
-from app.ari.ari_commands import AriClient, WSHandler
-from app.ari.ari_config import (ARI_HOST, AUTH_HEADER, WEBSOCKET_HOST)
-from app.schemas.ai_agent import CallDB, PhoneCreate
-from app.crud.ai_agent import get_calls_by_phone_digits
+from app.ari.dialer import dialer
+from app.ari.events import ari_events
+from app.ari.nodes import node_registry
+from app.schemas.ai_agent import (CallDB, PhoneCreate, TranscriptBatch,
+                                  TranscriptBatchResult)
+from app.crud.ai_agent import (get_calls_by_phone_digits,
+                               append_transcript_events)
 
 calls_router = APIRouter()
 
@@ -15,14 +16,12 @@ calls_router = APIRouter()
     summary='Позвонить', tags=['Звонок'],
     description="Отправить запрос на вызов номера Нейро Ассистентом.")
 async def make_call(request: PhoneCreate):
-    # Инициализация клиента и WebSocket обработчика
-    call_uuid = str(uuid.uuid4())
-    ari_client = AriClient(ARI_HOST, AUTH_HEADER)
-    ws_handler = WSHandler(WEBSOCKET_HOST, AUTH_HEADER, ari_client,
-                           request.digits, call_uuid)
-
-    # Подключаемся и начинаем слушать события
-    asyncio.create_task(ws_handler.connect())
+    if not ari_events.connected:
+        raise HTTPException(503, 'Нет соединения с ARI')
+    if not node_registry.has_capacity() and not node_registry.queue_timeout:
+        raise HTTPException(503, 'Нет свободных узлов audiosocket')
+    # Звонок идет в фоне, в общих с кампаниями лимитах SIP-транка
+    dialer.place_call(request.digits)
     return 'created'
 
 
@@ -41,6 +40,15 @@ async def make_call(request: PhoneCreate):
 #     return 'created'
 
 
+@calls_router.post(
+    '/transcripts', response_model=TranscriptBatchResult,
+    summary='Сохранить транскрипты звонков', tags=['Звонок'],
+    description="Пачка реплик из журнала транскриптов media_sockets.")
+async def add_transcripts(batch: TranscriptBatch):
+    stored, skipped = await append_transcript_events(batch.events)
+    return TranscriptBatchResult(stored=stored, skipped=skipped)
+
+
 @calls_router.get('/{digits}', response_model=list[CallDB],
                   summary='Получить все звонки по телефону',
                   tags=['Телефон'])
@@ -0,0 +1,104 @@
+import csv
+import io
+from typing import Iterable, Optional
+
+from fastapi import APIRouter, File, Form, HTTPException, UploadFile
+from pydantic import ValidationError
+
+from app.ari.ari_config import CAMPAIGN_MAX_NUMBERS
+from app.ari.dialer import Campaign, dialer
+from app.ari.events import ari_events
+from app.schemas.ai_agent import PhoneCreate
+from app.schemas.campaigns import CampaignCreate, CampaignDB
+
+campaigns_router = APIRouter()
+
+
+def validate_phones(raw_phones: Iterable[str]) -> tuple[list[str], list]:
+    """Номера, прошедшие PhoneCreate (без повторов), и отклоненные."""
+    phones, rejected = {}, []
+    for raw in raw_phones:
+        digits = raw.strip().lstrip('+')
+        if not digits:
+            continue
+        try:
+            phones[PhoneCreate(digits=digits).digits] = None
+        except ValidationError as e:
+            rejected.append({'digits': raw,
+                             'error': e.errors()[0]['msg']})
+    if len(phones) > CAMPAIGN_MAX_NUMBERS:
+        raise HTTPException(
+            422, f'Не больше {CAMPAIGN_MAX_NUMBERS} номеров в кампании')
+    if not phones:
+        raise HTTPException(422, 'Нет ни одного корректного номера')
+    return list(phones), rejected
+
+
+def read_phones_file(content: bytes) -> Iterable[str]:
+    """Номера из файла: по одному в строке или в первой колонке CSV."""
+    text = content.decode('utf-8-sig', errors='replace')
+    dialect = csv.excel
+    try:
+        dialect = csv.Sniffer().sniff(text[:4096], delimiters=',;\t')
+    except csv.Error:
+        pass
+    for row in csv.reader(io.StringIO(text), dialect):
+        # Заголовок и пустые строки пропускаем
+        if row and any(char.isdigit() for char in row[0]):
+            yield row[0]
+
+
+def check_ari_connected() -> None:
+    if not ari_events.connected:
+        raise HTTPException(503, 'Нет соединения с ARI')
+
+
+def get_campaign_or_404(campaign_id: str) -> Campaign:
+    campaign = dialer.campaigns.get(campaign_id)
+    if campaign is None:
+        raise HTTPException(404, 'Кампания не найдена')
+    return campaign
+
+
+@campaigns_router.post(
+    '/', response_model=CampaignDB,
+    summary='Запустить кампанию', tags=['Кампания'],
+    description="Обзвонить список номеров с учетом лимитов SIP-транка.")
+async def create_campaign(request: CampaignCreate):
+    check_ari_connected()
+    phones, rejected = validate_phones(request.phones)
+    return dialer.start_campaign(
+        phones, rejected, request.cps, request.max_concurrent)
+
+
+@campaigns_router.post(
+    '/upload', response_model=CampaignDB,
+    summary='Запустить кампанию из файла', tags=['Кампания'],
+    description="Файл с номерами: по одному в строке или CSV, где номер "
+                "в первой колонке.")
+async def upload_campaign(file: UploadFile = File(...),
+                          cps: Optional[float] = Form(None, gt=0),
+                          max_concurrent: Optional[int] = Form(None, gt=0)):
+    check_ari_connected()
+    phones, rejected = validate_phones(read_phones_file(await file.read()))
+    return dialer.start_campaign(phones, rejected, cps, max_concurrent)
+
+
+@campaigns_router.get('/', response_model=list[CampaignDB],
+                      summary='Все кампании', tags=['Кампания'])
+async def get_campaigns():
+    return list(dialer.campaigns.values())
+
+
+@campaigns_router.get('/{campaign_id}', response_model=CampaignDB,
+                      summary='Прогресс кампании', tags=['Кампания'])
+async def get_campaign(campaign_id: str):
+    return get_campaign_or_404(campaign_id)
+
+
+@campaigns_router.post('/{campaign_id}/cancel', response_model=CampaignDB,
+                       summary='Остановить кампанию', tags=['Кампания'])
+async def cancel_campaign(campaign_id: str):
+    campaign = get_campaign_or_404(campaign_id)
+    dialer.cancel_campaign(campaign)
+    return campaign
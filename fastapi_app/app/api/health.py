@@ -1,8 +1,28 @@
 from fastapi import APIRouter
 
+from app.ari.ari_commands import ari_client
+from app.ari.bridge_pool import bridge_pool
+from app.ari.events import ari_events
+from app.ari.latency import call_setup_latency
+
 health_router = APIRouter()
 
 
 @health_router.get("/health")
 def health():
-    return {"status": "ok"}
\ No newline at end of file
+    return {"status": "ok"}
+
+
+@health_router.get("/health/ari")
+def health_ari():
+    """
+    Состояние связи с ARI, задержки его команд по эндпоинтам и фаз
+    установки звонков, запас бриджей.
+    """
+    return {
+        "events_connected": ari_events.connected,
+        "events": dict(ari_events.stats),
+        "latency": ari_client.latency.as_dict(),
+        "call_setup": call_setup_latency.as_dict(),
+        "bridge_pool": bridge_pool.report(),
+    }
@@ -0,0 +1,19 @@
+from fastapi import APIRouter
+
+from app.ari.nodes import node_registry
+from app.schemas.nodes import NodeReport
+
+nodes_router = APIRouter()
+
+
+@nodes_router.post('/heartbeat', summary='Отчет узла audiosocket',
+                   tags=['Узлы'],
+                   description="Емкость узла: активные звонки и запас CPU.")
+async def node_heartbeat(report: NodeReport):
+    node = await node_registry.heartbeat(report)
+    return node.as_dict()
+
+
+@nodes_router.get('/', summary='Узлы audiosocket', tags=['Узлы'])
+async def get_nodes():
+    return node_registry.report()
@@ -1,12 +1,16 @@
-from typing import Optional
+from typing import Optional, TYPE_CHECKING
 import asyncio
+import time
+from uuid import uuid4
 
 import httpx
-import websockets
-import json
 import logging
 
-from .ari_config import (ARI_HOST, STASIS_APP_NAME, EXTERNAL_HOST, SIP_HOST, ARI_TIMEOUT)
+from .ari_config import (ARI_HOST, STASIS_APP_NAME, EXTERNAL_HOST, SIP_HOST,
+                         ARI_TIMEOUT, AUTH_HEADER, ARI_MAX_CONNECTIONS,
+                         ARI_MAX_KEEPALIVE, ARI_KEEPALIVE_EXPIRY)
+from .events import AriEventDispatcher, RESYNC_EVENT, ari_events
+from .latency import AriLatency, SetupTimings, call_setup_latency
 from app.crud.ai_agent import create_call, append_status_to_call
 from app.schemas.ai_agent import (CallCreate, PhoneCreate, CallStatusDB,
                                   CallStatuses)
@@ -14,36 +18,80 @@ from app.schemas.ai_agent import (CallCreate, PhoneCreate, CallStatusDB,
 logger = logging.getLogger(__name__)
 
 
+class AriError(RuntimeError):
+    """Ошибка, которую вернул ARI."""
+
+    def __init__(self, status_code: int, text: str):
+        super().__init__(f"Ошибка от ARI ({status_code}): {text}")
+        self.status_code = status_code
+
+
 class AriClient:
-    """Клиент для работы с ARI."""
+    """
+    Клиент для работы с ARI.
+
+    Один на процесс (ari_client): httpx-клиент с пулом keep-alive
+    соединений открывается в lifespan приложения и там же закрывается,
+    так что команды звонков не платят за новое TCP-соединение.
+    """
 
     def __init__(self, base_url: str, headers: dict):
         self.base_url = base_url
         self.headers = headers
-        self.client = httpx.AsyncClient(timeout=httpx.Timeout(ARI_TIMEOUT))
-
-    def _normalize_response(self, response) -> dict:
+        self.latency = AriLatency()
+        self._client: Optional[httpx.AsyncClient] = None
+
+    def open(self) -> None:
+        if self._client is not None:
+            return
+        self._client = httpx.AsyncClient(
+            headers=self.headers,
+            timeout=httpx.Timeout(ARI_TIMEOUT),
+            limits=httpx.Limits(
+                max_connections=ARI_MAX_CONNECTIONS,
+                max_keepalive_connections=ARI_MAX_KEEPALIVE,
+                keepalive_expiry=ARI_KEEPALIVE_EXPIRY))
+
+    async def close(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        self.open()
+        return self._client
+
+    def _normalize_response(self, response: httpx.Response) -> dict:
         """Нормализуем ответ от ARI и проверяем статус."""
-        status = response.status_code
-        if not response:
-            return {}
-        if status != 200 and not 204:
-            raise RuntimeError(f"Ошибка от ARI: {response.text}")
-        return response.json() if response.text else {}
+        if response.is_error:
+            raise AriError(response.status_code, response.text)
+        return response.json() if response.content else {}
 
     async def _send_request(self, url: str, method: str, data: Optional[
-            dict] = None) -> dict:
-        """Отправляем асинхронный запрос."""
-        if method.lower() == 'post':
-            response = await self.client.post(
-                url, json=data, headers=self.headers)
-        elif method.lower() == 'delete':
-            response = await self.client.delete(url)
-        else:
+            dict] = None, endpoint: Optional[str] = None) -> dict:
+        """
+        Отправляем асинхронный запрос.
+
+        endpoint — имя команды для гистограммы задержек (без id в пути).
+        """
+        method = method.upper()
+        if method not in ('GET', 'POST', 'DELETE'):
             raise ValueError('Unsupported method')
+        endpoint = f"{method} {endpoint or url}"
+        started = time.perf_counter()
+        ok = False
+        try:
+            response = await self.client.request(
+                method, url, json=data if method == 'POST' else None)
+            ok = not response.is_error
+        finally:
+            self.latency.observe(
+                endpoint, (time.perf_counter() - started) * 1000, ok)
         return self._normalize_response(response)
 
-    async def create_channel(self, endpoint: str) -> dict:
+    async def create_channel(self, endpoint: str,
+                             channel_id: Optional[str] = None) -> dict:
         """Создать канал."""
         url = f'{self.base_url}/channels/create'
         data = {
@@ -51,12 +99,22 @@ class AriClient:
             "app": STASIS_APP_NAME,
             "timeout": 30
         }
-        return await self._send_request(url, 'POST', data)
+        if channel_id:
+            data["channelId"] = channel_id
+        return await self._send_request(
+            url, 'POST', data, '/channels/create')
+
+    async def get_channel(self, channel_id: str) -> dict:
+        """Текущее состояние канала."""
+        url = f"{self.base_url}/channels/{channel_id}"
+        return await self._send_request(
+            url, 'GET', endpoint='/channels/{id}')
 
     async def dial_channel(self, channel_id: str) -> None:
         """Подключание канала."""
         url = f"{self.base_url}/channels/{channel_id}/dial"
-        await self._send_request(url, "POST")
+        await self._send_request(
+            url, "POST", endpoint="/channels/{id}/dial")
 
     async def play_audio(self, channel_id: str) -> None:
         """Воспроизвести звук."""
@@ -64,14 +122,14 @@ class AriClient:
         data = {
             "media": "sound:hello-world"  # http://217.114.3.34/audio-2.alaw
         }
-        await self._send_request(url, 'POST', data)
+        await self._send_request(url, 'POST', data, '/channels/{id}/play')
 
     async def record_call(
             self, channel_id, filename="client_call_recording",
             format="wav", beep=True, max_duration_seconds=0,
             max_silence_seconds=0, if_exists="overwrite") -> dict:
         """Запись звонка с динамическими параметрами."""
-        url = f"{ARI_HOST}/channels/{channel_id}/record"
+        url = f"{self.base_url}/channels/{channel_id}/record"
 
         data = {
             "format": format,  # формат записи (например, wav или mp3)
@@ -84,67 +142,104 @@ class AriClient:
             "ifExists": if_exists
             # что делать, если файл существует (overwrite или append)
         }
-        await self._send_request(url, "POST", data)
+        await self._send_request(url, "POST", data, "/channels/{id}/record")
 
     async def hangup_call(self, channel_id: int) -> None:
         """Завершение звонка."""
         url = f"{self.base_url}/channels/{channel_id}"
-        await self._send_request(url, "DELETE")
+        await self._send_request(url, "DELETE", endpoint="/channels/{id}")
 
-    async def create_bridge(self) -> str:
+    async def create_bridge(self, bridge_id: Optional[str] = None) -> str:
         """Создает бридж, и возвращает его id."""
         url = f"{self.base_url}/bridges"
-        response = await self._send_request(url, "POST", {"type": "mixing"})
+        data = {"type": "mixing"}
+        if bridge_id:
+            data["bridgeId"] = bridge_id
+        response = await self._send_request(url, "POST", data, "/bridges")
         return response['id']
 
+    async def destroy_bridge(self, bridge_id: str) -> None:
+        """Удалить бридж."""
+        url = f"{self.base_url}/bridges/{bridge_id}"
+        await self._send_request(url, "DELETE", endpoint="/bridges/{id}")
+
     async def add_channel_to_bridge(self, bridge_id: str,
                                     channel_id: str) -> None:
         """Добавить канал в бридж."""
-        url = f"{ARI_HOST}/bridges/{bridge_id}/addChannel"
+        url = f"{self.base_url}/bridges/{bridge_id}/addChannel"
         data = {"channel": channel_id}
-        await self._send_request(url, "POST", data)
+        await self._send_request(
+            url, "POST", data, "/bridges/{id}/addChannel")
 
     async def record_bridge(self, bridge_id: str, filename: str) -> None:
         """Записать бридж."""
-        url = f"{ARI_HOST}/bridges/{bridge_id}/record"
+        url = f"{self.base_url}/bridges/{bridge_id}/record"
         data = {
             "name": filename,
             "format": "gsm",
             "ifExists": "overwrite",
             "beep": True
         }
-        await self._send_request(url, "POST", data)
+        await self._send_request(url, "POST", data, "/bridges/{id}/record")
 
-    async def create_external_media(self, uuid: str):
-        url = f"{ARI_HOST}/channels/externalMedia"
+    async def create_external_media(self, uuid: str,
+                                    channel_id: Optional[str] = None,
+                                    external_host: Optional[str] = None):
+        url = f"{self.base_url}/channels/externalMedia"
         data = {
             "app": STASIS_APP_NAME,
-            "external_host": EXTERNAL_HOST,
+            "external_host": external_host or EXTERNAL_HOST,
             "encapsulation": "audiosocket",
             "transport": "tcp",
             "format": "alaw",
             "data": uuid
         }
-        return await self._send_request(url, 'POST', data)
+        if channel_id:
+            data["channelId"] = channel_id
+        return await self._send_request(
+            url, 'POST', data, '/channels/externalMedia')
 
     async def create_snoop_on_channel(self, channel_id) -> dict:
-        url = f"{ARI_HOST}/channels/{channel_id}/snoop"
+        url = f"{self.base_url}/channels/{channel_id}/snoop"
         data = {
             "spy": "both",
             "whisper": "both",
             "app": STASIS_APP_NAME
         }
-        return await self._send_request(url, 'POST', data)
+        return await self._send_request(
+            url, 'POST', data, '/channels/{id}/snoop')
+
+
+if TYPE_CHECKING:
+    from .bridge_pool import BridgePool
+    from .nodes import MediaNode, NodeRegistry
 
 
 class WSHandler:
-    """Обработчик WebSocket событий."""
+    """
+    Обработчик событий одного звонка.
 
-    def __init__(self, ws_host: str, headers: dict, ari_client: AriClient,
-                 phone: str, uuid: str):
-        self.ws_host = ws_host
-        self.headers = headers
+    События приходят не из своего WebSocket, а от общего диспетчера
+    ARI (app.ari.events) в очередь звонка и обрабатываются по порядку.
+    """
+
+    def __init__(self, ari_client: AriClient, phone: str, uuid: str,
+                 dispatcher: AriEventDispatcher = ari_events,
+                 bridge_pool: Optional['BridgePool'] = None,
+                 node_registry: Optional['NodeRegistry'] = None):
         self.ari_client = ari_client
+        self.dispatcher = dispatcher
+        self.bridge_pool = bridge_pool
+        self.node_registry = node_registry
+        self.media_node: Optional['MediaNode'] = None
+        self.media_assigned_at: Optional[float] = None
+        self.bridge_from_pool = False
+        self.timings = SetupTimings()
+        self.db_task: Optional[asyncio.Task] = None
+        self.events: asyncio.Queue = asyncio.Queue()
+        self.dialed = False
+        self.answered = False
+        self.finished = False
         self.phone = phone
         self.uuid = uuid
         self.call = None
@@ -152,6 +247,7 @@ class WSHandler:
         self.current_bridge_id: str = None
         self.current_external_id: str = None
         self.client_channel_id: str = None
+        self.external_media_up = False
 
     @staticmethod
     def parse_qos_data(value: str) -> dict:
@@ -271,69 +367,232 @@ class WSHandler:
         # )
         if event_type == 'StasisStart' and client_channel_event:
             logger.error('Приложение получило доступ к управлению')
-            await append_status_to_call(
-                self.client_channel_id,
-                [CallStatusDB(status_str=CallStatuses.STASIS_START)])
-            await self.ari_client.dial_channel(self.client_channel_id)
+            await self.dial()
+            await self.record_status(CallStatuses.STASIS_START)
 
         elif event_type == 'Dial' and client_channel_answer:
             logger.error('Абонент ответил')
             logger.info(event)
-            await self.ari_client.add_channel_to_bridge(
-                self.current_bridge_id, self.current_external_id)
-            await append_status_to_call(
-                self.client_channel_id,
-                [CallStatusDB(status_str=CallStatuses.ANSWERED)])
+            await self.on_answer()
 
         elif event_type == 'ChannelHangupRequest' and client_channel_event:
             logger.error('Абонент сбросил')
 
-    async def handle_events(self, websocket: websockets.ClientConnection):
-        """Обрабатываем websocket события."""
-        # while True:
-        # message = await websocket.recv()
-        async for message in websocket:
-            event = json.loads(message)
+        elif event_type == 'ChannelDestroyed' and client_channel_event:
+            self.finished = True
+
+    async def dial(self) -> None:
+        self.dialed = True
+        await self.timings.measure(
+            'dial_channel',
+            self.ari_client.dial_channel(self.client_channel_id))
+        self.timings.mark('dial')
+        self.timings.observe(call_setup_latency)
+        logger.info(f'Установка звонка {self.uuid}, мс: '
+                    f'{self.timings.phases}')
+
+    async def on_answer(self) -> None:
+        self.answered = True
+        self.timings.mark('answer')
+        call_setup_latency.observe('answer', self.timings.phases['answer'])
+        await self.ari_client.add_channel_to_bridge(
+            self.current_bridge_id, self.current_external_id)
+        await self.record_status(CallStatuses.ANSWERED)
+
+    async def record_status(self, status: CallStatuses) -> None:
+        """Статус звонка в БД — после того, как запись звонка создана."""
+        await asyncio.wait((self.db_task,))
+        if self.call is None:
+            # Запись не создалась (ошибка уже в логе) — писать некуда
+            return
+        await append_status_to_call(
+            self.client_channel_id, [CallStatusDB(status_str=status)])
+
+    async def resync(self) -> None:
+        """
+        Сверяет звонок с ARI после переподключения диспетчера: пока
+        связи не было, канал мог ответить или завершиться.
+        """
+        try:
+            channel = await self.ari_client.get_channel(
+                self.client_channel_id)
+        except AriError as e:
+            if e.status_code != 404:
+                raise
+            channel = {}
+        state = channel.get('state')
+        if state is None:
+            logger.warning(
+                f'Канал {self.client_channel_id} завершился без нас')
+            self.finished = True
+        elif state == 'Up' and not self.answered:
+            await self.on_answer()
+        elif state == 'Down' and not self.dialed:
+            await self.dial()
+
+    def deliver(self, event: dict) -> None:
+        """Вызывается диспетчером ARI для событий этого звонка."""
+        self.events.put_nowait(event)
+
+    async def handle_events(self):
+        """Обрабатываем события звонка, пока канал абонента жив."""
+        while not self.finished:
+            event = await self.events.get()
             event_type = event['type']
-            await self.handle_client_channel_events(event_type, event)
-            if event_type == 'ChannelVarset':
-                # Если событие с переменной канала - это инфа о соединении
-                await self.handle_connection_info(event_type, event)
+            try:
+                if event_type == RESYNC_EVENT:
+                    await self.resync()
+                    continue
+                await self.handle_client_channel_events(event_type, event)
+                if event_type == 'ChannelVarset':
+                    # Если событие с переменной канала - это инфа о
+                    # соединении
+                    await self.handle_connection_info(event_type, event)
+            except Exception as e:
+                logger.error(f'Ошибка обработки события {event_type}: {e}')
 
     async def connect(self):
-        """Подключаемся по WebSocket и обрабатываем события."""
-        async with websockets.connect(
-                self.ws_host, additional_headers=self.headers) as websocket:
-            logger.info('Connected to ARI with app %s', STASIS_APP_NAME)
-
-            self.current_bridge_id = await self.ari_client.create_bridge()
-
-            logger.info(f'BRIDGE: {self.current_bridge_id}')
-
-            # Создаем канал для вызова
-            logger.error(f'SIP_ENDPOINT: {self.sip_endpoint}')
-            client = await self.ari_client.create_channel(self.sip_endpoint)
-            self.client_channel_id = client['id']
-
-            # Создаем в базе обьект звонка телефона
-            phone_data = PhoneCreate(digits=self.phone)
-            call_data = CallCreate(
-                channel_id=self.client_channel_id, phone=phone_data,
-                uuid=self.uuid,
-                statuses=[CallStatusDB(status_str=CallStatuses.CREATED)]
-            )
-            self.call = await create_call(call_data)
-
-            logger.error(f'CLIENT_CHANNEL_ID: {self.client_channel_id}')
-            logger.error(f'BRIDGE_ID: {self.current_bridge_id}')
-
-            external_media = await self.ari_client.create_external_media(
-                self.uuid)
+        """Создаем звонок и обрабатываем его события."""
+        await self.dispatcher.wait_connected()
+        # Узел audiosocket выбираем до создания каналов: если места нет,
+        # абоненту не звоним вовсе
+        if self.node_registry:
+            self.media_node, self.media_assigned_at = (
+                await self.timings.measure(
+                    'media_admission', self.node_registry.acquire()))
+        # id выдаем сами и регистрируем до создания: первые события
+        # канала могут прийти раньше ответа ARI на запрос
+        pooled_bridge = self.bridge_pool and self.bridge_pool.acquire()
+        self.bridge_from_pool = bool(pooled_bridge)
+        self.current_bridge_id = pooled_bridge or str(uuid4())
+        self.client_channel_id = str(uuid4())
+        self.current_external_id = str(uuid4())
+        self.dispatcher.register(
+            self, self.current_bridge_id, self.client_channel_id,
+            self.current_external_id)
+        try:
+            await self.setup_call()
+            await self.handle_events()
+        finally:
+            self.dispatcher.unregister(self)
+            await self.teardown()
+
+    async def setup_call(self):
+        """
+        Бридж, канал абонента и externalMedia не зависят друг от друга
+        (id известны заранее) и создаются параллельно. Запись звонка в
+        БД идет фоном: ее ждут только записи статусов, но не набор.
+        """
+        self.db_task = asyncio.create_task(self.timings.measure(
+            'db_create_call', self.create_call_record()))
+        self.db_task.add_done_callback(self.on_call_record_done)
+        logger.info(f'SIP_ENDPOINT: {self.sip_endpoint}, '
+                    f'BRIDGE_ID: {self.current_bridge_id} '
+                    f'(из пула: {self.bridge_from_pool}), '
+                    f'CLIENT_CHANNEL_ID: {self.client_channel_id}, '
+                    f'EXTERNAL_MEDIA_ID: {self.current_external_id}, '
+                    f'узел: {self.media_node and self.media_node.node_id}')
+        results = await asyncio.gather(
+            self.prepare_bridge(),
+            self.timings.measure(
+                'create_channel', self.ari_client.create_channel(
+                    self.sip_endpoint, self.client_channel_id)),
+            self.timings.measure(
+                'create_external_media',
+                self.ari_client.create_external_media(
+                    self.uuid, self.current_external_id,
+                    self.media_node and self.media_node.address)),
+            return_exceptions=True,
+        )
+        await self.raise_setup_errors(*results)
+        # Создаем передачу потока во внешний ресурс
+        await self.timings.measure(
+            'add_channel_to_bridge', self.add_client_to_bridge())
+        self.timings.mark('setup')
 
-            logger.error(f'EXTERNAL_MEDIA_ID: {external_media}')
-            self.current_external_id = external_media['id']
-            # Создаем передачу потока во внешний ресурс
+    async def raise_setup_errors(self, bridge, channel, external) -> None:
+        """
+        Если что-то из параллельной установки не создалось, созданные
+        каналы кладем (абонент не должен слушать гудки без бота, а
+        externalMedia — висеть в Asterisk) и пробрасываем ошибку.
+        Бридж удалит teardown.
+        """
+        self.external_media_up = not isinstance(external, BaseException)
+        errors = [result for result in (bridge, channel, external)
+                  if isinstance(result, BaseException)]
+        if not errors:
+            return
+        if not isinstance(channel, BaseException):
+            await self.hangup_quietly(self.client_channel_id)
+        if self.external_media_up:
+            self.external_media_up = False
+            await self.hangup_quietly(self.current_external_id)
+        raise errors[0]
+
+    async def hangup_quietly(self, channel_id: str) -> None:
+        try:
+            await self.ari_client.hangup_call(channel_id)
+        except (AriError, httpx.HTTPError) as e:
+            logger.warning(f'Не удалось завершить канал {channel_id}: {e}')
+
+    def on_call_record_done(self, task: asyncio.Task) -> None:
+        if not task.cancelled() and task.exception():
+            logger.error(f'Не удалось создать запись звонка {self.uuid}: '
+                         f'{task.exception()}')
+
+    async def create_call_record(self) -> None:
+        """Создаем в базе обьект звонка телефона."""
+        phone_data = PhoneCreate(digits=self.phone)
+        call_data = CallCreate(
+            channel_id=self.client_channel_id, phone=phone_data,
+            uuid=self.uuid,
+            statuses=[CallStatusDB(status_str=CallStatuses.CREATED)]
+        )
+        self.call = await create_call(call_data)
+
+    async def prepare_bridge(self) -> None:
+        if self.bridge_from_pool:
+            self.timings.phases['create_bridge'] = 0.0
+            return
+        await self.timings.measure(
+            'create_bridge',
+            self.ari_client.create_bridge(self.current_bridge_id))
+
+    async def add_client_to_bridge(self) -> None:
+        try:
+            await self.ari_client.add_channel_to_bridge(
+                self.current_bridge_id, self.client_channel_id)
+        except AriError as e:
+            # Бридж из пула мог пропасть (например, Asterisk
+            # перезапускался) — создаем свой
+            if e.status_code != 404 or not self.bridge_from_pool:
+                raise
+            logger.warning(f'Бридж {self.current_bridge_id} из пула '
+                           'не найден, создаем новый')
+            self.bridge_from_pool = False
+            self.current_bridge_id = str(uuid4())
+            self.dispatcher.register(self, self.current_bridge_id)
+            await self.prepare_bridge()
             await self.ari_client.add_channel_to_bridge(
                 self.current_bridge_id, self.client_channel_id)
 
-            await self.handle_events(websocket)
+    async def teardown(self) -> None:
+        """
+        Звонок закончен: кладем externalMedia, удаляем бридж,
+        освобождаем узел.
+        """
+        if self.media_node:
+            await self.node_registry.release(
+                self.media_node, self.media_assigned_at)
+            self.media_node = self.media_assigned_at = None
+        if self.external_media_up:
+            self.external_media_up = False
+            await self.hangup_quietly(self.current_external_id)
+        try:
+            await self.ari_client.destroy_bridge(self.current_bridge_id)
+        except (AriError, httpx.HTTPError) as e:
+            logger.warning(
+                f'Не удалось удалить бридж {self.current_bridge_id}: {e}')
+
+
+ari_client = AriClient(ARI_HOST, AUTH_HEADER)
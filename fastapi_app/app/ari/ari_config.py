@@ -9,11 +9,41 @@ HOST = os.environ.get('ARI_IP')
 EXTERNAL_HOST = os.environ.get('ARI_EXTERNAL_IP_HOST')
 ARI_HOST = f"http://{HOST}/ari"
 ARI_TIMEOUT = 60
+# Общий на процесс пул HTTP-соединений к ARI: всего соединений,
+# сколько держать открытыми между запросами и сколько секунд
+ARI_MAX_CONNECTIONS = int(os.environ.get('ARI_MAX_CONNECTIONS', 50))
+ARI_MAX_KEEPALIVE = int(os.environ.get('ARI_MAX_KEEPALIVE', 20))
+ARI_KEEPALIVE_EXPIRY = 60
+# Сколько mixing-бриджей держать созданными заранее (0 — не держать)
+ARI_BRIDGE_POOL_SIZE = int(os.environ.get('ARI_BRIDGE_POOL_SIZE', 2))
+# Границы корзин гистограмм задержек команд ARI, мс
+ARI_LATENCY_BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
 SIP_HOST = os.environ.get('SIP_HOST')
+# Лимиты SIP-транка: новых вызовов в секунду и одновременных звонков
+SIP_CPS = float(os.environ.get('SIP_CPS', 5))
+SIP_MAX_CONCURRENT = int(os.environ.get('SIP_MAX_CONCURRENT', 30))
+# Сколько номеров принимать в одну кампанию и сколько завершенных
+# кампаний держать в памяти
+CAMPAIGN_MAX_NUMBERS = 100000
+CAMPAIGN_HISTORY = 100
+# Узлы audiosocket: через сколько секунд без отчета узел считается
+# недоступным, сколько звонок ждет свободного узла (0 — сразу отказ)
+# и какой минимальный запас CPU должен быть у узла для нового звонка
+NODE_TTL = 15
+NODE_QUEUE_TIMEOUT = float(os.environ.get('NODE_QUEUE_TIMEOUT', 30))
+NODE_MIN_CPU_HEADROOM = float(os.environ.get('NODE_MIN_CPU_HEADROOM', 0.1))
+# Через сколько секунд отправленный на узел звонок уже есть в его
+# отчете (externalMedia подключается к узлу при создании канала)
+NODE_PENDING_GRACE = 2
 ARI_USER = os.environ.get('ARI_USER')
 ARI_PASSWORD = os.environ.get('ARI_PASS')
 STASIS_APP_NAME = 'fast_api'
 WEBSOCKET_HOST = f"ws://{HOST}/ari/events?app={STASIS_APP_NAME}"
+# Пауза перед переподключением к /ari/events, удваивается до максимума, с
+ARI_RECONNECT_DELAY = 1
+ARI_RECONNECT_MAX_DELAY = 30
+# Сколько звонок ждет соединения с /ari/events, прежде чем отказаться, с
+ARI_EVENTS_WAIT_TIMEOUT = float(os.environ.get('ARI_EVENTS_WAIT_TIMEOUT', 10))
 
 # Кодируем данные для входа
 auth_bytes = f'{ARI_USER}:{ARI_PASSWORD}'.encode('utf-8')
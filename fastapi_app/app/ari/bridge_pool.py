@@ -0,0 +1,76 @@
+import asyncio
+import logging
+from collections import Counter, deque
+from typing import Optional
+from uuid import uuid4
+
+import httpx
+
+from .ari_commands import AriClient, AriError, ari_client
+from .ari_config import ARI_BRIDGE_POOL_SIZE
+
+logger = logging.getLogger(__name__)
+
+
+class BridgePool:
+    """
+    Небольшой запас заранее созданных mixing-бриджей.
+
+    Звонок забирает готовый бридж без запроса к ARI, а пул пополняется
+    в фоне. Если запаса нет или ARI недоступен, звонок создает бридж
+    сам, как раньше.
+    """
+
+    def __init__(self, ari_client: AriClient,
+                 size: int = ARI_BRIDGE_POOL_SIZE):
+        self.ari_client = ari_client
+        self.size = size
+        self.ready: deque[str] = deque()
+        self.stats = Counter()
+        self._refill_task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        self._schedule_refill()
+
+    def acquire(self) -> Optional[str]:
+        """id готового бриджа или None, если запас пуст."""
+        bridge_id = self.ready.popleft() if self.ready else None
+        self.stats['hits' if bridge_id else 'misses'] += 1
+        self._schedule_refill()
+        return bridge_id
+
+    def _schedule_refill(self) -> None:
+        if not self.size:
+            return
+        if self._refill_task is None or self._refill_task.done():
+            self._refill_task = asyncio.create_task(self._refill())
+
+    async def _refill(self) -> None:
+        while len(self.ready) < self.size:
+            bridge_id = str(uuid4())
+            try:
+                await self.ari_client.create_bridge(bridge_id)
+            except (AriError, httpx.HTTPError) as e:
+                self.stats['errors'] += 1
+                logger.warning(f'Не удалось пополнить пул бриджей: {e}')
+                return
+            self.ready.append(bridge_id)
+            self.stats['created'] += 1
+
+    async def stop(self) -> None:
+        """Удаляет невостребованные бриджи."""
+        if self._refill_task is not None:
+            self._refill_task.cancel()
+            self._refill_task = None
+        while self.ready:
+            bridge_id = self.ready.popleft()
+            try:
+                await self.ari_client.destroy_bridge(bridge_id)
+            except (AriError, httpx.HTTPError) as e:
+                logger.warning(f'Не удалось удалить бридж {bridge_id}: {e}')
+
+    def report(self) -> dict:
+        return {'ready': len(self.ready), **self.stats}
+
+
+bridge_pool = BridgePool(ari_client)
@@ -0,0 +1,207 @@
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Optional
+from uuid import uuid4
+
+from .ari_commands import WSHandler, ari_client
+from .ari_config import SIP_CPS, SIP_MAX_CONCURRENT, CAMPAIGN_HISTORY
+from .bridge_pool import bridge_pool
+from .nodes import node_registry
+from app.core.db import now
+
+logger = logging.getLogger(__name__)
+
+
+class TokenBucket:
+    """
+    Ограничитель частоты: rate токенов в секунду, запас capacity.
+    По умолчанию запас в один токен — вызовы идут равномерно, без пачек.
+    """
+
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        self.rate = rate
+        self.capacity = capacity or 1.0
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    async def acquire(self) -> None:
+        while True:
+            moment = time.monotonic()
+            self.tokens = min(
+                self.capacity,
+                self.tokens + (moment - self.updated) * self.rate)
+            self.updated = moment
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return
+            await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+class CampaignStatus:
+    RUNNING = 'running'
+    FINISHED = 'finished'
+    CANCELLED = 'cancelled'
+
+
+@dataclass
+class Campaign:
+    """Обзвон списка номеров; прогресс хранится в памяти процесса."""
+
+    phones: list[str]
+    rejected: list[dict]
+    cps: float
+    max_concurrent: int
+    id: str = field(default_factory=lambda: str(uuid4()))
+    status: str = CampaignStatus.RUNNING
+    created_at: datetime = field(default_factory=now)
+    finished_at: Optional[datetime] = None
+    dialed: int = 0
+    active: int = 0
+    answered: int = 0
+    failed: int = 0
+    completed: int = 0
+    task: Optional[asyncio.Task] = field(default=None, repr=False)
+
+    @property
+    def total(self) -> int:
+        return len(self.phones)
+
+    @property
+    def pending(self) -> int:
+        return self.total - self.dialed
+
+
+class CampaignDialer:
+    """
+    Набор номеров кампаний с учетом лимитов SIP-транка.
+
+    Общие на процесс лимиты (SIP_CPS вызовов в секунду, не больше
+    SIP_MAX_CONCURRENT звонков одновременно) действуют на все кампании
+    и одиночные звонки вместе; у кампании могут быть свои, более
+    строгие лимиты.
+    """
+
+    def __init__(self, cps: float = SIP_CPS,
+                 max_concurrent: int = SIP_MAX_CONCURRENT):
+        self.cps = cps
+        self.max_concurrent = max_concurrent
+        self.bucket = TokenBucket(cps)
+        self.slots = asyncio.Semaphore(max_concurrent)
+        self.campaigns: OrderedDict[str, Campaign] = OrderedDict()
+        self._calls: set[asyncio.Task] = set()
+
+    def start_campaign(self, phones: list[str], rejected: list[dict],
+                       cps: Optional[float] = None,
+                       max_concurrent: Optional[int] = None) -> Campaign:
+        campaign = Campaign(
+            phones=phones, rejected=rejected,
+            cps=min(cps or self.cps, self.cps),
+            max_concurrent=min(max_concurrent or self.max_concurrent,
+                               self.max_concurrent))
+        self.campaigns[campaign.id] = campaign
+        self._prune()
+        campaign.task = asyncio.create_task(self._run(campaign))
+        logger.info(f'Кампания {campaign.id}: {campaign.total} номеров, '
+                    f'{campaign.cps} выз/с, до {campaign.max_concurrent} '
+                    f'одновременно, отклонено {len(rejected)}')
+        return campaign
+
+    def cancel_campaign(self, campaign: Campaign) -> None:
+        """Новые номера не набираются, начатые звонки идут до конца."""
+        if campaign.status == CampaignStatus.RUNNING:
+            campaign.status = CampaignStatus.CANCELLED
+            campaign.finished_at = now()
+            campaign.task.cancel()
+
+    def place_call(self, digits: str) -> None:
+        """Одиночный звонок вне кампании — в тех же лимитах транка."""
+        self._spawn(self._dial(digits))
+
+    async def stop(self) -> None:
+        for campaign in self.campaigns.values():
+            self.cancel_campaign(campaign)
+        for task in tuple(self._calls):
+            task.cancel()
+
+    async def _run(self, campaign: Campaign) -> None:
+        bucket = TokenBucket(campaign.cps)
+        slots = asyncio.Semaphore(campaign.max_concurrent)
+        calls = set()
+        try:
+            for digits in campaign.phones:
+                await slots.acquire()
+                await bucket.acquire()
+                calls.add(self._spawn(
+                    self._dial(digits, campaign, slots)))
+            # wait, а не gather: отмена кампании не должна обрывать
+            # уже идущие звонки
+            if calls:
+                await asyncio.wait(calls)
+        except asyncio.CancelledError:
+            logger.info(f'Кампания {campaign.id} остановлена')
+            raise
+        campaign.status = CampaignStatus.FINISHED
+        campaign.finished_at = now()
+        logger.info(f'Кампания {campaign.id} завершена: '
+                    f'ответили {campaign.answered} из {campaign.total}')
+
+    def _spawn(self, coro) -> asyncio.Task:
+        task = asyncio.create_task(coro)
+        self._calls.add(task)
+        task.add_done_callback(self._calls.discard)
+        return task
+
+    async def _dial(self, digits: str, campaign: Optional[Campaign] = None,
+                    campaign_slots: Optional[asyncio.Semaphore] = None):
+        try:
+            async with self.slots:
+                await self.bucket.acquire()
+                if campaign is None:
+                    await self._single_call(digits)
+                elif campaign.status != CampaignStatus.CANCELLED:
+                    await self._campaign_call(digits, campaign)
+        finally:
+            if campaign_slots is not None:
+                campaign_slots.release()
+
+    async def _connect(self, digits: str) -> WSHandler:
+        """Звонок целиком: от создания каналов до конца разговора."""
+        handler = WSHandler(ari_client, digits, str(uuid4()),
+                            bridge_pool=bridge_pool,
+                            node_registry=node_registry)
+        await handler.connect()
+        return handler
+
+    async def _single_call(self, digits: str) -> None:
+        try:
+            await self._connect(digits)
+        except Exception as e:
+            logger.error(f'Звонок на {digits} не удался: {e}')
+
+    async def _campaign_call(self, digits: str, campaign: Campaign) -> None:
+        campaign.dialed += 1
+        campaign.active += 1
+        try:
+            handler = await self._connect(digits)
+            campaign.answered += handler.answered
+        except Exception as e:
+            logger.error(f'Звонок на {digits} не удался: {e}')
+            campaign.failed += 1
+        finally:
+            campaign.active -= 1
+            campaign.completed += 1
+
+    def _prune(self) -> None:
+        """Держим в памяти не больше CAMPAIGN_HISTORY кампаний."""
+        finished = [
+            campaign_id for campaign_id, campaign in self.campaigns.items()
+            if campaign.status != CampaignStatus.RUNNING]
+        for campaign_id in finished[:len(self.campaigns) - CAMPAIGN_HISTORY]:
+            del self.campaigns[campaign_id]
+
+
+dialer = CampaignDialer()
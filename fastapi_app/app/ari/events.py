@@ -0,0 +1,138 @@
+import asyncio
+import json
+import logging
+from collections import Counter
+from typing import Optional, Protocol
+
+import websockets
+
+from .ari_config import (WEBSOCKET_HOST, AUTH_HEADER, STASIS_APP_NAME,
+                         ARI_RECONNECT_DELAY, ARI_RECONNECT_MAX_DELAY,
+                         ARI_EVENTS_WAIT_TIMEOUT)
+
+logger = logging.getLogger(__name__)
+
+# Синтетическое событие, которое получают все звонки после
+# переподключения: за время разрыва события могли потеряться
+RESYNC_EVENT = 'Resync'
+
+
+class AriUnavailable(RuntimeError):
+    """Соединения с /ari/events нет и за отведенное время не появилось."""
+
+
+class AriEventConsumer(Protocol):
+    """Владелец каналов/бриджей, которому доставляются события."""
+
+    def deliver(self, event: dict) -> None:
+        ...
+
+
+class AriEventDispatcher:
+    """
+    Одно на процесс подключение к /ari/events приложения Stasis.
+
+    Каждое событие декодируется один раз и по id канала, пира (Dial)
+    или бриджа уходит владельцу — звонку, который заранее
+    зарегистрировал свои id. Подключение восстанавливается само, после
+    чего каждому звонку доставляется событие Resync.
+    """
+
+    def __init__(self, ws_host: str = WEBSOCKET_HOST,
+                 headers: Optional[dict] = None):
+        self.ws_host = ws_host
+        self.headers = headers or AUTH_HEADER
+        self._routes: dict[str, AriEventConsumer] = {}
+        self._owned: dict[AriEventConsumer, set[str]] = {}
+        self._connected = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self.stats = Counter()
+
+    def register(self, consumer: AriEventConsumer, *ids: str) -> None:
+        """Закрепляет id каналов/бриджей за звонком."""
+        owned = self._owned.setdefault(consumer, set())
+        for ari_id in ids:
+            self._routes[ari_id] = consumer
+            owned.add(ari_id)
+
+    def unregister(self, consumer: AriEventConsumer) -> None:
+        for ari_id in self._owned.pop(consumer, ()):
+            self._routes.pop(ari_id, None)
+
+    @property
+    def connected(self) -> bool:
+        return self._connected.is_set()
+
+    async def wait_connected(
+            self, timeout: float = ARI_EVENTS_WAIT_TIMEOUT) -> None:
+        """Ждет соединения с ARI; бросает AriUnavailable по таймауту."""
+        try:
+            await asyncio.wait_for(self._connected.wait(), timeout)
+        except asyncio.TimeoutError:
+            raise AriUnavailable(
+                f'Нет соединения с ARI дольше {timeout} с') from None
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        self._connected.clear()
+
+    async def _run(self) -> None:
+        delay = ARI_RECONNECT_DELAY
+        while True:
+            try:
+                async with websockets.connect(
+                        self.ws_host,
+                        additional_headers=self.headers) as websocket:
+                    logger.info(
+                        'Connected to ARI with app %s', STASIS_APP_NAME)
+                    if self.stats['connects']:
+                        self._resync()
+                    self.stats['connects'] += 1
+                    self._connected.set()
+                    delay = ARI_RECONNECT_DELAY
+                    async for message in websocket:
+                        self.dispatch(json.loads(message))
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f'Соединение с ARI потеряно: {e}')
+            self._connected.clear()
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, ARI_RECONNECT_MAX_DELAY)
+
+    def _resync(self) -> None:
+        logger.warning(f'Переподключились к ARI, сверяем состояние '
+                       f'{len(self._owned)} звонков')
+        for consumer in tuple(self._owned):
+            consumer.deliver({'type': RESYNC_EVENT})
+
+    def dispatch(self, event: dict) -> None:
+        self.stats['events'] += 1
+        consumer = self._route(event)
+        if consumer is None:
+            self.stats['unrouted'] += 1
+            logger.debug(f"Событие ARI без владельца: {event.get('type')}")
+            return
+        consumer.deliver(event)
+
+    def _route(self, event: dict) -> Optional[AriEventConsumer]:
+        for key in ('channel', 'peer', 'bridge'):
+            ari_id = event.get(key, {}).get('id')
+            consumer = self._routes.get(ari_id)
+            if consumer is not None:
+                return consumer
+        return None
+
+
+ari_events = AriEventDispatcher()
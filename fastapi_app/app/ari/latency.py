@@ -0,0 +1,102 @@
+import time
+from bisect import bisect_left
+from collections import defaultdict
+from typing import Awaitable, TypeVar
+
+from .ari_config import ARI_LATENCY_BUCKETS_MS
+
+T = TypeVar('T')
+
+
+class EndpointLatency:
+    """Гистограмма задержек одной команды ARI."""
+
+    def __init__(self, buckets: tuple = ARI_LATENCY_BUCKETS_MS):
+        self.buckets = buckets
+        # Последняя корзина — все, что дольше самой большой границы
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.errors = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+
+    def observe(self, ms: float, ok: bool = True) -> None:
+        self.counts[bisect_left(self.buckets, ms)] += 1
+        self.count += 1
+        self.total_ms += ms
+        self.max_ms = max(self.max_ms, ms)
+        if not ok:
+            self.errors += 1
+
+    def percentile(self, q: float) -> float:
+        """Верхняя граница корзины, в которую попадает квантиль q."""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(self.buckets, self.counts):
+            seen += count
+            if seen >= rank:
+                return float(bound)
+        return self.max_ms
+
+    def as_dict(self) -> dict:
+        return {
+            'count': self.count,
+            'errors': self.errors,
+            'avg_ms': round(self.total_ms / self.count, 1)
+            if self.count else 0.0,
+            'p50_ms': self.percentile(0.5),
+            'p95_ms': self.percentile(0.95),
+            'p99_ms': self.percentile(0.99),
+            'max_ms': round(self.max_ms, 1),
+            'buckets': dict(zip(
+                [*map(str, self.buckets), '+Inf'], self.counts)),
+        }
+
+
+class AriLatency:
+    """Гистограммы задержек по именам: команды ARI, фазы установки."""
+
+    def __init__(self):
+        self.endpoints: defaultdict[str, EndpointLatency] = defaultdict(
+            EndpointLatency)
+
+    def observe(self, endpoint: str, ms: float, ok: bool = True) -> None:
+        self.endpoints[endpoint].observe(ms, ok)
+
+    def as_dict(self) -> dict:
+        return {endpoint: latency.as_dict()
+                for endpoint, latency in sorted(self.endpoints.items())}
+
+
+class SetupTimings:
+    """
+    Разбивка установки одного звонка: длительность каждого шага и
+    время от начала установки до отметок (dial, answer), мс.
+    """
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.phases: dict[str, float] = {}
+
+    def _elapsed(self, since: float) -> float:
+        return round((time.perf_counter() - since) * 1000, 1)
+
+    async def measure(self, phase: str, awaitable: Awaitable[T]) -> T:
+        started = time.perf_counter()
+        try:
+            return await awaitable
+        finally:
+            self.phases[phase] = self._elapsed(started)
+
+    def mark(self, phase: str) -> None:
+        self.phases[phase] = self._elapsed(self.started)
+
+    def observe(self, latency: AriLatency) -> None:
+        for phase, ms in self.phases.items():
+            latency.observe(phase, ms)
+
+
+# Фазы установки звонков процесса (см. /health/ari)
+call_setup_latency = AriLatency()
@@ -0,0 +1,167 @@
+import asyncio
+import logging
+import time
+from dataclasses import dataclass, field
+from typing import Optional
+
+from .ari_config import (NODE_TTL, NODE_QUEUE_TIMEOUT,
+                         NODE_MIN_CPU_HEADROOM, NODE_PENDING_GRACE)
+from app.schemas.nodes import NodeReport
+
+logger = logging.getLogger(__name__)
+
+
+class NoMediaCapacity(RuntimeError):
+    """Все узлы audiosocket заняты, а очередь не дождалась места."""
+
+
+@dataclass
+class MediaNode:
+    """Узел audiosocket по последнему отчету."""
+
+    node_id: str
+    address: str
+    max_calls: int
+    active_calls: int = 0
+    cpu_headroom: float = 1.0
+    workers: int = 1
+    last_seen: float = field(default_factory=time.monotonic)
+    # Когда звонки были отправлены на узел: свежие могут еще не попасть
+    # в его отчет, и без них узел заполнялся бы сверх лимита
+    pending: list[float] = field(default_factory=list)
+
+    @property
+    def calls(self) -> int:
+        return self.active_calls + len(self.pending)
+
+    @property
+    def load(self) -> float:
+        return self.calls / self.max_calls if self.max_calls else 1.0
+
+    @property
+    def healthy(self) -> bool:
+        return time.monotonic() - self.last_seen <= NODE_TTL
+
+    @property
+    def available(self) -> bool:
+        return (self.healthy and self.calls < self.max_calls
+                and self.cpu_headroom >= NODE_MIN_CPU_HEADROOM)
+
+    def as_dict(self) -> dict:
+        return {
+            'node_id': self.node_id,
+            'address': self.address,
+            'active_calls': self.active_calls,
+            'pending': len(self.pending),
+            'max_calls': self.max_calls,
+            'cpu_headroom': self.cpu_headroom,
+            'workers': self.workers,
+            'load': round(self.load, 3),
+            'healthy': self.healthy,
+            'available': self.available,
+            'last_seen_s': round(time.monotonic() - self.last_seen, 1),
+        }
+
+
+class NodeRegistry:
+    """
+    Реестр узлов audiosocket по их отчетам о емкости.
+
+    Звонок получает наименее загруженный здоровый узел. Если все
+    узлы заняты, звонок ждет места до queue_timeout секунд (0 — сразу
+    отказ), а не перегружает узел. Пока ни один узел не отчитывается,
+    звонки идут на EXTERNAL_HOST, как раньше.
+    """
+
+    def __init__(self, queue_timeout: float = NODE_QUEUE_TIMEOUT):
+        self.queue_timeout = queue_timeout
+        self.nodes: dict[str, MediaNode] = {}
+        self.waiting = 0
+        self.rejected = 0
+        self._changed = asyncio.Condition()
+
+    async def heartbeat(self, report: NodeReport) -> MediaNode:
+        node = self.nodes.get(report.node_id)
+        if node is None:
+            node = self.nodes[report.node_id] = MediaNode(
+                report.node_id, report.address, report.max_calls)
+            logger.info(f'Узел audiosocket {report.node_id} '
+                        f'({report.address}) зарегистрирован')
+        node.address = report.address
+        node.max_calls = report.max_calls
+        node.active_calls = report.active_calls
+        node.cpu_headroom = report.cpu_headroom
+        node.workers = report.workers
+        node.last_seen = time.monotonic()
+        # Звонки старше NODE_PENDING_GRACE узел уже посчитал сам
+        node.pending = [
+            assigned for assigned in node.pending
+            if node.last_seen - assigned < NODE_PENDING_GRACE]
+        await self._notify()
+        return node
+
+    def pick(self) -> Optional[MediaNode]:
+        available = [node for node in self.nodes.values() if node.available]
+        return min(available, key=lambda node: node.load, default=None)
+
+    @property
+    def has_nodes(self) -> bool:
+        return any(node.healthy for node in self.nodes.values())
+
+    def has_capacity(self) -> bool:
+        return not self.has_nodes or self.pick() is not None
+
+    async def acquire(self) -> tuple[Optional[MediaNode], Optional[float]]:
+        """
+        Узел для нового звонка и время назначения, которое звонок
+        передает в release (None — узлов нет, нужен EXTERNAL_HOST).
+        Бросает NoMediaCapacity, если место так и не освободилось.
+        """
+        if not self.has_nodes:
+            return None, None
+        node = self.pick()
+        if node is None and self.queue_timeout:
+            node = await self._wait_for_node()
+        if node is None:
+            self.rejected += 1
+            raise NoMediaCapacity('Нет свободных узлов audiosocket')
+        assigned_at = time.monotonic()
+        node.pending.append(assigned_at)
+        return node, assigned_at
+
+    async def _wait_for_node(self) -> Optional[MediaNode]:
+        self.waiting += 1
+        try:
+            async with self._changed:
+                await asyncio.wait_for(
+                    self._changed.wait_for(self.pick), self.queue_timeout)
+        except asyncio.TimeoutError:
+            return None
+        finally:
+            self.waiting -= 1
+        return self.pick()
+
+    async def release(self, node: MediaNode, assigned_at: float) -> None:
+        """
+        Звонок завершился. Если он еще не попал в отчет узла (упал на
+        установке), место возвращается сразу, иначе — со следующим
+        отчетом. Снимается только назначение этого звонка: чужие
+        незасчитанные звонки должны и дальше занимать место.
+        """
+        if assigned_at in node.pending:
+            node.pending.remove(assigned_at)
+            await self._notify()
+
+    async def _notify(self) -> None:
+        async with self._changed:
+            self._changed.notify_all()
+
+    def report(self) -> dict:
+        return {
+            'nodes': [node.as_dict() for node in self.nodes.values()],
+            'waiting': self.waiting,
+            'rejected': self.rejected,
+        }
+
+
+node_registry = NodeRegistry()
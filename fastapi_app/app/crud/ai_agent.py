@@ -1,11 +1,15 @@
+from collections import defaultdict
 from typing import Optional, List
 
 from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import joinedload
 
 from app.models.ai_agent import Call, Phone, CallStatus, Dialog, Phrase
 from app.schemas.ai_agent import (CallCreate, PhoneCreate, CallStatusCreate,
-                                  CallStatusDB, AddPhrasesToCall)
+                                  CallStatusDB, AddPhrasesToCall,
+                                  TranscriptEvent)
 from app.core.db import AsyncSessionLocal
 
 
@@ -144,13 +148,74 @@ async def get_statuses_for_call(call_id: int) -> List[CallStatus]:
 
 
 # Dialog
+
+async def get_or_create_dialogs(session: AsyncSession,
+                                call_ids: list[int]) -> dict[int, int]:
+    """Id диалогов по id звонков; недостающие диалоги создаются."""
+    if not call_ids:
+        return {}
+    # Сегменты одного звонка могут прийти параллельно от разных
+    # воркеров media_sockets: создание диалога не должно падать
+    await session.execute(
+        insert(Dialog)
+        .values([{'call_id': call_id} for call_id in call_ids])
+        .on_conflict_do_nothing(index_elements=['call_id'])
+    )
+    result = await session.execute(
+        select(Dialog.call_id, Dialog.id).where(Dialog.call_id.in_(call_ids)))
+    return dict(result.all())
+
+
 async def add_speech_to_call(schema: AddPhrasesToCall):
     async with AsyncSessionLocal() as session:
-        phrases = [
-            Phrase(content=content)
+        call = await get_call_by_uuid(schema.uuid)
+        if not call:
+            raise ValueError(f'Звонок с uuid={schema.uuid} не найден.')
+        dialogs = await get_or_create_dialogs(session, [call.id])
+        session.add_all(
+            Phrase(dialog_id=dialogs[call.id], content=content)
             for content in schema.phrases
+        )
+        await session.commit()
+
+
+async def append_transcript_events(
+        events: list[TranscriptEvent]) -> tuple[int, int]:
+    """
+    Сохраняет пачку реплик из журнала транскриптов одной транзакцией.
+
+    Возвращает (сохранено, пропущено): реплики неизвестных звонков и
+    уже сохраненные (повторная отправка сегмента) пропускаются.
+    """
+    by_uuid = defaultdict(list)
+    for event in events:
+        by_uuid[event.call_id].append(event)
+    async with AsyncSessionLocal() as session:
+        result = await session.execute(
+            select(Call.uuid, Call.id).where(Call.uuid.in_(list(by_uuid))))
+        call_ids = dict(result.all())
+        dialogs = await get_or_create_dialogs(
+            session, list(call_ids.values()))
+        rows = [
+            {
+                'dialog_id': dialogs[call_ids[uuid]],
+                'content': event.text,
+                'role': event.role.value,
+                'turn_id': event.turn_id,
+                'seq': event.seq,
+                'item_id': event.item_id,
+                'spoken_at': event.ts,
+            }
+            for uuid, call_events in by_uuid.items() if uuid in call_ids
+            for event in call_events
         ]
-        call = await get_call_by_uuid(schema.uuid)
-        dialog = Dialog(call=call, phrases=phrases)
-        session.add(dialog)
+        stored = 0
+        if rows:
+            result = await session.execute(
+                insert(Phrase).values(rows)
+                .on_conflict_do_nothing(index_elements=['dialog_id', 'seq'])
+                .returning(Phrase.id)
+            )
+            stored = len(result.all())
         await session.commit()
+    return stored, len(events) - stored
@@ -1,10 +1,18 @@
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
 import logging
 
 from app.api.calls import calls_router
+from app.api.campaigns import campaigns_router
 from app.api.health import health_router
+from app.api.nodes import nodes_router
+from app.ari.ari_commands import ari_client
+from app.ari.bridge_pool import bridge_pool
+from app.ari.dialer import dialer
+from app.ari.events import ari_events
 from app.core.config import settings
 
 
@@ -14,7 +22,22 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 
-app = FastAPI(title=settings.APP_TITLE, description=settings.APP_DESCRIPTION)
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Одно подключение к событиям ARI и один пул HTTP-соединений
+    # на процесс, общие для всех звонков
+    ari_client.open()
+    ari_events.start()
+    bridge_pool.start()
+    yield
+    await dialer.stop()
+    await bridge_pool.stop()
+    await ari_events.stop()
+    await ari_client.close()
+
+
+app = FastAPI(title=settings.APP_TITLE, description=settings.APP_DESCRIPTION,
+              lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -26,6 +49,8 @@ app.add_middleware(
 
 app.include_router(health_router)
 app.include_router(calls_router, prefix='/api/v1/calls')
+app.include_router(campaigns_router, prefix='/api/v1/campaigns')
+app.include_router(nodes_router, prefix='/api/v1/nodes')
 
 
 if __name__ == '__main__':
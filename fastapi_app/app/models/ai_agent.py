@@ -1,5 +1,9 @@
 from sqlalchemy.orm import Mapped, mapped_column, relationship
-from sqlalchemy import String, ForeignKey, Text
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy import (String, ForeignKey, Text, DateTime, Integer,
+                        UniqueConstraint)
 
 from app.core.db import Base
 
@@ -7,6 +11,8 @@ MAX_CHANNEL_LENGTH = 50
 MAX_UUID_LENGTH = 50
 MAX_STATUS_LENGTH = 100
 MAX_PHONE_LENGTH = 20
+MAX_ROLE_LENGTH = 20
+MAX_ITEM_ID_LENGTH = 64
 
 
 class Dialog(Base):
@@ -18,11 +24,27 @@ class Dialog(Base):
 
 
 class Phrase(Base):
-    """Model of user's phrases."""
+    """
+    Model of dialog phrases.
+
+    Реплики из журнала транскриптов media_sockets приходят с ролью,
+    номером хода и порядковым номером seq внутри звонка: повторная
+    отправка того же сегмента не создает дублей.
+    """
+
+    __table_args__ = (UniqueConstraint('dialog_id', 'seq'),)
 
     dialog_id: Mapped[int] = mapped_column(ForeignKey('dialog.id'))
     dialog: Mapped[Dialog] = relationship(back_populates='phrases')
     content: Mapped[str] = mapped_column(Text, nullable=True)
+    role: Mapped[Optional[str]] = mapped_column(
+        String(MAX_ROLE_LENGTH), nullable=True)
+    turn_id: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)
+    seq: Mapped[Optional[int]] = mapped_column(Integer, nullable=True)
+    item_id: Mapped[Optional[str]] = mapped_column(
+        String(MAX_ITEM_ID_LENGTH), nullable=True)
+    spoken_at: Mapped[Optional[datetime]] = mapped_column(
+        DateTime(True), nullable=True)
 
 
 class Phone(Base):
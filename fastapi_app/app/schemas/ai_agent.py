@@ -1,3 +1,4 @@
+from datetime import datetime
 from enum import Enum
 from typing import Optional
 
@@ -120,3 +121,34 @@ class Phrase(BaseModel):
 class AddPhrasesToCall(BaseModel):
     uuid: str
     phrases: list[str]
+
+
+class PhraseRole(str, Enum):
+    USER = 'user'
+    ASSISTANT = 'assistant'
+
+
+class TranscriptEvent(BaseModel):
+    """Реплика из журнала транскриптов media_sockets."""
+
+    call_id: Optional[str]  # Call.uuid (UUID потока AudioSocket)
+    seq: int
+    turn_id: int
+    role: PhraseRole
+    text: str
+    item_id: Optional[str] = None
+    ts: datetime
+
+
+class TranscriptBatch(BaseModel):
+    """Закрытый сегмент журнала транскриптов."""
+
+    events: list[TranscriptEvent]
+
+
+class TranscriptBatchResult(BaseModel):
+    """Сколько реплик сохранено и сколько пропущено (неизвестный
+    звонок или повторная отправка)."""
+
+    stored: int
+    skipped: int
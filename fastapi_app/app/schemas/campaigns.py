@@ -0,0 +1,41 @@
+from datetime import datetime
+from typing import Optional
+
+from pydantic import BaseModel, ConfigDict, Field
+
+
+class CampaignCreate(BaseModel):
+    """Schema for Campaign creating."""
+
+    phones: list[str] = Field(min_length=1)
+    # Свои лимиты кампании; выше лимитов транка они не поднимаются
+    cps: Optional[float] = Field(None, gt=0)
+    max_concurrent: Optional[int] = Field(None, gt=0)
+
+
+class RejectedPhone(BaseModel):
+    """Номер, не прошедший проверку PhoneCreate."""
+
+    digits: str
+    error: str
+
+
+class CampaignDB(BaseModel):
+    """Schema for Campaign progress."""
+
+    id: str
+    status: str
+    total: int
+    pending: int
+    dialed: int
+    active: int
+    answered: int
+    failed: int
+    completed: int
+    cps: float
+    max_concurrent: int
+    created_at: datetime
+    finished_at: Optional[datetime]
+    rejected: list[RejectedPhone]
+
+    model_config = ConfigDict(from_attributes=True)
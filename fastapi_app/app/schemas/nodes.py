@@ -0,0 +1,14 @@
+from pydantic import BaseModel, Field
+
+
+class NodeReport(BaseModel):
+    """Отчет узла audiosocket о своей емкости."""
+
+    node_id: str
+    # host:port, по которому Asterisk подключается к узлу (externalMedia)
+    address: str
+    active_calls: int = Field(ge=0)
+    max_calls: int = Field(gt=0)
+    # Свободная доля CPU, 0..1
+    cpu_headroom: float = Field(1.0, ge=0, le=1)
+    workers: int = Field(1, ge=1)
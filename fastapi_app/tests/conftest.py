@@ -0,0 +1,12 @@
+"""
+Обязательные настройки (app.core.config.Settings) для импорта модулей
+приложения в тестах: база и ARI в тестах не используются.
+
+Запуск из каталога fastapi_app:
+    python -m pytest tests
+"""
+import os
+
+for name in ('ARI_PASS', 'POSTGRES_USER', 'POSTGRES_PASSWORD',
+             'POSTGRES_HOST', 'POSTGRES_DB'):
+    os.environ.setdefault(name, 'test')
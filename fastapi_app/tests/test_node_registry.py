@@ -0,0 +1,72 @@
+"""
+Реестр узлов audiosocket (app.ari.nodes.NodeRegistry): назначенный,
+но еще не попавший в отчет звонок занимает место, release снимает
+только свое назначение, а очередь получает освободившийся слот.
+"""
+import asyncio
+
+import pytest
+
+from app.ari.nodes import NodeRegistry, NoMediaCapacity
+from app.schemas.nodes import NodeReport
+
+
+def report(active_calls: int = 0, max_calls: int = 2) -> NodeReport:
+    return NodeReport(node_id='node-1', address='10.0.0.1:7575',
+                      active_calls=active_calls, max_calls=max_calls)
+
+
+def test_pending_calls_take_slots():
+    async def scenario():
+        registry = NodeRegistry(queue_timeout=0)
+        await registry.heartbeat(report())
+        await registry.acquire()
+        await registry.acquire()
+        with pytest.raises(NoMediaCapacity):
+            await registry.acquire()
+        assert registry.rejected == 1
+    asyncio.run(scenario())
+
+
+def test_release_frees_only_own_slot():
+    async def scenario():
+        registry = NodeRegistry(queue_timeout=0)
+        await registry.heartbeat(report())
+        node, first = await registry.acquire()
+        _, second = await registry.acquire()
+        await registry.release(node, first)
+        assert node.pending == [second]
+        # Повторный release того же звонка не снимает чужое назначение
+        await registry.release(node, first)
+        assert node.pending == [second]
+        assert (await registry.acquire())[0] is node
+    asyncio.run(scenario())
+
+
+def test_release_after_report_keeps_counted_call(monkeypatch):
+    # Назначения старше NODE_PENDING_GRACE узел считает сам
+    monkeypatch.setattr('app.ari.nodes.NODE_PENDING_GRACE', 0)
+
+    async def scenario():
+        registry = NodeRegistry(queue_timeout=0)
+        node = await registry.heartbeat(report())
+        _, assigned_at = await registry.acquire()
+        await registry.heartbeat(report(active_calls=1))
+        assert node.pending == []
+        await registry.release(node, assigned_at)
+        assert node.calls == 1
+    asyncio.run(scenario())
+
+
+def test_waiting_call_gets_released_slot():
+    async def scenario():
+        registry = NodeRegistry(queue_timeout=1)
+        await registry.heartbeat(report(max_calls=1))
+        node, assigned_at = await registry.acquire()
+        waiter = asyncio.create_task(registry.acquire())
+        await asyncio.sleep(0)
+        assert registry.waiting == 1
+        await registry.release(node, assigned_at)
+        assert (await asyncio.wait_for(waiter, 1))[0] is node
+        assert registry.waiting == 0
+    asyncio.run(scenario())
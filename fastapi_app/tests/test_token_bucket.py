@@ -0,0 +1,44 @@
+"""
+Ограничитель частоты кампаний (app.ari.dialer.TokenBucket): вызовы
+идут не чаще rate в секунду, запас capacity расходуется сразу.
+"""
+import asyncio
+import time
+
+from app.ari.dialer import TokenBucket
+
+RATE = 50
+
+
+def acquire_times(bucket: TokenBucket, count: int) -> list[float]:
+    async def scenario():
+        started = time.monotonic()
+        moments = []
+        for _ in range(count):
+            await bucket.acquire()
+            moments.append(time.monotonic() - started)
+        return moments
+    return asyncio.run(scenario())
+
+
+def test_calls_are_spaced_by_rate():
+    moments = acquire_times(TokenBucket(RATE), 11)
+    # Первый токен есть сразу, дальше — по одному на 1 / RATE
+    assert moments[0] < 0.5 / RATE
+    assert moments[-1] >= 10 / RATE * 0.95
+    gaps = [b - a for a, b in zip(moments, moments[1:])]
+    assert min(gaps) >= 1 / RATE * 0.8
+
+
+def test_capacity_allows_burst():
+    moments = acquire_times(TokenBucket(RATE, capacity=5), 6)
+    assert moments[4] < 0.5 / RATE
+    assert moments[5] >= 1 / RATE * 0.8
+
+
+def test_idle_time_does_not_exceed_capacity():
+    bucket = TokenBucket(RATE, capacity=2)
+    bucket.updated -= 10
+    moments = acquire_times(bucket, 3)
+    assert moments[1] < 0.5 / RATE
+    assert moments[2] >= 1 / RATE * 0.8
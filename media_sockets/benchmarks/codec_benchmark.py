@@ -0,0 +1,71 @@
+"""
+Бенчмарк G.711 кодека (src/codec): пропускная способность в сравнении
+с audioop, если он еще есть в интерпретаторе. Совпадение с audioop
+бит-в-бит проверяет tests/test_codec.py.
+
+Запуск из каталога media_sockets:
+    python -m benchmarks.codec_benchmark --seconds 600
+"""
+import argparse
+import time
+
+import numpy as np
+
+from src import codec
+from src.constants import DEFAULT_SAMPLE_RATE
+
+try:
+    import audioop
+except ImportError:
+    audioop = None
+
+CODECS = {
+    'alaw': (codec.alaw_decode, codec.alaw_encode, 'alaw2lin', 'lin2alaw'),
+    'ulaw': (codec.ulaw_decode, codec.ulaw_encode, 'ulaw2lin', 'lin2ulaw'),
+}
+
+
+def measure(func, data, repeat: int) -> float:
+    started = time.perf_counter()
+    for _ in range(repeat):
+        func(data)
+    return (time.perf_counter() - started) / repeat
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--seconds', type=int, default=600,
+                        help='длительность тестового аудио, с')
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    if audioop is None:
+        print('audioop недоступен, сравнение с ним пропущено')
+
+    rng = np.random.default_rng(0)
+    samples = args.seconds * DEFAULT_SAMPLE_RATE
+    pcm = rng.integers(-32768, 32768, samples, dtype=np.int16).tobytes()
+    codes = rng.integers(0, 256, samples, dtype=np.uint8).tobytes()
+    pcm_out = np.empty(samples, dtype=np.int16)
+    codes_out = np.empty(samples, dtype=np.uint8)
+
+    for name, (decode, encode, decode_ref, encode_ref) in CODECS.items():
+        rows = [
+            ('decode', lambda d: decode(d, pcm_out), codes),
+            ('encode', lambda d: encode(d, codes_out), pcm),
+        ]
+        if audioop is not None:
+            rows += [
+                ('decode audioop',
+                 lambda d: getattr(audioop, decode_ref)(d, 2), codes),
+                ('encode audioop',
+                 lambda d: getattr(audioop, encode_ref)(d, 2), pcm),
+            ]
+        for title, func, data in rows:
+            elapsed = measure(func, data, args.repeat)
+            print(f'{name} {title:<15} {samples / elapsed / 1e6:8.1f} '
+                  f'Мотсч/с ({args.seconds / elapsed:,.0f}x realtime)')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,162 @@
+"""
+Бенчмарк разбора событий OpenAI Realtime.
+
+Прогоняет поток сообщений (записанный JSONL, по одному сырому
+сообщению на строку, или синтетический — 90% аудио-дельт) через
+AudioWebSocketClient.dispatch_message с фиктивным writer'ом и сравнивает
+быстрый путь для response.audio.delta с полным json.loads. Отдельно
+сравнивает декодирование base64 дельты: binascii.a2b_base64 (новый
+bytes на каждую дельту) и табличное декодирование numpy в заранее
+выделенный буфер.
+
+Запуск из каталога media_sockets:
+    python -m benchmarks.dispatch_benchmark --events 20000
+    python -m benchmarks.dispatch_benchmark --replay events.jsonl
+"""
+import argparse
+import asyncio
+import base64
+import binascii
+import json
+import os
+import time
+
+import numpy as np
+
+from main import AudioWebSocketClient
+from src.events import parse_audio_delta
+from src.playout import playout_scheduler
+
+
+class NullWriter:
+    def is_closing(self) -> bool:
+        return False
+
+    def writelines(self, packets) -> None:
+        pass
+
+    def write(self, data) -> None:
+        pass
+
+    def close(self) -> None:
+        pass
+
+
+def synthetic_events(count: int, delta_bytes: int) -> list[bytes]:
+    delta = base64.b64encode(os.urandom(delta_bytes)).decode()
+    events = []
+    for i in range(count):
+        if i % 10:
+            event = {
+                "type": "response.audio.delta", "event_id": f"event_{i}",
+                "response_id": "resp_1", "item_id": "item_1",
+                "output_index": 0, "content_index": 0, "delta": delta,
+            }
+        else:
+            event = {
+                "type": "response.audio_transcript.delta",
+                "event_id": f"event_{i}", "response_id": "resp_1",
+                "item_id": "item_1", "delta": "привет",
+            }
+        events.append(json.dumps(event, separators=(',', ':')).encode())
+    return events
+
+
+def load_events(path: str) -> list[bytes]:
+    with open(path, 'rb') as f:
+        return [line.rstrip(b'\n') for line in f if line.strip()]
+
+
+async def replay(events: list[bytes], fast_path: bool) -> float:
+    client = AudioWebSocketClient(None, NullWriter(), instructions='')
+    # Плейаут не нужен: меряем только разбор и декодирование
+    playout_scheduler.unregister(client.audio_handler.playout)
+    started = time.perf_counter()
+    for message in events:
+        if fast_path:
+            await client.dispatch_message(message)
+        else:
+            await client.handle_event(json.loads(message))
+        client.audio_handler.playout.buffer.clear()
+    return time.perf_counter() - started
+
+
+BASE64_ALPHABET = (b'ABCDEFGHIJKLMNOPQRSTUVWXYZ'
+                   b'abcdefghijklmnopqrstuvwxyz0123456789+/')
+
+
+class BufferedBase64Decoder:
+    """Декодирует base64 в переиспользуемый буфер, без выделений."""
+
+    def __init__(self):
+        self.table = np.zeros(256, dtype=np.uint8)
+        self.table[np.frombuffer(BASE64_ALPHABET, np.uint8)] = np.arange(
+            len(BASE64_ALPHABET), dtype=np.uint8)
+        self.sextets = np.empty(0, dtype=np.uint8)
+        self.high = np.empty(0, dtype=np.uint8)
+        self.out = np.empty(0, dtype=np.uint8)
+
+    def decode(self, encoded) -> memoryview:
+        codes = np.frombuffer(encoded, dtype=np.uint8)
+        size, quads = len(codes), len(codes) // 4
+        if len(self.sextets) < size:
+            self.sextets = np.empty(size, dtype=np.uint8)
+            self.high = np.empty(quads, dtype=np.uint8)
+            self.out = np.empty(quads * 3, dtype=np.uint8)
+        sextets = np.take(
+            self.table, codes, out=self.sextets[:size]).reshape(-1, 4)
+        out = self.out[:quads * 3].reshape(-1, 3)
+        high = self.high[:quads]
+        np.left_shift(sextets[:, 0], 2, out=out[:, 0])
+        out[:, 0] |= np.right_shift(sextets[:, 1], 4, out=high)
+        np.left_shift(sextets[:, 1], 4, out=out[:, 1])
+        out[:, 1] |= np.right_shift(sextets[:, 2], 2, out=high)
+        np.left_shift(sextets[:, 2], 6, out=out[:, 2])
+        out[:, 2] |= sextets[:, 3]
+        padding = bytes(codes[-2:]).count(b'=')
+        return memoryview(self.out)[:quads * 3 - padding]
+
+
+def compare_base64(delta_bytes: int, repeat: int = 20000) -> None:
+    raw = os.urandom(delta_bytes)
+    encoded = memoryview(base64.b64encode(raw))
+    decoder = BufferedBase64Decoder()
+    if decoder.decode(encoded) != raw:
+        raise RuntimeError('Декодер numpy разошелся с base64')
+    for title, decode in (('a2b_base64', binascii.a2b_base64),
+                          ('numpy в буфер', decoder.decode)):
+        started = time.perf_counter()
+        for _ in range(repeat):
+            decode(encoded)
+        elapsed = (time.perf_counter() - started) / repeat
+        print(f'base64 {title:<14} {elapsed * 1e6:6.1f} мкс на дельту '
+              f'({delta_bytes} байт)')
+
+
+async def run(args) -> None:
+    if args.replay:
+        events = load_events(args.replay)
+    else:
+        events = synthetic_events(args.events, args.delta_bytes)
+    deltas = sum(parse_audio_delta(message) is not None
+                 for message in events)
+    print(f'{len(events)} событий, из них аудио-дельт: {deltas}')
+    for title, fast_path in (('json.loads', False), ('быстрый путь', True)):
+        elapsed = await replay(events, fast_path)
+        print(f'{title:<14} {len(events) / elapsed:10,.0f} событий/с '
+              f'({elapsed / len(events) * 1e6:.1f} мкс на событие)')
+    compare_base64(args.delta_bytes)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--events', type=int, default=20000,
+                        help='число синтетических событий')
+    parser.add_argument('--delta-bytes', type=int, default=2400,
+                        help='размер аудио в дельте (g711: 8 байт на мс)')
+    parser.add_argument('--replay', help='JSONL с записанными событиями')
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == '__main__':
+    main()
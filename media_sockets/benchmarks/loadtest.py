@@ -0,0 +1,383 @@
+"""
+Нагрузочный тест медиапути без Asterisk и OpenAI.
+
+Поднимает фейковый OpenAI Realtime (WebSocket на localhost), запускает
+main.py с REALTIME_URL, указывающим на него, и открывает N звонков
+фейкового Asterisk: UUID, затем A-law фреймы по 20 мс в реальном
+времени. Фейковый сервер, получив speak_ms аудио звонка, отвечает как
+модель: speech_stopped, пауза model_delay, поток response.audio.delta.
+
+Отчет: задержка от speech_stopped до первого фрейма ответа у
+«абонента», джиттер воспроизведения (отклонение интервалов между
+фреймами ответа от 20 мс), CPU и память процессов main.py — по каждому
+звонку и в целом. Для чистоты замера локальный VAD и метрики в
+main.py выключаются.
+
+Запуск из каталога media_sockets:
+    python -m benchmarks.loadtest --calls 50 --duration 30
+    WORKERS=4 python -m benchmarks.loadtest --calls 200
+"""
+import argparse
+import asyncio
+import base64
+import json
+import os
+import signal
+import struct
+import sys
+import time
+import uuid
+from collections import defaultdict
+from dataclasses import dataclass, field
+from statistics import mean
+from typing import Optional
+
+from websockets.asyncio.server import serve
+from websockets.exceptions import ConnectionClosed
+
+from src.constants import (AUDIO_TYPE, UUID_TYPE, HANGUP_TYPE, PORT,
+                           FRAME_DURATION, READER_PAYLOAD_SIZE,
+                           DEFAULT_SAMPLE_RATE)
+
+# Первые байты каждого входящего фрейма: метка и номер звонка, по
+# которым фейковый сервер сопоставляет сессию со звонком.
+CALL_MARKER = b'LT'
+# Пауза между фреймами ответа, после которой начинается новый ответ, с
+RESPONSE_GAP = 0.1
+# Во сколько раз быстрее реального времени «модель» шлет дельты
+DELTA_SPEEDUP = 4
+BYTES_PER_MS = {
+    'g711_alaw': DEFAULT_SAMPLE_RATE // 1000,
+    'g711_ulaw': DEFAULT_SAMPLE_RATE // 1000,
+    'pcm16': 24000 * 2 // 1000,
+}
+
+
+def percentile(values: list, q: float) -> Optional[float]:
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(int(q * len(ordered)), len(ordered) - 1)]
+
+
+def fmt_ms(value: Optional[float]) -> str:
+    return '-' if value is None else f'{value * 1000:7.1f}'
+
+
+class FakeRealtimeServer:
+    """Отвечает как OpenAI Realtime на каждые speak_ms аудио абонента."""
+
+    def __init__(self, args):
+        self.args = args
+        # Номер звонка -> моменты speech_stopped каждого хода
+        self.turn_marks: dict[int, list[float]] = defaultdict(list)
+        self.sessions = 0
+
+    async def handler(self, ws):
+        self.sessions += 1
+        session = {'output_audio_format': 'pcm16'}
+        # Номер звонка и аудио абонента с конца последнего ответа
+        state = {'call_index': None, 'received': 0, 'responding': None}
+        await self.send(ws, {'type': 'session.created', 'session': session})
+        try:
+            async for message in ws:
+                event = json.loads(message)
+                if event['type'] == 'session.update':
+                    session.update(event['session'])
+                    await self.send(
+                        ws, {'type': 'session.updated', 'session': session})
+                elif event['type'] == 'input_audio_buffer.append':
+                    self.on_audio(ws, state, event['audio'],
+                                  session['output_audio_format'])
+        except ConnectionClosed:
+            pass
+
+    def on_audio(self, ws, state: dict, audio_b64: str,
+                 output_format: str) -> None:
+        audio = base64.b64decode(audio_b64)
+        if state['call_index'] is None and audio.startswith(CALL_MARKER):
+            state['call_index'] = struct.unpack('>H', audio[2:4])[0]
+        state['received'] += len(audio)
+        speak_bytes = self.args.speak_ms * DEFAULT_SAMPLE_RATE // 1000
+        responding = state['responding']
+        if state['received'] >= speak_bytes and (
+                responding is None or responding.done()):
+            state['responding'] = asyncio.create_task(
+                self.respond_safely(ws, state, output_format))
+
+    async def respond_safely(self, ws, state: dict,
+                             output_format: str) -> None:
+        try:
+            await self.respond(ws, state, output_format)
+        except ConnectionClosed:
+            # Звонок закончился посреди ответа
+            pass
+
+    @staticmethod
+    async def send(ws, event: dict) -> None:
+        await ws.send(json.dumps(event, separators=(',', ':')))
+
+    async def respond(self, ws, state: dict, output_format: str) -> None:
+        """Один ход; счетчик аудио абонента обнуляется, когда ответ доигран."""
+        args = self.args
+        marks = self.turn_marks[state['call_index']]
+        turn = len(marks)
+        marks.append(time.monotonic())
+        await self.send(ws, {'type': 'input_audio_buffer.speech_stopped'})
+        await asyncio.sleep(args.model_delay_ms / 1000)
+        response_id = f'resp_{turn}'
+        item_id = f'item_{turn}'
+        await self.send(ws, {'type': 'response.created',
+                             'response': {'id': response_id}})
+        first_delta = time.monotonic()
+        delta = base64.b64encode(
+            os.urandom(args.delta_ms * BYTES_PER_MS[output_format])).decode()
+        for _ in range(args.response_ms // args.delta_ms):
+            await self.send(ws, {
+                'type': 'response.audio.delta', 'response_id': response_id,
+                'item_id': item_id, 'output_index': 0, 'content_index': 0,
+                'delta': delta,
+            })
+            await asyncio.sleep(args.delta_ms / 1000 / DELTA_SPEEDUP)
+        await self.send(ws, {'type': 'response.audio.done',
+                             'response_id': response_id})
+        await self.send(ws, {'type': 'response.done',
+                             'response': {'id': response_id}})
+        # Абонент говорит следующую фразу, дослушав ответ
+        playout_end = first_delta + args.response_ms / 1000
+        await asyncio.sleep(max(playout_end - time.monotonic(), 0))
+        state['received'] = 0
+
+
+@dataclass
+class CallResult:
+    index: int
+    frames_sent: int = 0
+    frames_received: int = 0
+    # Моменты прихода первого фрейма каждого ответа
+    response_starts: list = field(default_factory=list)
+    # Отклонения интервалов между фреймами ответа от 20 мс, с
+    jitter: list = field(default_factory=list)
+    latencies: list = field(default_factory=list)
+    error: Optional[str] = None
+
+
+class FakeAsteriskCall:
+    """Один звонок: шлет A-law по 20 мс и принимает ответ."""
+
+    def __init__(self, index: int, host: str, port: int, duration: float):
+        self.result = CallResult(index)
+        self.host = host
+        self.port = port
+        self.duration = duration
+        marker = CALL_MARKER + struct.pack('>H', index)
+        self.frame = (
+            bytes((AUDIO_TYPE,)) + struct.pack('>H', READER_PAYLOAD_SIZE)
+            + marker + os.urandom(READER_PAYLOAD_SIZE - len(marker)))
+
+    async def run(self) -> CallResult:
+        try:
+            reader, writer = await asyncio.open_connection(
+                self.host, self.port)
+        except OSError as e:
+            self.result.error = str(e)
+            return self.result
+        writer.write(bytes((UUID_TYPE,)) + struct.pack('>H', 16)
+                     + uuid.uuid4().bytes)
+        receiving = asyncio.create_task(self.receive(reader))
+        try:
+            await self.send(writer)
+            writer.write(bytes((HANGUP_TYPE,)) + struct.pack('>H', 0))
+            await writer.drain()
+        except (OSError, ConnectionError) as e:
+            self.result.error = str(e)
+        await asyncio.sleep(RESPONSE_GAP)
+        receiving.cancel()
+        writer.close()
+        return self.result
+
+    async def send(self, writer: asyncio.StreamWriter) -> None:
+        """A-law фреймы по абсолютным дедлайнам, как шлет Asterisk."""
+        started = time.monotonic()
+        frames = int(self.duration / FRAME_DURATION)
+        for frame_number in range(frames):
+            writer.write(self.frame)
+            self.result.frames_sent += 1
+            deadline = started + (frame_number + 1) * FRAME_DURATION
+            await asyncio.sleep(max(deadline - time.monotonic(), 0))
+
+    async def receive(self, reader: asyncio.StreamReader) -> None:
+        last_arrival = None
+        try:
+            while True:
+                header = await reader.readexactly(3)
+                length = struct.unpack('>H', header[1:])[0]
+                await reader.readexactly(length)
+                now = time.monotonic()
+                self.result.frames_received += 1
+                if last_arrival is None or (
+                        now - last_arrival > RESPONSE_GAP):
+                    self.result.response_starts.append(now)
+                else:
+                    self.result.jitter.append(
+                        abs(now - last_arrival - FRAME_DURATION))
+                last_arrival = now
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+
+
+def process_tree(pid: int) -> list[int]:
+    """pid и все его потомки (воркеры супервизора)."""
+    pids = [pid]
+    for current in pids:
+        try:
+            with open(f'/proc/{current}/task/{current}/children') as f:
+                pids.extend(int(child) for child in f.read().split())
+        except OSError:
+            pass
+    return pids
+
+
+def resource_usage(pid: int) -> tuple[float, int]:
+    """CPU (user+system, с) и RSS (байт) дерева процессов из /proc."""
+    ticks = os.sysconf('SC_CLK_TCK')
+    cpu = 0.0
+    rss = 0
+    for current in process_tree(pid):
+        try:
+            with open(f'/proc/{current}/stat') as f:
+                # Имя процесса в скобках может содержать пробелы
+                fields = f.read().rsplit(')', 1)[1].split()
+            cpu += (int(fields[11]) + int(fields[12])) / ticks
+            rss += int(fields[21]) * os.sysconf('SC_PAGE_SIZE')
+        except OSError:
+            pass
+    return cpu, rss
+
+
+def start_server(ws_port: int) -> asyncio.subprocess.Process:
+    env = dict(os.environ)
+    env.update({
+        'REALTIME_URL': f'ws://127.0.0.1:{ws_port}/v1/realtime',
+        'OPENAI_KEY': env.get('OPENAI_KEY', 'loadtest'),
+        'LOCAL_VAD_ENABLED': 'false',
+        'METRICS_PORT': '0',
+    })
+    return asyncio.create_subprocess_exec(
+        sys.executable, 'main.py', env=env,
+        stdout=asyncio.subprocess.DEVNULL, stderr=asyncio.subprocess.DEVNULL)
+
+
+def match_turns(result: CallResult, marks: list[float]) -> None:
+    """Задержка хода: speech_stopped -> первый фрейм ответа."""
+    starts = iter(result.response_starts)
+    for mark in marks:
+        for start in starts:
+            if start >= mark:
+                result.latencies.append(start - mark)
+                break
+
+
+def report(results: list[CallResult], wall: float, cpu: Optional[float],
+           rss: Optional[int], harness_cpu: float) -> None:
+    print(f"{'call':>5} {'sent':>6} {'recv':>6} {'turns':>5} "
+          f"{'lat avg':>8} {'lat max':>8} {'jit p99':>8}  error")
+    for r in results:
+        print(f'{r.index:5d} {r.frames_sent:6d} {r.frames_received:6d} '
+              f'{len(r.latencies):5d} '
+              f'{fmt_ms(mean(r.latencies) if r.latencies else None):>8} '
+              f'{fmt_ms(max(r.latencies, default=None)):>8} '
+              f'{fmt_ms(percentile(r.jitter, 0.99)):>8}  {r.error or ""}')
+
+    latencies = [value for r in results for value in r.latencies]
+    jitter = [value for r in results for value in r.jitter]
+    failed = sum(1 for r in results if r.error)
+    print(f'\nЗвонков: {len(results)} (ошибок: {failed}), '
+          f'ходов: {len(latencies)}, время теста: {wall:.1f} с')
+    print(f"Задержка speech_stopped -> первый фрейм, мс: "
+          f"p50 {fmt_ms(percentile(latencies, 0.5))}, "
+          f"p95 {fmt_ms(percentile(latencies, 0.95))}, "
+          f"max {fmt_ms(max(latencies, default=None))}")
+    print(f"Джиттер воспроизведения, мс: "
+          f"p50 {fmt_ms(percentile(jitter, 0.5))}, "
+          f"p99 {fmt_ms(percentile(jitter, 0.99))}, "
+          f"max {fmt_ms(max(jitter, default=None))}")
+    if cpu is not None:
+        cores = cpu / wall
+        print(f'main.py: CPU {cpu:.1f} с ({cores * 100:.0f}% ядра), '
+              f'RSS {rss / 2 ** 20:.0f} МБ')
+        if cores:
+            print(f'Оценка: ~{len(results) / cores:.0f} звонков на ядро '
+                  f'при такой нагрузке')
+    print(f'Сам тест: CPU {harness_cpu:.1f} с '
+          f'({harness_cpu / wall * 100:.0f}% ядра) — если близко к 100%, '
+          f'узкое место в тесте, а не в main.py')
+
+
+async def run(args) -> None:
+    fake = FakeRealtimeServer(args)
+    async with serve(fake.handler, '127.0.0.1', args.ws_port,
+                     max_size=None):
+        process = None
+        if not args.no_spawn:
+            process = await start_server(args.ws_port)
+            await asyncio.sleep(args.startup)
+            if process.returncode is not None:
+                sys.exit(f'main.py завершился с кодом {process.returncode}')
+        pid = args.pid or (process.pid if process else None)
+        cpu_before = resource_usage(pid)[0] if pid else None
+        harness_before = time.process_time()
+        started = time.monotonic()
+
+        async def start_call(index: int) -> CallResult:
+            await asyncio.sleep(index * args.ramp / max(args.calls, 1))
+            call = FakeAsteriskCall(index, args.host, args.port,
+                                    args.duration)
+            return await call.run()
+
+        results = await asyncio.gather(
+            *(start_call(index) for index in range(args.calls)))
+        wall = time.monotonic() - started
+        cpu = rss = None
+        if pid:
+            cpu_after, rss = resource_usage(pid)
+            cpu = cpu_after - cpu_before
+        harness_cpu = time.process_time() - harness_before
+        if process:
+            process.send_signal(signal.SIGTERM)
+            await process.wait()
+
+    for result in results:
+        match_turns(result, fake.turn_marks.get(result.index, []))
+    report(results, wall, cpu, rss, harness_cpu)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawTextHelpFormatter)
+    parser.add_argument('--calls', type=int, default=20)
+    parser.add_argument('--duration', type=float, default=20,
+                        help='длительность звонка, с')
+    parser.add_argument('--ramp', type=float, default=2,
+                        help='за сколько секунд открыть все звонки')
+    parser.add_argument('--speak-ms', type=int, default=1500,
+                        help='сколько аудио абонента на один ход')
+    parser.add_argument('--model-delay-ms', type=int, default=300,
+                        help='«думает» модель до первой дельты')
+    parser.add_argument('--response-ms', type=int, default=3000)
+    parser.add_argument('--delta-ms', type=int, default=100)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=PORT)
+    parser.add_argument('--ws-port', type=int, default=8765)
+    parser.add_argument('--startup', type=float, default=2,
+                        help='сколько ждать запуска main.py, с')
+    parser.add_argument('--no-spawn', action='store_true',
+                        help='не запускать main.py (уже запущен с '
+                             'REALTIME_URL на фейковый сервер)')
+    parser.add_argument('--pid', type=int,
+                        help='pid уже запущенного main.py для замера CPU')
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,47 @@
+"""
+Микро-бенчмарк парсера AudioSocket.
+
+Запуск из каталога media_sockets:
+    python -m benchmarks.parser_benchmark --frames 200000
+"""
+import argparse
+import time
+
+from src.constants import READER_PAYLOAD_SIZE
+from src.utils import AudioConverter, AudioSocketParser
+
+
+def build_stream(frames: int) -> bytes:
+    """Поток из одинаковых 20 мс аудио-пакетов."""
+    packet = AudioConverter.create_audio_packet(bytes(READER_PAYLOAD_SIZE))
+    return packet * frames
+
+
+def run(stream: bytes, read_size: int) -> tuple[int, float]:
+    """Скармливает поток кусками read_size байт, как reader.read()."""
+    parser = AudioSocketParser()
+    parsed = 0
+    started = time.perf_counter()
+    for offset in range(0, len(stream), read_size):
+        parser.feed(stream[offset:offset + read_size])
+        for _ in parser.packets():
+            parsed += 1
+    return parsed, time.perf_counter() - started
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__)
+    arg_parser.add_argument('--frames', type=int, default=200_000)
+    arg_parser.add_argument(
+        '--read-sizes', type=int, nargs='+', default=[163, 1024, 4096])
+    args = arg_parser.parse_args()
+
+    stream = build_stream(args.frames)
+    for read_size in args.read_sizes:
+        parsed, elapsed = run(stream, read_size)
+        print(f'read={read_size:>5} B: {parsed} пакетов за {elapsed:.3f} с, '
+              f'{parsed / elapsed:,.0f} пакетов/с')
+
+
+if __name__ == '__main__':
+    main()
@@ -1,18 +1,41 @@
 import asyncio
 import websockets
 import json
-import base64
+import binascii
 import logging
-import ssl
+import os
+import time
 import uuid
-
-from src.constants import (OPENAI_API_KEY, REALTIME_MODEL, HOST, PORT,
-                           OUTPUT_FORMAT, INPUT_FORMAT, DEFAULT_SAMPLE_RATE,
-                           DEFAULT_SAMPLE_WIDTH, OPENAI_OUTPUT_RATE,
-                           DRAIN_CHUNK_SIZE, READER_BYTES_LIMIT,
-                           INTERRUPT_PAUSE, AUDIO_TYPE, UUID_TYPE,
-                           BYTES_ENCODING)
-from src.utils import AudioSocketParser, AudioConverter
+from functools import partial
+from statistics import mean
+from typing import Optional
+
+from src.constants import (HOST, PORT, SERVER_VAD_CONFIG,
+                           OUTPUT_FORMATS, INPUT_FORMAT, SERVER_MODE,
+                           JITTER_BUFFER_ENABLED,
+                           DEFAULT_SAMPLE_RATE, DEFAULT_SAMPLE_WIDTH,
+                           AUDIO_TYPE, UUID_TYPE,
+                           HANGUP_TYPE, ERROR_TYPE, WORKERS,
+                           METRICS_PORT, GREETING_PHRASE,
+                           RECORDING_ENABLED, JOURNAL_ENABLED,
+                           OPENAI_RECONNECT_ATTEMPTS)
+from src.transport import AudioSocketProtocol, StreamPacketReader
+from src.output_pipeline import (OutputPipeline, create_output_pipeline,
+                                 negotiate_output_pipeline)
+from src.playout import PlayoutStream, playout_scheduler
+from src.uplink import UplinkAggregator
+from src.jitter import JitterBuffer
+from src.vad import LocalVAD, VADConfig
+from src.session_pool import RealtimeSessionPool, open_realtime_session
+from src.events import AudioDelta, EventRegistry, parse_audio_delta
+from src.supervisor import Supervisor, call_counter
+from src.metrics import metrics
+from src.phrase_cache import phrase_cache
+from src.recorder import CallRecording, recording_writer
+from src.journal import transcript_journal
+from src.node_reporter import node_reporter
+from src.latency import (TurnLatencyTracker, node_latency,
+                         write_latency_record)
 from src.instructions import INSTRUCTIONS, DEFAULT_PROMPT
 
 logging.basicConfig(
@@ -25,94 +48,95 @@ class AudioHandler:
     """
     Handles audio input and output.
     """
-    def __init__(self, writer):
-        self.audio_queue = asyncio.Queue()
-        self.playback_task = None
-        self.stop_playback_flag = False
+    def __init__(self, writer, pipeline: OutputPipeline):
         self.writer = writer
-
-    async def start_playback_loop(self):
-        if self.playback_task is None or self.playback_task.done():
-            self.stop_playback_flag = False
-            self.playback_task = asyncio.create_task(self._playback_loop())
-
-    async def _playback_loop(self):
+        self.pipeline = pipeline
+        # Отметки задержек по ходам диалога
+        self.latency = TurnLatencyTracker()
+        self.playout = PlayoutStream(
+            writer, on_start=self.latency.first_packet,
+            on_drained=self.on_drained)
+        playout_scheduler.register(self.playout)
+        # Фраза из кэша, которая сейчас играет: future станет True, когда
+        # она доиграна целиком, и False, если ее перебили
+        self.phrase_played: Optional[asyncio.Future] = None
+        # Элемент диалога, чье аудио сейчас в потоке, и позиция
+        # (в байтах slin) его начала — для conversation.item.truncate
+        self.current_item_id: Optional[str] = None
+        self.item_start = 0
+        self.barge_in_latencies: list[float] = []
+
+    @property
+    def is_playing(self) -> bool:
+        return bool(self.playout.buffer)
+
+    async def enqueue_audio(self, audio_data, item_id: Optional[str] = None):
         """
-        Основной цикл воспроизведения аудио.
-        
-        Собирает чанки в батчи для более стабильного ресэмплинга,
-        чтобы избежать артефактов и изменения тембра голоса.
+        Конвертирует аудио ответа и передает его в исходящий поток.
+        Отправкой фреймов по дедлайнам занимается общий playout_scheduler.
         """
-        while not self.stop_playback_flag:
-            try:
-                # Ждем первый чанк, чтобы начать цикл
-                first_chunk = await self.audio_queue.get()
-
-                # Собираем все доступные чанки в один батч
-                chunks_to_process = [first_chunk]
-                while not self.audio_queue.empty():
-                    chunks_to_process.append(self.audio_queue.get_nowait())
-
-                # Объединяем в один большой кусок данных
-                audio_batch = b"".join(chunks_to_process)
-
-                if audio_batch:
-                    # Теперь проигрываем весь батч
-                    try:
-                        await self.play_audio(audio_batch)
-                    finally:
-                        # Помечаем все задачи в батче как выполненные
-                        for _ in chunks_to_process:
-                            self.audio_queue.task_done()
-
-            except asyncio.CancelledError:
-                logger.info("Playback loop cancelled.")
-                break
-            except Exception as e:
-                logger.error(f"Ошибка в цикле воспроизведения: {e}")
-
-    async def enqueue_audio(self, audio_data):
-        await self.audio_queue.put(audio_data)
-        if self.playback_task is None or self.playback_task.done():
-            logger.info("Перезапуск воспроизведения")
-            await self.start_playback_loop()
-
-    def clear_audio_queue(self):
-        while not self.audio_queue.empty():
-            self.audio_queue.get_nowait()
-            self.audio_queue.task_done()
-
-    async def stop_playback(self):
-        await asyncio.sleep(INTERRUPT_PAUSE)
-        self.stop_playback_flag = True
-        self.clear_audio_queue()
-        if self.playback_task and not self.playback_task.done():
-            self.playback_task.cancel()
-            try:
-                await self.playback_task
-            except asyncio.CancelledError:
-                logger.info("Проигрывание было отменено")
+        if item_id != self.current_item_id:
+            self.current_item_id = item_id
+            self.item_start = self.playout.bytes_fed
+        await self.playout.put(self.pipeline.convert(audio_data))
 
-    async def play_audio(self, audio_data):
-        audio_data = AudioConverter.resample_audio(
-            audio_data, OPENAI_OUTPUT_RATE, DEFAULT_SAMPLE_RATE
-        )
-        chunk_size = DRAIN_CHUNK_SIZE
-        samples_per_chunk = chunk_size / DEFAULT_SAMPLE_WIDTH
-        pause = samples_per_chunk / DEFAULT_SAMPLE_RATE
+    def play_phrase(self, pcm: memoryview,
+                    played: Optional[asyncio.Future] = None):
+        """
+        Ставит в поток готовую фразу из кэша (slin 8 kHz). played
+        получит результат, когда станет ясно, доиграна ли фраза.
+        """
+        self.resolve_phrase(False)
+        self.phrase_played = played
+        self.current_item_id = None
+        self.item_start = self.playout.bytes_fed
+        self.playout.feed(pcm)
+        self.playout.mark_done()
+
+    def on_drained(self, at: float) -> None:
+        self.latency.playout_end(at)
+        self.resolve_phrase(True)
+
+    def resolve_phrase(self, played: bool) -> None:
+        if self.phrase_played and not self.phrase_played.done():
+            self.phrase_played.set_result(played)
+        self.phrase_played = None
+
+    def played_ms(self) -> int:
+        """Сколько миллисекунд текущего элемента реально отправлено."""
+        played = max(self.playout.bytes_consumed - self.item_start, 0)
+        return played * 1000 // (DEFAULT_SAMPLE_RATE * DEFAULT_SAMPLE_WIDTH)
+
+    def stop_playback(self, speech_onset: Optional[float] = None):
+        """
+        Мгновенно сбрасывает все, что еще не отправлено в Asterisk.
 
-        for chunk in range(0, len(audio_data), chunk_size):
-            chunk_data = AudioConverter.create_audio_packet(
-                audio_data[chunk:chunk + chunk_size]
-            )
-            if chunk_data:
-                self.writer.write(chunk_data)
-                await self.writer.drain()
-                await asyncio.sleep(pause)
+        speech_onset — момент (time.monotonic), когда абонент начал
+        говорить; по нему считается задержка от перебивания до тишины.
+        """
+        self.playout.clear()
+        self.pipeline.reset()
+        self.resolve_phrase(False)
+        self.latency.interrupted(time.monotonic())
+        if speech_onset is not None:
+            latency = self.playout.silence_at() - speech_onset
+            self.barge_in_latencies.append(latency)
+            logger.info(f"Перебивание -> тишина: {latency * 1000:.0f} мс")
 
     async def cleanup(self):
-        await self.stop_playback()
-        await self.clear_audio_queue()
+        self.stop_playback()
+        playout_scheduler.unregister(self.playout)
+        logger.info(
+            f"Статистика воспроизведения: {self.playout.stats.as_dict()}")
+        logger.info(f"Конвейер вывода: {self.pipeline.stats}")
+        if self.barge_in_latencies:
+            logger.info(
+                "Перебивание -> тишина: среднее "
+                f"{mean(self.barge_in_latencies) * 1000:.0f} мс, максимум "
+                f"{max(self.barge_in_latencies) * 1000:.0f} мс")
+
+
+realtime_events = EventRegistry()
 
 
 class AudioWebSocketClient:
@@ -120,116 +144,178 @@ class AudioWebSocketClient:
     Handles interaction with OpenAI Realtime API via WebSocket.
     Adapted to work with reader and writer for audio socket communication.
     """
-    def __init__(
-            self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter,
-            instructions: str, voice="alloy"):
+    def __init__(self, reader, writer, instructions: str, voice="alloy",
+                 vad_config: Optional[VADConfig] = None,
+                 session_pool: Optional[RealtimeSessionPool] = None):
+        """
+        reader — источник пакетов AudioSocket с корутиной read_packets()
+        (StreamPacketReader или AudioSocketProtocol), writer — объект с
+        write/writelines/close (StreamWriter или транспорт протокола).
+        vad_config — настройки локального VAD для этого звонка.
+        session_pool — пул готовых сессий OpenAI, если он включен.
+        """
 
         self.reader = reader
         self.writer = writer
-        self.url = "wss://api.openai.com/v1/realtime"
-        self.model = REALTIME_MODEL
-        self.api_key = OPENAI_API_KEY
+        self.session_pool = session_pool
         self.ws = None
-        self.audio_handler = AudioHandler(self.writer)
+        self.output_pipeline = negotiate_output_pipeline(OUTPUT_FORMATS)
+        self.audio_handler = AudioHandler(self.writer, self.output_pipeline)
+        self.uplink = UplinkAggregator(self.send_message)
+        self.vad = LocalVAD.create(
+            vad_config or VADConfig(), self.uplink.push,
+            self.on_local_speech_start, self.uplink.flush)
+        # Куда отдавать входящие фреймы: через локальный VAD или сразу
+        self.inbound_sink = self.vad.process if self.vad else self.uplink.push
+        self.jitter_buffer = JitterBuffer() if JITTER_BUFFER_ENABLED else None
+        self.jitter_task = None
         self.recieve_events = True
         self.revieve_rtp = True
         self.recieve_timeout = 60
-
-        self.ssl_context = ssl.create_default_context()
-        self.ssl_context.check_hostname = False
-        self.ssl_context.verify_mode = ssl.CERT_NONE
+        self.cleaned_up = False
 
         self.receive_task = None
+        self.stream_uuid: Optional[str] = None
+        self.frames_in = 0
+        self.bytes_in = 0
+        # Приветствие играет с первого фрейма от абонента, а модели
+        # о нем сообщаем, только когда оно доиграно
+        self.greeting_started = False
+        self.greeting_played = asyncio.get_running_loop().create_future()
+        self.greeting_task = None
+        self.recording: Optional[CallRecording] = None
         self.instructions = instructions
         self.voice = voice
 
         self.ai_response_buffer = ''
+        # Номер хода (по закоммиченным репликам абонента), ход каждой
+        # реплики абонента и порядковый номер события транскрипта
+        self.turn_id = 0
+        self.item_turns: dict[str, int] = {}
+        self.transcript_seq = 0
+        self.response_created_at = None
+        self.first_audio_latencies = []
+        self.active_response_id: Optional[str] = None
+        self.cancelled_response_id: Optional[str] = None
 
         # VAD mode (set to null to disable)
         self.VAD_turn_detection = True
-        self.VAD_config = {
-            "type": "server_vad",
-            # Activation threshold (0.0-1.0). A higher threshold will require
-            # louder audio to activate the model.
-            "threshold": 0.6,
-            # Audio to include before the VAD detected speech.
-            "prefix_padding_ms": 300,
-            # Silence to detect speech stop. With lower values the model
-            # will respond more quickly.
-            "silence_duration_ms": 200
-        }
+        self.VAD_config = dict(SERVER_VAD_CONFIG)
 
-        self.session_config = {
-            "modalities": ["audio", "text"],
-            "voice": self.voice,
-            "input_audio_format": INPUT_FORMAT,
-            "output_audio_format": OUTPUT_FORMAT,
-            "turn_detection": (
-                self.VAD_config if self.VAD_turn_detection else None
-            ),
-            "input_audio_transcription": {  # Get transcription of user turns
-                "model": "whisper-1"
-            },
-            "temperature": 0.6
-        }
+        self.session_config = build_session_config(
+            self.instructions, self.voice,
+            self.output_pipeline.openai_format,
+            self.VAD_config if self.VAD_turn_detection else None)
 
     async def connect(self):
         """
         Connect to the WebSocket server.
+
+        Сначала пробует взять готовую сессию из пула, иначе
+        подключается заново.
         """
         if self.ws:
             return
 
-        logger.info(f"Connecting to WebSocket: {self.url}")
-        headers = {
-            "Authorization": f"Bearer {self.api_key}",
-            "OpenAI-Beta": "realtime=v1"
-        }
-
-        self.ws = await websockets.connect(
-            f"{self.url}?model={self.model}",
-            additional_headers=headers,
-            ssl=self.ssl_context
-        )
-        logger.info("Successfully connected to OpenAI Realtime API")
-
-        self.session_config['instructions'] = self.instructions
+        pooled = (
+            await self.session_pool.acquire() if self.session_pool else None)
+        if pooled:
+            self.ws = pooled.ws
+            metrics.ws_connects['pool'] += 1
+            logger.info(f"Сессия взята из пула: {self.session_pool.stats}")
+            if pooled.config != self.session_config:
+                await self.send_event({
+                    "type": "session.update",
+                    "session": self.session_config
+                })
+            else:
+                self.confirm_output_format(
+                    pooled.session.get("output_audio_format"))
+            return
 
-        await self.send_event({
-            "type": "session.update",
-            "session": self.session_config
-        })
+        self.ws = await open_realtime_session(self.session_config)
+        metrics.ws_connects['direct'] += 1
         logger.info("Session set up")
 
     async def send_event(self, event):
         """
         Send an event to the WebSocket server.
         """
-        await self.ws.send(json.dumps(event))
-        logger.debug(f"Sent event: {event}")
+        await self.send_message(json.dumps(event))
+        logger.debug("Sent event: %s", event["type"])
+
+    async def send_message(self, message: str):
+        """
+        Send an already serialized event to the WebSocket server.
+        """
+        await self.ws.send(message)
 
     async def receive_events(self):
         """
         Continuously receive events from the WebSocket server.
+
+        После обрыва соединения переподключается (не больше
+        OPENAI_RECONNECT_ATTEMPTS раз за звонок), чтобы звонок не
+        остался без бота.
         """
+        reconnects = 0
+        while True:
+            try:
+                await self.receive_messages()
+                return
+            except websockets.ConnectionClosedError as e:
+                metrics.ws_disconnects += 1
+                logger.error(f"WebSocket connection closed: {e}")
+            except websockets.ConnectionClosed as e:
+                logger.error(f"WebSocket connection closed: {e}")
+                return
+            except Exception as e:
+                logger.error(f"An unexpected error occurred: {e}")
+                return
+            if reconnects >= OPENAI_RECONNECT_ATTEMPTS:
+                return
+            reconnects += 1
+            if not await self.reconnect():
+                return
+
+    async def receive_messages(self):
+        while self.recieve_events:
+            try:
+                message = await asyncio.wait_for(
+                    self.ws.recv(decode=False),
+                    timeout=self.recieve_timeout
+                )
+                await self.dispatch_message(message)
+            except asyncio.TimeoutError:
+                logger.warning(
+                    f"ВебСокет не отвечал в течении {self.recieve_timeout} секунд. "
+                    "Закрываем соединение.")
+                await self.cleanup()
+                break
+
+    async def reconnect(self) -> bool:
+        """Новая сессия OpenAI вместо оборвавшейся."""
+        self.ws = None
+        self.active_response_id = None
         try:
-            while self.recieve_events:
-                try:
-                    message = await asyncio.wait_for(
-                        self.ws.recv(), timeout=self.recieve_timeout
-                    )
-                    event = json.loads(message)
-                    await self.handle_event(event)
-                except asyncio.TimeoutError:
-                    logger.warning(
-                        f"ВебСокет не отвечал в течении {self.recieve_timeout} секунд. "
-                        "Закрываем соединение.")
-                    await self.cleanup()
-                    break
-        except websockets.ConnectionClosed as e:
-            logger.error(f"WebSocket connection closed: {e}")
+            await self.connect()
         except Exception as e:
-            logger.error(f"An unexpected error occurred: {e}")
+            logger.error(f"Не удалось переподключиться к OpenAI: {e}")
+            return False
+        metrics.ws_reconnects += 1
+        logger.warning("Переподключились к OpenAI, контекст диалога потерян")
+        return True
+
+    async def dispatch_message(self, message: bytes):
+        """
+        Аудио-дельты идут быстрым путем без json.loads,
+        остальные события — через таблицу обработчиков.
+        """
+        delta = parse_audio_delta(message)
+        if delta is not None:
+            await self.on_audio_delta(delta)
+        else:
+            await self.handle_event(json.loads(message))
 
     async def handle_event(self, event):
         """
@@ -237,112 +323,436 @@ class AudioWebSocketClient:
         """
         event_type = event.get("type")
         logger.debug(f"Received event type: {event_type}")
+        handler = realtime_events.get(event_type)
+        if handler:
+            await handler(self, event)
 
-        if event_type == "error":
-            logger.error(f"Error event received: {event['error']['message']}")
-        elif event_type == "response.audio.delta":
-            audio_data = base64.b64decode(event["delta"])
-            await self.audio_handler.enqueue_audio(audio_data)
-        elif event_type == "input_audio_buffer.speech_started":
-            logger.info("📢 Пользователь начал говорить — прерываем ответ")
-            await self.audio_handler.stop_playback()
-        elif event_type == "input_audio_buffer.speech_stopped":
-            logger.info("Speech stopped detected by server VAD")
-        elif event_type == "response.audio_transcript.delta":
-            self.ai_response_buffer += event["delta"]
-        elif event_type == 'response.audio_transcript.done':
-            logger.info(f"Модель: {self.ai_response_buffer}")
-            self.ai_response_buffer = ''
-        elif event_type == 'conversation.item.input_audio_transcription.delta':
-            logger.info(f"Пользователь: {event['delta']}")
-        else:
-            # logger.info(f"Unhandled event type: {event_type}")
-            pass
+    async def on_audio_delta(self, delta: AudioDelta):
+        if delta.response_id == self.cancelled_response_id:
+            # Хвост отмененного ответа не декодируем и не играем
+            return
+        if self.response_created_at is not None:
+            self.first_audio_latencies.append(
+                time.monotonic() - self.response_created_at)
+            self.response_created_at = None
+        self.audio_handler.latency.first_delta(time.monotonic())
+        # a2b_base64 выделяет bytes на каждую дельту, но декодирование
+        # в переиспользуемый буфер средствами numpy в 1.5-2.5 раза
+        # медленнее (см. benchmarks/dispatch_benchmark.py)
+        audio_data = binascii.a2b_base64(delta.delta)
+        await self.audio_handler.enqueue_audio(audio_data, delta.item_id)
+
+    @realtime_events.on("response.audio.delta")
+    async def handle_audio_delta(self, event):
+        await self.on_audio_delta(AudioDelta(
+            event.get("response_id"), event.get("item_id"), event["delta"]))
+
+    @realtime_events.on("error")
+    async def handle_error(self, event):
+        logger.error(f"Error event received: {event['error']['message']}")
+
+    @realtime_events.on("response.created")
+    async def handle_response_created(self, event):
+        self.response_created_at = time.monotonic()
+        self.active_response_id = event["response"]["id"]
+
+    @realtime_events.on("response.done")
+    async def handle_response_done(self, event):
+        self.active_response_id = None
+
+    @realtime_events.on("session.updated")
+    async def handle_session_updated(self, event):
+        self.confirm_output_format(
+            event["session"].get("output_audio_format"))
+
+    @realtime_events.on("response.audio.done")
+    async def handle_audio_done(self, event):
+        self.audio_handler.playout.mark_done()
+
+    @realtime_events.on("input_audio_buffer.speech_started")
+    async def handle_speech_started(self, event):
+        await self.uplink.flush()
+        if self.greeting_playing:
+            logger.info("Абонент заговорил во время приветствия")
+            return
+        logger.info("📢 Пользователь начал говорить — прерываем ответ")
+        await self.interrupt(time.monotonic())
+
+    @realtime_events.on("input_audio_buffer.speech_stopped")
+    async def handle_speech_stopped(self, event):
+        logger.info("Speech stopped detected by server VAD")
+        self.audio_handler.latency.speech_stopped(time.monotonic())
+        await self.uplink.flush()
+
+    @realtime_events.on("response.audio_transcript.delta")
+    async def handle_transcript_delta(self, event):
+        self.ai_response_buffer += event["delta"]
+
+    @realtime_events.on("response.audio_transcript.done")
+    async def handle_transcript_done(self, event):
+        logger.info(f"Модель: {self.ai_response_buffer}")
+        self.journal_transcript(
+            'assistant', event.get('transcript', self.ai_response_buffer),
+            event.get('item_id'), self.turn_id)
+        self.ai_response_buffer = ''
+
+    @realtime_events.on("conversation.item.input_audio_transcription.delta")
+    async def handle_user_transcript_delta(self, event):
+        logger.info(f"Пользователь: {event['delta']}")
+
+    @realtime_events.on("input_audio_buffer.committed")
+    async def handle_input_committed(self, event):
+        self.turn_id += 1
+        self.item_turns[event['item_id']] = self.turn_id
+
+    @realtime_events.on(
+        "conversation.item.input_audio_transcription.completed")
+    async def handle_user_transcript_completed(self, event):
+        # Транскрипция приходит с опозданием, уже после ответа бота,
+        # поэтому ход берется по item_id, а не текущий
+        item_id = event.get('item_id')
+        self.journal_transcript(
+            'user', event.get('transcript', ''), item_id,
+            self.item_turns.pop(item_id, self.turn_id))
+
+    def journal_transcript(self, role: str, text: str,
+                           item_id: Optional[str], turn_id: int):
+        """Реплика в журнал транскриптов (запись в БД — фоном)."""
+        if not JOURNAL_ENABLED or not text.strip():
+            return
+        self.transcript_seq += 1
+        transcript_journal.record(
+            self.stream_uuid, turn_id, role, text.strip(), item_id,
+            self.transcript_seq)
+
+    async def on_local_speech_start(self):
+        """
+        Локальный VAD услышал абонента: отправляем начало фразы сразу
+        и прерываем ответ бота, не дожидаясь серверного VAD.
+        """
+        await self.uplink.flush()
+        if self.audio_handler.is_playing and not self.greeting_playing:
+            logger.info("📢 Локальный VAD: абонент перебил бота")
+            self.vad.stats.barge_ins += 1
+            # VAD срабатывает спустя speech_start_ms после начала речи
+            await self.interrupt(
+                time.monotonic() - self.vad.config.speech_start_ms / 1000)
+
+    async def interrupt(self, speech_onset: float):
+        """
+        Прерывает ответ бота: сразу сбрасывает несыгранное аудио,
+        отменяет генерацию ответа и обрезает элемент диалога до реально
+        сыгранного, чтобы модель знала, что абонент услышал.
+        """
+        item_id = self.audio_handler.current_item_id
+        was_playing = self.audio_handler.is_playing
+        played_ms = self.audio_handler.played_ms()
+        self.audio_handler.stop_playback(
+            speech_onset if was_playing else None)
+
+        if self.active_response_id and (
+                self.active_response_id != self.cancelled_response_id):
+            self.cancelled_response_id = self.active_response_id
+            await self.send_event({"type": "response.cancel"})
+        if was_playing and item_id:
+            await self.send_event({
+                "type": "conversation.item.truncate",
+                "item_id": item_id,
+                "content_index": 0,
+                "audio_end_ms": played_ms
+            })
+
+    def confirm_output_format(self, output_format: str):
+        """
+        Сверяет формат вывода, который принял сервер, с выбранным
+        конвейером и при расхождении переключает конвейер.
+        """
+        if output_format == self.output_pipeline.openai_format:
+            return
+        logger.warning(
+            f"Сервер выбрал формат вывода {output_format} вместо "
+            f"{self.output_pipeline.openai_format}, меняем конвейер")
+        self.output_pipeline = create_output_pipeline(output_format)
+        self.audio_handler.pipeline = self.output_pipeline
+
+    def start_recording(self):
+        """Пишет оба плеча звонка в стерео WAV в отдельном потоке."""
+        self.recording = recording_writer.start_recording(self.stream_uuid)
+        self.audio_handler.playout.tap = self.recording.bot
+
+    def play_greeting(self):
+        """
+        Играет приветствие из кэша фраз, не дожидаясь модели.
+
+        Вызывается на первом фрейме от абонента: externalMedia попадает
+        в бридж только после ответа, и до этого звук в него уходит
+        в пустоту.
+        """
+        self.greeting_started = True
+        greeting = phrase_cache.get(GREETING_PHRASE)
+        if greeting is None:
+            self.greeting_played.set_result(False)
+            return
+        self.audio_handler.play_phrase(greeting, self.greeting_played)
+        logger.info(f"Приветствие из кэша: {phrase_cache.stats}")
+
+    @property
+    def greeting_playing(self) -> bool:
+        """
+        Приветствие еще звучит. Его не прерываем: сразу после ответа
+        абонент обычно говорит «Алло?», и VAD обрезал бы приветствие
+        на первых же миллисекундах.
+        """
+        return self.greeting_started and not self.greeting_played.done()
+
+    async def announce_greeting(self):
+        """Добавляет доигранное приветствие в диалог, чтобы модель его
+        не повторяла."""
+        text = phrase_cache.texts.get(GREETING_PHRASE)
+        if not await self.greeting_played or not text:
+            return
+        await self.send_event({
+            "type": "conversation.item.create",
+            "item": {
+                "type": "message",
+                "role": "assistant",
+                "content": [{"type": "text", "text": text}]
+            }
+        })
+        self.journal_transcript('assistant', text, None, 0)
 
     async def background_tasks(self):
         # Connect to RealtimeAPI ws
         await self.connect()
+        self.greeting_task = asyncio.create_task(self.announce_greeting())
 
         # Start receiving events in the background
         self.receive_task = asyncio.create_task(self.receive_events())
 
+        if self.jitter_buffer:
+            self.jitter_task = asyncio.create_task(
+                self.jitter_buffer.run(self.inbound_sink))
+
+    async def handle_packet(self, packet_type: int, packet_length: int,
+                            payload: memoryview) -> bool:
+        """
+        Обрабатывает один пакет AudioSocket.
+
+        payload — срез буфера парсера, поэтому он должен быть прочитан
+        до первого await. Возвращает False, если звонок завершен.
+        """
+        if packet_type == AUDIO_TYPE:
+            if not self.greeting_started:
+                self.play_greeting()
+            self.frames_in += 1
+            self.bytes_in += len(payload)
+            if self.recording:
+                self.recording.caller(payload)
+            if self.jitter_buffer:
+                self.jitter_buffer.put(payload)
+            else:
+                await self.inbound_sink(payload)
+        elif packet_type == UUID_TYPE:
+            self.stream_uuid = str(uuid.UUID(bytes=bytes(payload)))
+            logger.info(f"Получен UUID потока: {self.stream_uuid}")
+            if RECORDING_ENABLED:
+                self.start_recording()
+            await self.background_tasks()
+        elif packet_type == HANGUP_TYPE:
+            logger.info("Asterisk завершил звонок")
+            return False
+        elif packet_type == ERROR_TYPE:
+            logger.error(f"Asterisk сообщил об ошибке: {payload.hex()}")
+        else:
+            logger.warning(
+                "Получен не голосовой пакет. "
+                f"Тип: {hex(packet_type)}, "
+                f"длина: {packet_length}"
+            )
+        return True
+
     async def run(self):
         """
         Main loop for handling audio socket interaction.
         """
-
-        parser = AudioSocketParser()
-
+        call_counter.increment()
+        metrics.call_started(self)
         try:
             while self.revieve_rtp:
-                # Receive audio data from reader
-                data = await self.reader.read(READER_BYTES_LIMIT)
-                if data:
-                    parser.buffer.extend(data)
-                    parse_result = parser.parse_packet()
-                    if parse_result:
-                        packet_type, packet_length, payload = parse_result
-                        if packet_type == UUID_TYPE:
-                            stream_uuid = str(uuid.UUID(bytes=payload))
-                            logger.info(
-                                f"Получен UUID потока: {stream_uuid}"
-                            )
-                            await self.background_tasks()
-                        elif packet_type == AUDIO_TYPE:
-                            base64_data = base64.b64encode(
-                                payload).decode(BYTES_ENCODING)
-                            await self.send_event({
-                                "type": "input_audio_buffer.append",
-                                "audio": base64_data
-                            })
-                        else:
-                            logger.warning(
-                                "Получен не голосовой пакет. "
-                                f"Тип: {hex(packet_type)}, "
-                                f"длина: {packet_length}"
-                            )
-                    else:
-                        logger.warning('Попытка распарсить пакет потерпела неудачу.')
-                else:
+                # Разбираем каждый целый пакет из принятых данных,
+                # а не только первый
+                packets = await self.reader.read_packets()
+                if packets is None:
                     raise ValueError('No data from external media')
+                for packet in packets:
+                    if not await self.handle_packet(*packet):
+                        self.revieve_rtp = False
+                        break
 
         except Exception as e:
             logger.error(f"Error in audio socket communication: {e}")
 
         finally:
+            call_counter.decrement()
+            metrics.call_finished(self)
             await self.cleanup()
 
+    def memory_footprint(self) -> int:
+        """Память под аудиобуферы звонка, байт (для планирования узла)."""
+        footprint = (
+            self.audio_handler.playout.footprint
+            + self.reader.parser.capacity
+            + self.output_pipeline.footprint
+            + len(self.uplink.buffer))
+        if self.jitter_buffer:
+            footprint += self.jitter_buffer.footprint
+        return footprint
+
+    def call_totals(self) -> dict:
+        """Счетчики звонка для метрик."""
+        playout = self.audio_handler.playout
+        return {
+            'frames_in': self.frames_in,
+            'frames_out': playout.stats.frames_sent,
+            'bytes_in': self.bytes_in,
+            'bytes_out': playout.bytes_sent,
+            'output_cpu_seconds': self.output_pipeline.cpu_time,
+        }
+
     async def cleanup(self):
         """
         Clean up resources by closing the WebSocket and audio handler.
         """
+        # Вызывается и по таймауту WebSocket, и в конце run(): статистику
+        # и запись задержек звонка отдаем только один раз
+        if self.cleaned_up:
+            return
+        self.cleaned_up = True
+        if self.jitter_task:
+            self.jitter_task.cancel()
+            logger.info(
+                f"Джиттер-буфер: {self.jitter_buffer.stats.as_dict()}")
+        if self.vad:
+            logger.info(f"Локальный VAD: {self.vad.stats.as_dict()}")
+        self.uplink.close()
+        logger.info(f"Статистика отправки аудио: {self.uplink.stats}")
+        logger.info(f"Память аудиобуферов звонка: "
+                    f"{self.memory_footprint()} байт")
+        if self.recording:
+            self.audio_handler.playout.tap = None
+            self.recording.close()
+            self.recording = None
+            logger.info(f"Запись звонков: {recording_writer.report()}")
+        if self.first_audio_latencies:
+            logger.info(
+                f"Первое аудио ответа ({self.output_pipeline.openai_format})"
+                f": среднее {mean(self.first_audio_latencies):.3f} с, "
+                f"максимум {max(self.first_audio_latencies):.3f} с")
+        write_latency_record(self.audio_handler.latency.record(
+            call_id=self.stream_uuid, node_pid=os.getpid(),
+            output_format=self.output_pipeline.openai_format,
+            local_vad=self.vad is not None,
+            server_vad=self.VAD_config if self.VAD_turn_detection else None,
+        ))
+        logger.info(f"Задержки узла: {node_latency.summary()}")
         if self.ws:
             await self.ws.close()
-        self.receive_task.cancel()
+        if self.receive_task:
+            self.receive_task.cancel()
+        if self.greeting_task:
+            self.greeting_task.cancel()
         await self.audio_handler.cleanup()
+        self.writer.close()
+
+
+def build_session_config(instructions: str, voice: str, output_format: str,
+                         turn_detection: Optional[dict]) -> dict:
+    return {
+        "modalities": ["audio", "text"],
+        "instructions": instructions,
+        "voice": voice,
+        "input_audio_format": INPUT_FORMAT,
+        "output_audio_format": output_format,
+        "turn_detection": turn_detection,
+        "input_audio_transcription": {  # Get transcription of user turns
+            "model": "whisper-1"
+        },
+        "temperature": 0.6
+    }
+
+
+def create_client(reader, writer,
+                  session_pool: Optional[RealtimeSessionPool] = None,
+                  vad_config: Optional[VADConfig] = None
+                  ) -> AudioWebSocketClient:
+    """
+    Клиент нового звонка. vad_config — настройки VAD этого звонка;
+    если не заданы, для звонка создаются свои из окружения.
+    """
+    return AudioWebSocketClient(
+        reader, writer, INSTRUCTIONS, vad_config=vad_config or VADConfig(),
+        session_pool=session_pool)
 
 
-async def handle_audiosocket_connection(reader, writer):
+async def handle_audiosocket_connection(reader, writer, client_factory):
     """
     Handle connection for audio socket and OpenAI Realtime communication.
     """
-    client = AudioWebSocketClient(reader, writer, INSTRUCTIONS)
+    client = client_factory(StreamPacketReader(reader), writer)
     await client.run()
 
 
-async def main():
+async def main(worker: Optional[int] = None):
     """
     Main entry point for the server.
+
+    worker — номер воркера супервизора (порт тогда общий, SO_REUSEPORT).
     """
-    server = await asyncio.start_server(
-        handle_audiosocket_connection, HOST, PORT
-    )
+    reuse_port = worker is not None
+    phrase_cache.load()
+    if JOURNAL_ENABLED:
+        transcript_journal.start()
+    if METRICS_PORT:
+        await metrics.start(worker)
+    session_pool = RealtimeSessionPool(build_session_config(
+        INSTRUCTIONS, "alloy",
+        negotiate_output_pipeline(OUTPUT_FORMATS).openai_format,
+        SERVER_VAD_CONFIG))
+    session_pool.start()
+    client_factory = partial(create_client, session_pool=session_pool)
+
+    if SERVER_MODE == 'protocol':
+        loop = asyncio.get_running_loop()
+        server = await loop.create_server(
+            lambda: AudioSocketProtocol(client_factory), HOST, PORT,
+            reuse_port=reuse_port
+        )
+    else:
+        server = await asyncio.start_server(
+            partial(handle_audiosocket_connection,
+                    client_factory=client_factory), HOST, PORT,
+            reuse_port=reuse_port
+        )
     addrs = ', '.join(str(sock.getsockname()) for sock in server.sockets)
-    logger.info(f'Serving on {addrs}')
+    logger.info(f'Serving on {addrs} ({SERVER_MODE} mode)')
+    # Узел объявляет емкость, только когда уже принимает соединения
+    node_reporter.start(worker)
+
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        await metrics.stop()
+
 
-    async with server:
-        await server.serve_forever()
+def run_worker(index: int):
+    """Воркер супервизора: свой event loop на общем порту."""
+    logger.info(f"Воркер {index} слушает {HOST}:{PORT}")
+    asyncio.run(main(worker=index))
 
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    if WORKERS > 1:
+        Supervisor(WORKERS, run_worker).run()
+    else:
+        asyncio.run(main())
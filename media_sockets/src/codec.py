@@ -0,0 +1,131 @@
+"""
+G.711 A-law/µ-law кодек на таблицах и индексации NumPy.
+
+Замена audioop (удален в Python 3.13): таблицы строятся один раз при
+импорте по тем же формулам, что и в audioop, поэтому результат
+бит-в-бит совпадает с audioop.alaw2lin/lin2alaw/ulaw2lin/lin2ulaw
+для 16-битного PCM.
+"""
+from typing import Optional
+
+import numpy as np
+
+_SEG_AEND = (0x1F, 0x3F, 0x7F, 0xFF, 0x1FF, 0x3FF, 0x7FF, 0xFFF)
+_SEG_UEND = (0x3F, 0x7F, 0xFF, 0x1FF, 0x3FF, 0x7FF, 0xFFF, 0x1FFF)
+_ULAW_BIAS = 0x84
+_ULAW_CLIP = 8159
+
+
+def _segment(value: int, table: tuple) -> int:
+    for seg, end in enumerate(table):
+        if value <= end:
+            return seg
+    return len(table)
+
+
+def _alaw_to_linear(a_val: int) -> int:
+    a_val ^= 0x55
+    t = (a_val & 0x0F) << 4
+    seg = (a_val & 0x70) >> 4
+    if seg == 0:
+        t += 8
+    elif seg == 1:
+        t += 0x108
+    else:
+        t = (t + 0x108) << (seg - 1)
+    return t if a_val & 0x80 else -t
+
+
+def _ulaw_to_linear(u_val: int) -> int:
+    u_val = ~u_val & 0xFF
+    t = (((u_val & 0x0F) << 3) + _ULAW_BIAS) << ((u_val & 0x70) >> 4)
+    return _ULAW_BIAS - t if u_val & 0x80 else t - _ULAW_BIAS
+
+
+def _linear_to_alaw(sample: int) -> int:
+    pcm_val = sample >> 3
+    if pcm_val >= 0:
+        mask = 0xD5
+    else:
+        mask = 0x55
+        pcm_val = -pcm_val - 1
+    seg = _segment(pcm_val, _SEG_AEND)
+    if seg >= 8:
+        return 0x7F ^ mask
+    shift = 1 if seg < 2 else seg
+    return ((seg << 4) | ((pcm_val >> shift) & 0x0F)) ^ mask
+
+
+def _linear_to_ulaw(sample: int) -> int:
+    pcm_val = sample >> 2
+    if pcm_val < 0:
+        pcm_val = -pcm_val
+        mask = 0x7F
+    else:
+        mask = 0xFF
+    pcm_val = min(pcm_val, _ULAW_CLIP) + (_ULAW_BIAS >> 2)
+    seg = _segment(pcm_val, _SEG_UEND)
+    if seg >= 8:
+        return 0x7F ^ mask
+    return ((seg << 4) | ((pcm_val >> (seg + 1)) & 0x0F)) ^ mask
+
+
+def _build_encode_table(encode) -> np.ndarray:
+    """Таблица на все 65536 значений int16, индекс — их uint16 вид."""
+    samples = np.arange(65536, dtype=np.uint16).view(np.int16)
+    return np.array([encode(int(s)) for s in samples], dtype=np.uint8)
+
+
+ALAW_DECODE_TABLE = np.array(
+    [_alaw_to_linear(code) for code in range(256)], dtype=np.int16)
+ULAW_DECODE_TABLE = np.array(
+    [_ulaw_to_linear(code) for code in range(256)], dtype=np.int16)
+ALAW_ENCODE_TABLE = _build_encode_table(_linear_to_alaw)
+ULAW_ENCODE_TABLE = _build_encode_table(_linear_to_ulaw)
+
+for _table in (ALAW_DECODE_TABLE, ULAW_DECODE_TABLE,
+               ALAW_ENCODE_TABLE, ULAW_ENCODE_TABLE):
+    _table.flags.writeable = False
+
+# Значение "тишины" в каждом законе (кодирование нулевого отсчета)
+ALAW_SILENCE = int(ALAW_ENCODE_TABLE[0])
+ULAW_SILENCE = int(ULAW_ENCODE_TABLE[0])
+
+
+def _decode(table: np.ndarray, data,
+            out: Optional[np.ndarray]) -> np.ndarray:
+    codes = np.frombuffer(data, dtype=np.uint8)
+    if out is not None:
+        out = out[:len(codes)]
+    return np.take(table, codes, out=out)
+
+
+def _encode(table: np.ndarray, pcm,
+            out: Optional[np.ndarray]) -> np.ndarray:
+    samples = np.frombuffer(pcm, dtype=np.uint16)
+    if out is not None:
+        out = out[:len(samples)]
+    return np.take(table, samples, out=out)
+
+
+def alaw_decode(data, out: Optional[np.ndarray] = None) -> np.ndarray:
+    """
+    A-law -> PCM16. Если передан out (int16, не короче входа),
+    результат пишется в него без выделения памяти.
+    """
+    return _decode(ALAW_DECODE_TABLE, data, out)
+
+
+def ulaw_decode(data, out: Optional[np.ndarray] = None) -> np.ndarray:
+    """µ-law -> PCM16, аналогично alaw_decode."""
+    return _decode(ULAW_DECODE_TABLE, data, out)
+
+
+def alaw_encode(pcm, out: Optional[np.ndarray] = None) -> np.ndarray:
+    """PCM16 -> A-law. out — массив uint8 не короче числа отсчетов."""
+    return _encode(ALAW_ENCODE_TABLE, pcm, out)
+
+
+def ulaw_encode(pcm, out: Optional[np.ndarray] = None) -> np.ndarray:
+    """PCM16 -> µ-law, аналогично alaw_encode."""
+    return _encode(ULAW_ENCODE_TABLE, pcm, out)
@@ -2,28 +2,185 @@ import os
 
 HOST = '0.0.0.0'
 PORT = 7575
+# stream — asyncio.start_server (StreamReader/StreamWriter),
+# protocol — asyncio.BufferedProtocol с предвыделенными буферами
+SERVER_MODE = os.environ.get('AUDIOSOCKET_SERVER_MODE', 'stream')
+# Число процессов-воркеров на одном порту (SO_REUSEPORT).
+# 1 — без супервизора, как раньше.
+WORKERS = int(os.environ.get('WORKERS', 1))
+# Пауза перед перезапуском упавшего воркера, период проверки
+# воркеров и вывода их статистики, с
+WORKER_RESTART_DELAY = 1
+WORKER_POLL_INTERVAL = 1
+WORKER_STATS_INTERVAL = 60
+
+# HTTP-сервер метрик Prometheus (в том же event loop), 0 — выключен.
+# Воркеры супервизора слушают METRICS_PORT + номер воркера.
+METRICS_HOST = '0.0.0.0'
+METRICS_PORT = int(os.environ.get('METRICS_PORT', 9100))
+# Период замера задержки event loop, с
+LOOP_LAG_INTERVAL = 0.5
+
+# Бэкенд (сервис fast_api в docker-compose): туда уходят отчеты узла
+# и журнал транскриптов
+BACKEND_URL = os.environ.get('BACKEND_URL', 'http://fast_api:9000')
+
+# Отчеты о емкости узла бэкенду (выбор узла для externalMedia).
+# NODE_ADDRESS — host:port, по которому Asterisk достанет этот узел;
+# без него отчеты не отправляются. NODE_MAX_CALLS — звонков на узел.
+NODE_ID = os.environ.get('NODE_ID')
+NODE_ADDRESS = os.environ.get('NODE_ADDRESS')
+NODE_MAX_CALLS = int(os.environ.get('NODE_MAX_CALLS', 100))
+NODE_REPORT_URL = os.environ.get(
+    'NODE_REPORT_URL', f'{BACKEND_URL}/api/v1/nodes/heartbeat')
+NODE_REPORT_INTERVAL = 5
+NODE_REPORT_TIMEOUT = 3
 
 DEFAULT_SAMPLE_RATE = 8000
 DEFAULT_SAMPLE_WIDTH = 2
 OPENAI_OUTPUT_RATE = 24000
 DRAIN_CHUNK_SIZE = 320
-INTERRUPT_PAUSE = 0.5
+FRAME_DURATION = DRAIN_CHUNK_SIZE / DEFAULT_SAMPLE_WIDTH / DEFAULT_SAMPLE_RATE
+# Сколько фреймов подряд можно отправить, догоняя после задержки цикла
+PLAYOUT_MAX_BURST = 5
+# Бюджет памяти на исходящий буфер звонка (мс аудио slin 8 kHz) и что
+# делать при переполнении: pause — не читать OpenAI, пока не освободится
+# место, drop_oldest — выбрасывать самое старое несыгранное аудио.
+PLAYOUT_BUFFER_MS = int(os.environ.get('PLAYOUT_BUFFER_MS', 30000))
+PLAYOUT_BUFFER_BYTES = (
+    round(PLAYOUT_BUFFER_MS / 1000 / FRAME_DURATION) * DRAIN_CHUNK_SIZE)
+PLAYOUT_OVERFLOW_POLICY = os.environ.get('PLAYOUT_OVERFLOW_POLICY', 'pause')
 READER_HEADER_SIZE = 3
 READER_PAYLOAD_SIZE = 160
 READER_BYTES_LIMIT = READER_PAYLOAD_SIZE + READER_HEADER_SIZE
+# Сколько мс исходящего аудио может стоять в буфере записи транспорта.
+# Выше этой отметки Asterisk не успевает забирать фреймы, и новые
+# выбрасываются, а не копятся в памяти и задержке.
+PLAYOUT_WRITE_HIGH_WATER_MS = 200
+PLAYOUT_WRITE_HIGH_WATER = (
+    round(PLAYOUT_WRITE_HIGH_WATER_MS / 1000 / FRAME_DURATION)
+    * (DRAIN_CHUNK_SIZE + READER_HEADER_SIZE))
+# Читаем сразу все, что накопилось в сокете, а не по одному пакету
+READER_BUFFER_SIZE = 4096
+PARSER_BUFFER_SIZE = 4 * READER_BUFFER_SIZE
+# Больше парсер не растет: самый длинный пакет AudioSocket и одно чтение
+PARSER_MAX_BUFFER_SIZE = READER_HEADER_SIZE + 0xffff + READER_BUFFER_SIZE
+
+# Потоковый ресэмплер: длина фильтра на фазу (как у resample_poly),
+# параметр окна Кайзера и точность квантования коэффициентов.
+RESAMPLER_HALF_TAPS = 10
+RESAMPLER_KAISER_BETA = 5.0
+RESAMPLER_FRACTION_BITS = 15
+
+# Адаптивный джиттер-буфер на входящем аудио (по умолчанию выключен):
+# глубина в фреймах и множитель оценки джиттера для целевой глубины.
+JITTER_BUFFER_ENABLED = (
+    os.environ.get('JITTER_BUFFER_ENABLED', 'false').lower() == 'true')
+JITTER_MIN_FRAMES = 2
+JITTER_MAX_FRAMES = 10
+JITTER_FACTOR = 3
+# После стольких замаскированных подряд фреймов буфер наполняется заново
+JITTER_CONCEAL_LIMIT = 5
+
+# Локальный VAD (webrtcvad) на входящем аудио: подавление тишины
+# и быстрое прерывание ответа бота (по умолчанию выключен). Пороги —
+# значения по умолчанию для VADConfig, который создается на каждый звонок.
+LOCAL_VAD_ENABLED = (
+    os.environ.get('LOCAL_VAD_ENABLED', 'false').lower() == 'true')
+LOCAL_VAD_AGGRESSIVENESS = int(os.environ.get('LOCAL_VAD_AGGRESSIVENESS', 2))
+LOCAL_VAD_SPEECH_START_MS = int(
+    os.environ.get('LOCAL_VAD_SPEECH_START_MS', 60))
+LOCAL_VAD_HANGOVER_MS = int(os.environ.get('LOCAL_VAD_HANGOVER_MS', 600))
+LOCAL_VAD_PADDING_MS = int(os.environ.get('LOCAL_VAD_PADDING_MS', 300))
+
+# Границы корзин гистограмм задержек хода, мс, и файл для JSONL-записей
+# о задержках звонков (если не задан — записи идут в лог)
+LATENCY_BUCKETS_MS = (50, 100, 200, 300, 500, 750, 1000, 1500, 2000,
+                      3000, 5000)
+LATENCY_RECORD_PATH = os.environ.get('LATENCY_RECORD_PATH')
+
+# Кэш заранее озвученных фраз: каталог с исходниками (<имя>.mp3 и
+# необязательный <имя>.txt с текстом), лимит отображенных в память байт
+# и фраза, которая играет сразу при подключении звонка.
+PHRASE_CACHE_DIR = os.environ.get('PHRASE_CACHE_DIR', 'phrases')
+PHRASE_CACHE_MAX_BYTES = int(
+    os.environ.get('PHRASE_CACHE_MAX_BYTES', 32 * 1024 * 1024))
+PHRASE_SOURCE_EXTENSIONS = ('.mp3', '.wav', '.ogg', '.flac')
+GREETING_PHRASE = os.environ.get('GREETING_PHRASE', 'greeting')
+
+# Запись звонков самим media_sockets (стерео WAV: абонент и бот).
+# Лимит очереди писателя в фреймах, период опроса очереди и задержка,
+# после которой недостающее аудио канала считается тишиной, с.
+RECORDING_ENABLED = (
+    os.environ.get('RECORDING_ENABLED', 'false').lower() == 'true')
+RECORDING_DIR = os.environ.get('RECORDING_DIR', 'recordings')
+RECORDING_QUEUE_LIMIT = 5000
+RECORDING_POLL_INTERVAL = 0.05
+RECORDING_DELAY = 1.0
+
+# Журнал транскриптов (по умолчанию выключен): события пишутся пачками
+# раз в FLUSH_INTERVAL с в локальные JSONL-сегменты, сегмент закрывается
+# по размеру (байт) или возрасту (с), закрытые сегменты отправляются
+# в бэкенд (пустой JOURNAL_SHIP_URL — не отправлять). При ошибках
+# отправки пауза растет вдвое до JOURNAL_SHIP_MAX_BACKOFF, с.
+JOURNAL_ENABLED = (
+    os.environ.get('JOURNAL_ENABLED', 'false').lower() == 'true')
+JOURNAL_DIR = os.environ.get('JOURNAL_DIR', 'journal')
+JOURNAL_SEGMENT_MAX_BYTES = 1024 * 1024
+JOURNAL_SEGMENT_MAX_AGE = 30
+JOURNAL_FLUSH_INTERVAL = 1
+JOURNAL_SHIP_URL = os.environ.get(
+    'JOURNAL_SHIP_URL', f'{BACKEND_URL}/api/v1/calls/transcripts')
+JOURNAL_SHIP_INTERVAL = 5
+JOURNAL_SHIP_TIMEOUT = 10
+JOURNAL_SHIP_MAX_BACKOFF = 300
 
 CHANNEL_COUNT = 1
+# A-law: один байт на отсчет
+INPUT_BYTES_PER_MS = DEFAULT_SAMPLE_RATE // 1000
+# Сколько входящего аудио склеивать в одно input_audio_buffer.append
+UPLINK_WINDOW_MS = int(os.environ.get('UPLINK_WINDOW_MS', 100))
 DEFAULT_LANG = 'ru'
 INPUT_FORMAT = 'g711_alaw'
-OUTPUT_FORMAT = 'pcm16'
+# Форматы вывода OpenAI, которые разрешено запрашивать. Для звонка
+# выбирается самый дешевый конвейер (G.711 не требует ресэмплинга).
+OUTPUT_FORMATS = os.environ.get(
+    'OUTPUT_FORMATS', 'g711_alaw,g711_ulaw,pcm16').split(',')
 
 BYTES_ENCODING = 'utf-8'
 
+HANGUP_TYPE = 0x00
 UUID_TYPE = 0x01
 AUDIO_TYPE = 0x10
+ERROR_TYPE = 0xff
 
 
 REALTIME_MODEL = "gpt-4o-mini-realtime-preview-2024-12-17"
-REALTIME_URL = f"wss://api.openai.com/v1/realtime?model={REALTIME_MODEL}"
+# Переопределяется для нагрузочного теста (benchmarks/loadtest.py)
+REALTIME_URL = os.environ.get(
+    'REALTIME_URL', f"wss://api.openai.com/v1/realtime?model={REALTIME_MODEL}")
+
+# Серверный VAD (turn_detection) сессии
+SERVER_VAD_CONFIG = {
+    "type": "server_vad",
+    # Activation threshold (0.0-1.0). A higher threshold will require
+    # louder audio to activate the model.
+    "threshold": 0.6,
+    # Audio to include before the VAD detected speech.
+    "prefix_padding_ms": 300,
+    # Silence to detect speech stop. With lower values the model
+    # will respond more quickly.
+    "silence_duration_ms": 200
+}
+
+# Пул заранее подключенных сессий OpenAI: сколько держать наготове,
+# через сколько секунд простоя закрывать, сколько ждать session.updated
+SESSION_POOL_SIZE = int(os.environ.get('SESSION_POOL_SIZE', 2))
+SESSION_POOL_IDLE_TTL = int(os.environ.get('SESSION_POOL_IDLE_TTL', 600))
+SESSION_READY_TIMEOUT = 10
+# Сколько раз за звонок переподключаться к OpenAI после обрыва
+# WebSocket (контекст диалога при этом теряется)
+OPENAI_RECONNECT_ATTEMPTS = int(
+    os.environ.get('OPENAI_RECONNECT_ATTEMPTS', 2))
 
 OPENAI_API_KEY = os.environ.get('OPENAI_KEY')
@@ -0,0 +1,68 @@
+from dataclasses import dataclass
+from typing import Callable, Optional
+
+# Аудио-дельты — основная часть трафика от OpenAI. Сервер присылает
+# компактный JSON, поэтому тип и нужные поля можно достать поиском
+# подстроки, не разбирая весь документ. Порядок полей не важен.
+AUDIO_DELTA_TYPE = b'"type":"response.audio.delta"'
+
+
+@dataclass
+class AudioDelta:
+    """Поля response.audio.delta, нужные для воспроизведения."""
+
+    response_id: Optional[str]
+    item_id: Optional[str]
+    # base64 аудио — срез исходного сообщения без копирования
+    delta: memoryview
+
+
+class EventRegistry:
+    """Таблица обработчиков событий по их типу."""
+
+    def __init__(self):
+        self.handlers: dict[str, Callable] = {}
+
+    def on(self, *event_types: str) -> Callable:
+        """Декоратор: регистрирует метод как обработчик событий."""
+        def decorator(func: Callable) -> Callable:
+            for event_type in event_types:
+                self.handlers[event_type] = func
+            return func
+        return decorator
+
+    def get(self, event_type: str) -> Optional[Callable]:
+        return self.handlers.get(event_type)
+
+
+def _string_field(message: bytes, key: bytes) -> Optional[tuple[int, int]]:
+    """Границы строкового значения поля key (без экранирования)."""
+    start = message.find(key)
+    if start < 0:
+        return None
+    start += len(key)
+    end = message.find(b'"', start)
+    if end < 0:
+        return None
+    return start, end
+
+
+def parse_audio_delta(message: bytes) -> Optional[AudioDelta]:
+    """
+    Быстрый разбор response.audio.delta без json.loads.
+    Возвращает None для любых других сообщений (и если формат
+    неожиданный) — тогда сообщение идет обычным путем.
+    """
+    delta = _string_field(message, b'"delta":"')
+    if delta is None:
+        return None
+    # Тип ищем вне самого аудио: до и после значения delta
+    start, end = delta
+    if (message.find(AUDIO_DELTA_TYPE, 0, start) < 0
+            and message.find(AUDIO_DELTA_TYPE, end) < 0):
+        return None
+    ids = []
+    for key in (b'"response_id":"', b'"item_id":"'):
+        bounds = _string_field(message, key)
+        ids.append(message[slice(*bounds)].decode() if bounds else None)
+    return AudioDelta(*ids, memoryview(message)[slice(*delta)])
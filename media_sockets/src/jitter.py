@@ -0,0 +1,137 @@
+import asyncio
+import logging
+import math
+import time
+from collections import deque
+from dataclasses import dataclass, asdict
+from typing import Awaitable, Callable, Optional
+
+from src.codec import ALAW_SILENCE
+from src.constants import (FRAME_DURATION, READER_PAYLOAD_SIZE,
+                           JITTER_MIN_FRAMES, JITTER_MAX_FRAMES,
+                           JITTER_FACTOR, JITTER_CONCEAL_LIMIT,
+                           PLAYOUT_MAX_BURST)
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class JitterStats:
+    """Статистика входящего буфера одного звонка."""
+
+    depth: int = 0
+    max_depth: int = 0
+    target_depth: int = 0
+    jitter_ms: float = 0.0
+    late_frames: int = 0
+    concealed_frames: int = 0
+    dropped_frames: int = 0
+
+    def as_dict(self) -> dict:
+        return asdict(self)
+
+
+class JitterBuffer:
+    """
+    Адаптивный джиттер-буфер входящего аудио от Asterisk.
+
+    Джиттер межпакетных интервалов оценивается как в RFC 3550, и по нему
+    выбирается целевая глубина буфера. Фреймы отдаются ровно раз в 20 мс;
+    при опустошении буфера слот заполняется повтором последнего фрейма,
+    затем тишиной (A-law), а фрейм, пришедший после своего слота,
+    считается опоздавшим.
+    """
+
+    def __init__(self, frame_duration: float = FRAME_DURATION,
+                 min_depth: int = JITTER_MIN_FRAMES,
+                 max_depth: int = JITTER_MAX_FRAMES,
+                 frame_size: int = READER_PAYLOAD_SIZE):
+        self.frame_duration = frame_duration
+        self.min_depth = min_depth
+        self.max_depth = max_depth
+        self.silence = bytes([ALAW_SILENCE]) * frame_size
+        self.frames: deque[bytes] = deque()
+        self.stats = JitterStats(target_depth=min_depth)
+        self.jitter = 0.0
+        self.playing = False
+        self._last_arrival: Optional[float] = None
+        self._last_frame = self.silence
+        self._concealed_run = 0
+        # Сколько слотов уже заполнено маскировкой без реальных фреймов
+        self._debt = 0
+
+    @property
+    def target_depth(self) -> int:
+        depth = math.ceil(JITTER_FACTOR * self.jitter / self.frame_duration)
+        return min(max(depth, self.min_depth), self.max_depth)
+
+    @property
+    def footprint(self) -> int:
+        """Верхняя граница памяти под фреймы буфера, байт."""
+        return (self.max_depth + 1) * len(self.silence)
+
+    def put(self, payload, arrival: Optional[float] = None) -> None:
+        """Кладет пришедший фрейм и обновляет оценку джиттера."""
+        arrival = time.monotonic() if arrival is None else arrival
+        if self._last_arrival is not None:
+            deviation = abs(arrival - self._last_arrival
+                            - self.frame_duration)
+            self.jitter += (deviation - self.jitter) / 16
+        self._last_arrival = arrival
+
+        if self._debt:
+            # Слот этого фрейма уже замаскирован
+            self._debt -= 1
+            self.stats.late_frames += 1
+            if len(self.frames) >= self.target_depth:
+                self.stats.dropped_frames += 1
+                return
+        self.frames.append(bytes(payload))
+        if len(self.frames) > self.max_depth:
+            self.frames.popleft()
+            self.stats.dropped_frames += 1
+        self.stats.max_depth = max(self.stats.max_depth, len(self.frames))
+
+    def get(self) -> Optional[bytes]:
+        """Отдает фрейм очередного слота, None — буфер еще наполняется."""
+        target = self.target_depth
+        self.stats.target_depth = target
+        self.stats.depth = len(self.frames)
+        self.stats.jitter_ms = self.jitter * 1000
+        if not self.playing:
+            if len(self.frames) < target:
+                return None
+            self.playing = True
+
+        if self.frames:
+            if len(self.frames) > target + 2:
+                # Джиттер снизился — сокращаем задержку на один фрейм
+                self.frames.popleft()
+                self.stats.dropped_frames += 1
+            self._last_frame = self.frames.popleft()
+            self._concealed_run = 0
+            return self._last_frame
+
+        self._debt += 1
+        self._concealed_run += 1
+        self.stats.concealed_frames += 1
+        if self._concealed_run >= JITTER_CONCEAL_LIMIT:
+            # Поток прервался надолго — заново накапливаем буфер
+            self.playing = False
+            self._debt = 0
+        if self._concealed_run == 1:
+            return self._last_frame
+        return self.silence
+
+    async def run(self, sink: Callable[[bytes], Awaitable]) -> None:
+        """Отдает фреймы в sink по абсолютным дедлайнам раз в 20 мс."""
+        deadline = time.monotonic()
+        while True:
+            frame = self.get()
+            if frame is not None:
+                await sink(frame)
+            deadline += self.frame_duration
+            delay = deadline - time.monotonic()
+            if delay < -PLAYOUT_MAX_BURST * self.frame_duration:
+                deadline = time.monotonic()
+            await asyncio.sleep(max(delay, 0))
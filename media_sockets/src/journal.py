@@ -0,0 +1,244 @@
+import asyncio
+import atexit
+import glob
+import json
+import logging
+import os
+import time
+from collections import deque
+from dataclasses import dataclass, asdict
+from typing import Optional
+
+import requests
+
+from src.constants import (JOURNAL_DIR, JOURNAL_SEGMENT_MAX_BYTES,
+                           JOURNAL_SEGMENT_MAX_AGE, JOURNAL_FLUSH_INTERVAL,
+                           JOURNAL_SHIP_URL, JOURNAL_SHIP_INTERVAL,
+                           JOURNAL_SHIP_TIMEOUT, JOURNAL_SHIP_MAX_BACKOFF,
+                           BYTES_ENCODING)
+
+logger = logging.getLogger(__name__)
+
+# Сегмент <мс>-<pid>: пишется как .<pid>.open, закрытый — .jsonl,
+# на время отправки переименовывается в .<pid отправщика>.shipping
+OPEN_STATE = 'open'
+SHIPPING_STATE = 'shipping'
+CLOSED_SUFFIX = '.jsonl'
+
+
+@dataclass
+class JournalStats:
+    """Статистика журнала транскриптов процесса."""
+
+    events: int = 0
+    batches: int = 0
+    segments_closed: int = 0
+    segments_shipped: int = 0
+    ship_errors: int = 0
+    write_errors: int = 0
+
+    def as_dict(self) -> dict:
+        return asdict(self)
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+class TranscriptJournal:
+    """
+    Локальный журнал событий транскрипта (append-only JSONL).
+
+    Звонок только кладет событие в очередь в памяти. Фоновая задача
+    раз в flush_interval дописывает накопленное пачкой в текущий
+    сегмент (запись в отдельном потоке), а сегмент закрывается по
+    размеру или возрасту. Отправщик забирает закрытые сегменты и
+    целиком шлет их в бэкенд; пока бэкенд или база недоступны,
+    сегменты просто лежат на диске, звонки этого не замечают.
+    """
+
+    def __init__(self, directory: str = JOURNAL_DIR,
+                 ship_url: Optional[str] = JOURNAL_SHIP_URL):
+        self.directory = directory
+        self.ship_url = ship_url
+        self.queue: deque[dict] = deque()
+        self.stats = JournalStats()
+        self._segment: Optional[str] = None
+        self._segment_size = 0
+        self._segment_opened = 0.0
+        self._tasks: list[asyncio.Task] = []
+        # Закрытые, но еще не отправленные сегменты. Считаем в памяти,
+        # чтобы /metrics не обходил каталог; сверяется с диском на
+        # каждом проходе отправщика (каталог общий для воркеров)
+        self.pending_segments = 0
+
+    def record(self, call_id: Optional[str], turn_id: int, role: str,
+               text: str, item_id: Optional[str] = None,
+               seq: int = 0) -> None:
+        """Добавляет событие транскрипта; не пишет на диск и не ждет."""
+        self.queue.append({
+            'call_id': call_id, 'seq': seq, 'turn_id': turn_id,
+            'role': role, 'item_id': item_id, 'text': text,
+            'ts': time.time(),
+        })
+        self.stats.events += 1
+
+    def _closed_segments(self) -> list[str]:
+        return sorted(glob.glob(
+            os.path.join(self.directory, '*' + CLOSED_SUFFIX)))
+
+    def report(self) -> dict:
+        return {'queue_depth': len(self.queue),
+                'pending_segments': self.pending_segments,
+                **self.stats.as_dict()}
+
+    def start(self) -> None:
+        os.makedirs(self.directory, exist_ok=True)
+        self._recover_segments()
+        self._tasks.append(asyncio.create_task(self._flush_loop()))
+        if self.ship_url:
+            self._tasks.append(asyncio.create_task(self._ship_loop()))
+        atexit.register(self.stop)
+        logger.info(f"Журнал транскриптов: {self.directory}, "
+                    f"отправка: {self.ship_url or 'выключена'}")
+
+    def stop(self) -> None:
+        """Дописывает очередь и закрывает сегмент для отправки."""
+        lines = self._drain()
+        try:
+            if lines:
+                self._write(lines)
+            if self._segment:
+                self._close_segment()
+        except OSError as e:
+            logger.error(f"Ошибка записи журнала транскриптов: {e}")
+
+    def _path(self, base: str, state: Optional[str] = None) -> str:
+        if state is None:
+            return os.path.join(self.directory, base + CLOSED_SUFFIX)
+        return os.path.join(self.directory, f'{base}.{os.getpid()}.{state}')
+
+    def _recover_segments(self) -> None:
+        """
+        Сегменты, брошенные завершившимися процессами (недописанные
+        или недоотправленные), закрываются и уходят в отправку.
+        """
+        for name in os.listdir(self.directory):
+            parts = name.split('.')
+            if len(parts) != 3 or parts[2] not in (OPEN_STATE,
+                                                   SHIPPING_STATE):
+                continue
+            owner = int(parts[1])
+            if owner != os.getpid() and _pid_alive(owner):
+                continue
+            os.replace(os.path.join(self.directory, name),
+                       self._path(parts[0]))
+        self.pending_segments = len(self._closed_segments())
+
+    # Запись
+
+    async def _flush_loop(self) -> None:
+        while True:
+            await asyncio.sleep(JOURNAL_FLUSH_INTERVAL)
+            try:
+                await self.flush()
+            except Exception as e:
+                self.stats.write_errors += 1
+                logger.error(f"Ошибка записи журнала транскриптов: {e}")
+
+    async def flush(self) -> None:
+        """Дописывает очередь пачкой и закрывает сегмент, если пора."""
+        lines = self._drain()
+        if lines:
+            await asyncio.to_thread(self._write, lines)
+            self.stats.batches += 1
+        if self._segment and (
+                self._segment_size >= JOURNAL_SEGMENT_MAX_BYTES
+                or time.time() - self._segment_opened
+                >= JOURNAL_SEGMENT_MAX_AGE):
+            self._close_segment()
+
+    def _drain(self) -> list[str]:
+        lines = []
+        while self.queue:
+            lines.append(json.dumps(self.queue.popleft(), ensure_ascii=False))
+        return lines
+
+    def _write(self, lines: list[str]) -> None:
+        if self._segment is None:
+            self._segment_opened = time.time()
+            self._segment = self._path(
+                f'{int(self._segment_opened * 1000)}-{os.getpid()}',
+                OPEN_STATE)
+            self._segment_size = 0
+        data = ('\n'.join(lines) + '\n').encode(BYTES_ENCODING)
+        with open(self._segment, 'ab') as f:
+            f.write(data)
+        self._segment_size += len(data)
+
+    def _close_segment(self) -> None:
+        base = os.path.basename(self._segment).split('.')[0]
+        os.replace(self._segment, self._path(base))
+        self._segment = None
+        self.stats.segments_closed += 1
+        self.pending_segments += 1
+
+    # Отправка
+
+    async def _ship_loop(self) -> None:
+        backoff = JOURNAL_SHIP_INTERVAL
+        while True:
+            await asyncio.sleep(backoff)
+            try:
+                await self.ship()
+                backoff = JOURNAL_SHIP_INTERVAL
+            except Exception as e:
+                self.stats.ship_errors += 1
+                backoff = min(backoff * 2, JOURNAL_SHIP_MAX_BACKOFF)
+                logger.warning(f"Не удалось отправить транскрипты, "
+                               f"повтор через {backoff} с: {e}")
+
+    async def ship(self) -> None:
+        """Отправляет закрытые сегменты по одному, от старых к новым."""
+        paths = self._closed_segments()
+        self.pending_segments = len(paths)
+        for path in paths:
+            # Забираем сегмент переименованием: воркеры супервизора
+            # делят каталог, и сегмент должен уйти ровно один раз
+            base = os.path.basename(path).split('.')[0]
+            claimed = self._path(base, SHIPPING_STATE)
+            try:
+                os.replace(path, claimed)
+            except FileNotFoundError:
+                # Сегмент уже забрал другой воркер
+                self.pending_segments -= 1
+                continue
+            try:
+                await asyncio.to_thread(self._post_segment, claimed)
+            except BaseException:
+                os.replace(claimed, path)
+                raise
+            os.remove(claimed)
+            self.stats.segments_shipped += 1
+            self.pending_segments -= 1
+
+    def _post_segment(self, path: str) -> None:
+        with open(path, encoding=BYTES_ENCODING) as f:
+            events = [json.loads(line) for line in f if line.strip()]
+        if not events:
+            return
+        response = requests.post(
+            self.ship_url, json={'events': events},
+            timeout=JOURNAL_SHIP_TIMEOUT)
+        response.raise_for_status()
+        logger.info(f"Транскрипты отправлены: {len(events)} событий, "
+                    f"{response.json()}")
+
+
+transcript_journal = TranscriptJournal()
@@ -0,0 +1,201 @@
+import json
+import logging
+import time
+from bisect import bisect_left
+from dataclasses import dataclass, field
+from typing import Optional
+
+from src.constants import LATENCY_BUCKETS_MS, LATENCY_RECORD_PATH
+
+logger = logging.getLogger(__name__)
+
+
+class LatencyHistogram:
+    """Гистограмма задержек с фиксированными границами корзин, мс."""
+
+    def __init__(self, bounds: tuple = LATENCY_BUCKETS_MS):
+        self.bounds = bounds
+        # Последняя корзина — все, что больше верхней границы
+        self.counts = [0] * (len(bounds) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, seconds: float) -> None:
+        value = seconds * 1000
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.total += value
+        self.max = max(self.max, value)
+
+    def merge(self, other: 'LatencyHistogram') -> None:
+        for i, count in enumerate(other.counts):
+            self.counts[i] += count
+        self.count += other.count
+        self.total += other.total
+        self.max = max(self.max, other.max)
+
+    def percentile(self, q: float) -> Optional[float]:
+        """Оценка перцентиля по верхней границе корзины, мс."""
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(self.bounds, self.counts):
+            seen += count
+            if seen >= rank:
+                return bound
+        return self.max
+
+    def as_dict(self) -> dict:
+        return {
+            'count': self.count,
+            'avg': self.total / self.count if self.count else None,
+            'p50': self.percentile(0.5),
+            'p95': self.percentile(0.95),
+            'max': self.max,
+            'buckets': dict(zip([*self.bounds, 'inf'], self.counts)),
+        }
+
+
+@dataclass
+class TurnTimings:
+    """
+    Отметки времени (time.monotonic) одного хода диалога: абонент
+    замолчал -> первая дельта ответа -> первый пакет в Asterisk ->
+    конец воспроизведения.
+    """
+
+    speech_stopped: Optional[float] = None
+    first_delta: Optional[float] = None
+    first_packet: Optional[float] = None
+    playout_end: Optional[float] = None
+    interrupted: bool = False
+
+    @staticmethod
+    def _span(start: Optional[float], end: Optional[float]):
+        if start is None or end is None:
+            return None
+        return end - start
+
+    def spans(self) -> dict:
+        """Интервалы хода в секундах (None — отметки нет)."""
+        return {
+            # Ответ модели: конец речи абонента -> первая дельта
+            'response': self._span(self.speech_stopped, self.first_delta),
+            # Наша обработка: первая дельта -> первый пакет
+            'pipeline': self._span(self.first_delta, self.first_packet),
+            # Итог «рот-ухо» в пределах нашего узла
+            'mouth_to_ear': self._span(
+                self.speech_stopped, self.first_packet),
+            'playout': self._span(self.first_packet, self.playout_end),
+        }
+
+
+@dataclass
+class LatencyHistograms:
+    """Набор гистограмм по интервалам хода."""
+
+    histograms: dict = field(default_factory=lambda: {
+        name: LatencyHistogram() for name in TurnTimings().spans()
+    })
+
+    def observe(self, turn: TurnTimings) -> None:
+        for name, span in turn.spans().items():
+            if span is not None:
+                self.histograms[name].observe(span)
+
+    def merge(self, other: 'LatencyHistograms') -> None:
+        for name, histogram in other.histograms.items():
+            self.histograms[name].merge(histogram)
+
+    def as_dict(self) -> dict:
+        return {name: histogram.as_dict()
+                for name, histogram in self.histograms.items()}
+
+    def summary(self) -> dict:
+        """Кратко для лога: число ходов и перцентили, мс."""
+        return {
+            name: {key: histogram.as_dict()[key]
+                   for key in ('count', 'p50', 'p95')}
+            for name, histogram in self.histograms.items()
+        }
+
+
+# Гистограммы всех звонков процесса (узла)
+node_latency = LatencyHistograms()
+
+
+class TurnLatencyTracker:
+    """
+    Собирает отметки ходов одного звонка. Ход открывается по
+    speech_stopped (или по первой дельте, если абонент еще не говорил,
+    например приветствие) и закрывается концом воспроизведения либо
+    перебиванием.
+    """
+
+    def __init__(self):
+        self.turn: Optional[TurnTimings] = None
+        self.turns: list[TurnTimings] = []
+        self.histograms = LatencyHistograms()
+
+    def speech_stopped(self, at: float) -> None:
+        if self.turn and self.turn.first_delta is not None:
+            # Абонент заговорил поверх ответа, не перебив его
+            self._finish(at)
+        self.turn = TurnTimings(speech_stopped=at)
+
+    def first_delta(self, at: float) -> None:
+        if self.turn is None:
+            self.turn = TurnTimings()
+        if self.turn.first_delta is None:
+            self.turn.first_delta = at
+
+    def first_packet(self, at: float) -> None:
+        if self.turn and self.turn.first_packet is None:
+            self.turn.first_packet = at
+
+    def playout_end(self, at: float) -> None:
+        if self.turn and self.turn.first_packet is not None:
+            self._finish(at)
+
+    def interrupted(self, at: float) -> None:
+        if self.turn and self.turn.first_delta is not None:
+            self.turn.interrupted = True
+            self._finish(at)
+
+    def _finish(self, at: float) -> None:
+        self.turn.playout_end = at
+        self.turns.append(self.turn)
+        self.histograms.observe(self.turn)
+        self.turn = None
+
+    def record(self, **call_info) -> dict:
+        """Итоговая запись звонка; гистограммы уходят в node_latency."""
+        node_latency.merge(self.histograms)
+        return {
+            **call_info,
+            'ended_at': time.time(),
+            'turns': [
+                {
+                    **{name: span and round(span * 1000, 1)
+                       for name, span in turn.spans().items()},
+                    'interrupted': turn.interrupted,
+                }
+                for turn in self.turns
+            ],
+            'latency_ms': self.histograms.as_dict(),
+        }
+
+
+def write_latency_record(record: dict) -> None:
+    """Пишет запись JSON-строкой в LATENCY_RECORD_PATH или в лог."""
+    line = json.dumps(record, ensure_ascii=False)
+    if not LATENCY_RECORD_PATH:
+        logger.info(f"Задержки звонка: {line}")
+        return
+    try:
+        with open(LATENCY_RECORD_PATH, 'a', encoding='utf-8') as f:
+            f.write(line + '\n')
+    except OSError as e:
+        logger.error(f"Не удалось записать задержки звонка: {e}")
@@ -0,0 +1,238 @@
+import asyncio
+import logging
+import time
+from collections import Counter
+from typing import Optional
+
+from src.constants import (METRICS_HOST, METRICS_PORT,
+                           LOOP_LAG_INTERVAL, BYTES_ENCODING)
+from src.latency import node_latency
+from src.phrase_cache import phrase_cache
+from src.recorder import recording_writer
+from src.journal import transcript_journal
+from src.supervisor import call_counter
+
+logger = logging.getLogger(__name__)
+
+# Счетчики, которые копятся по звонкам (см. call_totals клиента)
+CALL_COUNTERS = {
+    'frames_in': 'Входящие аудио-фреймы AudioSocket',
+    'frames_out': 'Исходящие аудио-фреймы AudioSocket',
+    'bytes_in': 'Байт аудио получено от Asterisk',
+    'bytes_out': 'Байт аудио отправлено в Asterisk',
+    'output_cpu_seconds': (
+        'Время CPU конвейера вывода (ресэмплинг/декодирование), с'),
+}
+
+
+class MetricsRegistry:
+    """
+    Метрики процесса в текстовом формате Prometheus.
+
+    Счетчики звонков складываются из итогов завершенных звонков и
+    текущих значений активных, поэтому горячий путь ничего не
+    пересчитывает — все собирается при запросе /metrics. Частоты
+    (фреймы в секунду) считает Prometheus через rate().
+    """
+
+    def __init__(self):
+        self.calls: set = set()
+        self.finished = Counter()
+        self.ws_connects = Counter()
+        self.ws_disconnects = 0
+        self.ws_reconnects = 0
+        self.loop_lag = 0.0
+        self.loop_lag_max = 0.0
+        self.labels = ''
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._lag_task: Optional[asyncio.Task] = None
+
+    async def start(self, worker: Optional[int] = None) -> None:
+        """
+        Запускает HTTP-сервер метрик и замер задержки в текущем event
+        loop. У воркеров супервизора у каждого свой порт:
+        METRICS_PORT + номер воркера.
+        """
+        port = METRICS_PORT
+        if worker is not None:
+            port += worker
+            self.labels = f'worker="{worker}"'
+        self._server = await asyncio.start_server(
+            handle_metrics_request, METRICS_HOST, port)
+        self._lag_task = asyncio.create_task(self.monitor_loop_lag())
+        logger.info(f"Метрики: http://{METRICS_HOST}:{port}/metrics")
+
+    async def stop(self) -> None:
+        if self._lag_task:
+            self._lag_task.cancel()
+            self._lag_task = None
+        if self._server:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+
+    def call_started(self, client) -> None:
+        self.calls.add(client)
+
+    def call_finished(self, client) -> None:
+        if client in self.calls:
+            self.calls.discard(client)
+            self.finished.update(client.call_totals())
+
+    def _totals(self) -> Counter:
+        totals = Counter(self.finished)
+        for client in self.calls:
+            totals.update(client.call_totals())
+        return totals
+
+    def _metric(self, lines: list, name: str, kind: str, help_text: str,
+                samples: list) -> None:
+        lines.append(f'# HELP audiosocket_{name} {help_text}')
+        lines.append(f'# TYPE audiosocket_{name} {kind}')
+        for labels, value in samples:
+            all_labels = ','.join(filter(None, (self.labels, labels)))
+            if all_labels:
+                all_labels = f'{{{all_labels}}}'
+            lines.append(f'audiosocket_{name}{all_labels} {value}')
+
+    def render(self) -> str:
+        lines = []
+        self._metric(lines, 'active_calls', 'gauge', 'Активные звонки',
+                     [('', call_counter.value)])
+        totals = self._totals()
+        for name, help_text in CALL_COUNTERS.items():
+            self._metric(lines, f'{name}_total', 'counter', help_text,
+                         [('', totals[name])])
+        depths = [client.audio_handler.playout.buffered_frames
+                  for client in self.calls]
+        self._metric(lines, 'playout_queue_frames', 'gauge',
+                     'Фреймы в очередях воспроизведения',
+                     [('stat="sum"', sum(depths)),
+                      ('stat="max"', max(depths, default=0))])
+        self._metric(lines, 'openai_ws_connects_total', 'counter',
+                     'Подключения к OpenAI Realtime по источнику',
+                     [(f'source="{source}"', count)
+                      for source, count in self.ws_connects.items()])
+        self._metric(lines, 'openai_ws_disconnects_total', 'counter',
+                     'Неожиданные обрывы WebSocket OpenAI',
+                     [('', self.ws_disconnects)])
+        self._metric(lines, 'openai_ws_reconnects_total', 'counter',
+                     'Переподключения к OpenAI после обрыва посреди звонка',
+                     [('', self.ws_reconnects)])
+        self._metric(lines, 'event_loop_lag_seconds', 'gauge',
+                     'Задержка event loop: последняя и максимальная',
+                     [('stat="last"', self.loop_lag),
+                      ('stat="max"', self.loop_lag_max)])
+        self._latency(lines)
+        cache = phrase_cache.stats
+        self._metric(lines, 'phrase_cache_requests_total', 'counter',
+                     'Обращения к кэшу фраз',
+                     [('result="hit"', cache['hits']),
+                      ('result="miss"', cache['misses'])])
+        self._metric(lines, 'phrase_cache_mapped_bytes', 'gauge',
+                     'Байт фраз, отображенных в память',
+                     [('', cache['mapped_bytes'])])
+        recorder = recording_writer.report()
+        self._metric(lines, 'recorder_queue_frames', 'gauge',
+                     'Очередь потока записи звонков',
+                     [('', recorder['queue_depth'])])
+        self._metric(lines, 'recorder_dropped_frames_total', 'counter',
+                     'Фреймы, не попавшие в запись из-за переполнения',
+                     [('', recorder['dropped_frames'])])
+        journal = transcript_journal.report()
+        self._metric(lines, 'journal_pending_segments', 'gauge',
+                     'Закрытые сегменты журнала, ожидающие отправки',
+                     [('', journal['pending_segments'])])
+        self._metric(lines, 'journal_ship_errors_total', 'counter',
+                     'Неудачные отправки журнала транскриптов',
+                     [('', journal['ship_errors'])])
+        self._call_metrics(lines)
+        return '\n'.join(lines) + '\n'
+
+    def _call_metrics(self, lines: list) -> None:
+        """Метрики по звонкам — только тем, чей UUID уже известен."""
+        calls = [client for client in self.calls if client.stream_uuid]
+        call_samples = []
+        for client in calls:
+            call_totals = client.call_totals()
+            for direction in ('in', 'out'):
+                call_samples.append((
+                    f'call_id="{client.stream_uuid}",'
+                    f'direction="{direction}"',
+                    call_totals[f'bytes_{direction}']))
+        self._metric(lines, 'call_bytes', 'gauge',
+                     'Байт аудио по активным звонкам', call_samples)
+        self._metric(lines, 'call_memory_bytes', 'gauge',
+                     'Память аудиобуферов по активным звонкам',
+                     [(f'call_id="{client.stream_uuid}"',
+                       client.memory_footprint())
+                      for client in calls])
+
+    def _latency(self, lines: list) -> None:
+        """Гистограммы задержек ходов узла (src/latency)."""
+        samples = {'bucket': [], 'sum': [], 'count': []}
+        for span, histogram in node_latency.histograms.items():
+            cumulative = 0
+            bounds = [*histogram.bounds, '+Inf']
+            for bound, count in zip(bounds, histogram.counts):
+                cumulative += count
+                samples['bucket'].append(
+                    (f'span="{span}",le="{bound}"', cumulative))
+            samples['sum'].append((f'span="{span}"', histogram.total))
+            samples['count'].append((f'span="{span}"', histogram.count))
+        lines.append('# HELP audiosocket_turn_latency_ms '
+                     'Задержки ходов диалога по интервалам, мс')
+        lines.append('# TYPE audiosocket_turn_latency_ms histogram')
+        for suffix, suffix_samples in samples.items():
+            for labels, value in suffix_samples:
+                all_labels = ','.join(filter(None, (self.labels, labels)))
+                lines.append(
+                    f'audiosocket_turn_latency_ms_{suffix}{{{all_labels}}} '
+                    f'{value}')
+
+    async def monitor_loop_lag(self) -> None:
+        """Меряет, насколько позже срока просыпается event loop."""
+        while True:
+            started = time.monotonic()
+            await asyncio.sleep(LOOP_LAG_INTERVAL)
+            lag = max(time.monotonic() - started - LOOP_LAG_INTERVAL, 0.0)
+            self.loop_lag = lag
+            self.loop_lag_max = max(self.loop_lag_max, lag)
+
+
+metrics = MetricsRegistry()
+
+
+def _response(status: str, body: str, content_type: str) -> bytes:
+    payload = body.encode(BYTES_ENCODING)
+    head = (f'HTTP/1.1 {status}\r\n'
+            f'Content-Type: {content_type}\r\n'
+            f'Content-Length: {len(payload)}\r\n'
+            'Connection: close\r\n\r\n')
+    return head.encode(BYTES_ENCODING) + payload
+
+
+async def handle_metrics_request(reader: asyncio.StreamReader,
+                                 writer: asyncio.StreamWriter) -> None:
+    """Минимальный HTTP: GET /metrics и GET /health."""
+    try:
+        request_line = await asyncio.wait_for(reader.readline(), 5)
+        # Заголовки не нужны, но их надо дочитать
+        while (await asyncio.wait_for(reader.readline(), 5)).strip():
+            pass
+        parts = request_line.decode(BYTES_ENCODING).split()
+        path = parts[1] if len(parts) > 1 else ''
+        if path == '/metrics':
+            response = _response(
+                '200 OK', metrics.render(),
+                'text/plain; version=0.0.4; charset=utf-8')
+        elif path == '/health':
+            response = _response('200 OK', 'ok\n', 'text/plain')
+        else:
+            response = _response('404 Not Found', '', 'text/plain')
+        writer.write(response)
+        await writer.drain()
+    except (asyncio.TimeoutError, ConnectionError) as e:
+        logger.debug(f"Запрос метрик прерван: {e}")
+    finally:
+        writer.close()
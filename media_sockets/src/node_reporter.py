@@ -0,0 +1,84 @@
+import asyncio
+import logging
+import os
+import socket
+from typing import Optional
+
+import requests
+
+from src.constants import (NODE_ID, NODE_ADDRESS, NODE_MAX_CALLS,
+                           NODE_REPORT_URL, NODE_REPORT_INTERVAL,
+                           NODE_REPORT_TIMEOUT, WORKERS)
+from src.supervisor import call_counter
+
+logger = logging.getLogger(__name__)
+
+
+def cpu_headroom() -> float:
+    """
+    Свободная доля CPU по load average за минуту (0 — все ядра
+    заняты). Load average общий для хоста, а не контейнера: для узла,
+    которому выделена часть машины, это оценка сверху.
+    """
+    cpus = len(os.sched_getaffinity(0))
+    return round(max(0.0, 1 - os.getloadavg()[0] / cpus), 3)
+
+
+class NodeReporter:
+    """
+    Сообщает бэкенду емкость узла: адрес для externalMedia, число
+    активных звонков (всех воркеров) и запас CPU. Бэкенд по этим
+    отчетам выбирает наименее загруженный узел для нового звонка.
+
+    При супервизоре отчеты шлет только воркер 0: звонки остальных он
+    видит через общую память счетчиков.
+    """
+
+    def __init__(self, url: Optional[str] = NODE_REPORT_URL,
+                 address: Optional[str] = NODE_ADDRESS,
+                 node_id: str = NODE_ID or socket.gethostname(),
+                 max_calls: int = NODE_MAX_CALLS):
+        self.url = url
+        self.address = address
+        self.node_id = node_id
+        self.max_calls = max_calls
+        self.errors = 0
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.url and self.address)
+
+    def start(self, worker: Optional[int] = None) -> None:
+        if not self.enabled or worker not in (None, 0):
+            return
+        self._task = asyncio.create_task(self._run())
+        logger.info(f"Узел {self.node_id} ({self.address}) сообщает "
+                    f"емкость в {self.url}")
+
+    def report(self) -> dict:
+        return {
+            'node_id': self.node_id,
+            'address': self.address,
+            'active_calls': call_counter.total,
+            'max_calls': self.max_calls,
+            'cpu_headroom': cpu_headroom(),
+            'workers': WORKERS,
+        }
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await asyncio.to_thread(self._post, self.report())
+            except Exception as e:
+                self.errors += 1
+                logger.warning(f"Не удалось отправить отчет узла: {e}")
+            await asyncio.sleep(NODE_REPORT_INTERVAL)
+
+    def _post(self, report: dict) -> None:
+        response = requests.post(
+            self.url, json=report, timeout=NODE_REPORT_TIMEOUT)
+        response.raise_for_status()
+
+
+node_reporter = NodeReporter()
@@ -0,0 +1,126 @@
+import logging
+import time
+from abc import ABC, abstractmethod
+from typing import Callable, Iterable
+
+import numpy as np
+
+from src import codec
+from src.constants import OPENAI_OUTPUT_RATE, DEFAULT_SAMPLE_RATE
+from src.resampler import StreamingResampler
+
+logger = logging.getLogger(__name__)
+
+
+class OutputPipeline(ABC):
+    """
+    Приводит аудио от OpenAI к slin 8 kHz, который ждет AudioSocket,
+    и считает потраченное на это процессорное время.
+    """
+
+    openai_format: str = ''
+    # Относительная стоимость преобразования, меньше — дешевле
+    cost: int = 0
+
+    def __init__(self):
+        self.cpu_time = 0.0
+        self.bytes_in = 0
+
+    def convert(self, data: bytes):
+        started = time.thread_time()
+        pcm = self._convert(data)
+        self.cpu_time += time.thread_time() - started
+        self.bytes_in += len(data)
+        return pcm
+
+    @abstractmethod
+    def _convert(self, data: bytes) -> bytes:
+        ...
+
+    def reset(self) -> None:
+        """Сбрасывает состояние между ответами (после прерывания)."""
+
+    @property
+    def footprint(self) -> int:
+        """Память рабочих буферов конвейера, байт."""
+        return 0
+
+    @property
+    def stats(self) -> dict:
+        return {
+            'pipeline': self.openai_format,
+            'cpu_time': self.cpu_time,
+            'bytes_in': self.bytes_in,
+        }
+
+
+class Pcm16Pipeline(OutputPipeline):
+    """pcm16 24 kHz: потоковый ресэмплинг до 8 kHz."""
+
+    openai_format = 'pcm16'
+    cost = 2
+
+    def __init__(self):
+        super().__init__()
+        self.resampler = StreamingResampler(
+            OPENAI_OUTPUT_RATE, DEFAULT_SAMPLE_RATE)
+
+    def _convert(self, data: bytes) -> bytes:
+        return self.resampler.process(data)
+
+    def reset(self) -> None:
+        self.resampler.reset()
+
+    @property
+    def footprint(self) -> int:
+        return self.resampler.footprint
+
+
+class G711Pipeline(OutputPipeline):
+    """G.711 8 kHz: только табличное декодирование, без ресэмплинга."""
+
+    cost = 1
+
+    def __init__(self, openai_format: str, decode: Callable):
+        super().__init__()
+        self.openai_format = openai_format
+        self.decode = decode
+        self._out = np.empty(0, dtype=np.int16)
+
+    def _convert(self, data: bytes) -> memoryview:
+        """
+        Декодирует в переиспользуемый буфер. Результат действителен
+        до следующего вызова — PlayoutStream.feed сразу его копирует.
+        """
+        if len(self._out) < len(data):
+            self._out = np.empty(2 * len(data), dtype=np.int16)
+        return memoryview(self.decode(data, self._out)).cast('B')
+
+    @property
+    def footprint(self) -> int:
+        return self._out.nbytes
+
+
+PIPELINES: dict[str, Callable[[], OutputPipeline]] = {
+    'g711_alaw': lambda: G711Pipeline('g711_alaw', codec.alaw_decode),
+    'g711_ulaw': lambda: G711Pipeline('g711_ulaw', codec.ulaw_decode),
+    'pcm16': Pcm16Pipeline,
+}
+
+
+def create_output_pipeline(openai_format: str) -> OutputPipeline:
+    if openai_format not in PIPELINES:
+        raise ValueError(f'Неизвестный формат вывода: {openai_format}')
+    return PIPELINES[openai_format]()
+
+
+def negotiate_output_pipeline(allowed: Iterable[str]) -> OutputPipeline:
+    """Выбирает самый дешевый конвейер среди разрешенных форматов."""
+    candidates = [
+        create_output_pipeline(fmt) for fmt in allowed if fmt in PIPELINES
+    ]
+    if not candidates:
+        raise ValueError(f'Нет поддерживаемых форматов вывода: {allowed}')
+    pipeline = min(candidates, key=lambda candidate: candidate.cost)
+    logger.info(f"Выбран конвейер вывода: {pipeline.openai_format}")
+    return pipeline
@@ -0,0 +1,140 @@
+import logging
+import mmap
+import os
+from collections import OrderedDict
+from typing import Optional
+
+from src.constants import (PHRASE_CACHE_DIR, PHRASE_CACHE_MAX_BYTES,
+                           PHRASE_SOURCE_EXTENSIONS, DRAIN_CHUNK_SIZE)
+from src.utils import AudioConverter
+
+logger = logging.getLogger(__name__)
+
+RENDERED_DIR = '.slin'
+RENDERED_EXTENSION = '.slin'
+
+
+class PhraseCache:
+    """
+    Кэш заранее озвученных фраз скрипта (приветствие, прощание).
+
+    Исходники (<имя>.mp3/.wav/...) один раз при старте рендерятся в
+    slin 8 kHz, выровненный по 20 мс фреймам, и лежат на диске в
+    <каталог>/.slin. В памяти фразы держатся как mmap: страницы общие
+    для всех процессов-воркеров, а число отображенных байт ограничено
+    max_bytes — дольше всех не использованные фразы закрываются (LRU)
+    и при следующем обращении отображаются заново.
+    """
+
+    def __init__(self, directory: str = PHRASE_CACHE_DIR,
+                 max_bytes: int = PHRASE_CACHE_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.rendered_dir = os.path.join(directory, RENDERED_DIR)
+        # Имя фразы -> путь к отрендеренному slin
+        self.phrases: dict[str, str] = {}
+        # Имя фразы -> текст (из <имя>.txt рядом с исходником)
+        self.texts: dict[str, str] = {}
+        self._mapped: OrderedDict[str, mmap.mmap] = OrderedDict()
+        self.mapped_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def load(self) -> None:
+        """Рендерит новые/измененные исходники и отображает фразы."""
+        if not os.path.isdir(self.directory):
+            logger.info(f"Каталог фраз {self.directory} не найден, "
+                        "кэш фраз выключен")
+            return
+        os.makedirs(self.rendered_dir, exist_ok=True)
+        for filename in sorted(os.listdir(self.directory)):
+            name, extension = os.path.splitext(filename)
+            source = os.path.join(self.directory, filename)
+            if extension.lower() == '.txt':
+                with open(source, encoding='utf-8') as f:
+                    self.texts[name] = f.read().strip()
+            elif extension.lower() in PHRASE_SOURCE_EXTENSIONS:
+                try:
+                    self.phrases[name] = self._render(name, source)
+                except Exception as e:
+                    logger.error(f"Не удалось подготовить фразу {name}: {e}")
+        for name in self.phrases:
+            self._map(name)
+        logger.info(f"Кэш фраз: {self.stats}")
+
+    def _render(self, name: str, source: str) -> str:
+        target = os.path.join(self.rendered_dir, name + RENDERED_EXTENSION)
+        if (os.path.exists(target)
+                and os.path.getmtime(target) >= os.path.getmtime(source)):
+            return target
+        pcm = AudioConverter.convert_to_raw(source)
+        # Дополняем тишиной до целого числа фреймов
+        pcm += bytes(-len(pcm) % DRAIN_CHUNK_SIZE)
+        # Пишем атомарно: воркеры супервизора рендерят параллельно
+        tmp_path = f'{target}.{os.getpid()}.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(pcm)
+        os.replace(tmp_path, target)
+        logger.info(f"Фраза {name} отрендерена: {len(pcm)} байт")
+        return target
+
+    def _map(self, name: str) -> Optional[mmap.mmap]:
+        path = self.phrases.get(name)
+        if path is None:
+            return None
+        try:
+            with open(path, 'rb') as f:
+                mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError) as e:
+            logger.error(f"Не удалось отобразить фразу {name}: {e}")
+            return None
+        self._mapped[name] = mapped
+        self.mapped_bytes += len(mapped)
+        self._evict()
+        return mapped
+
+    def _evict(self) -> None:
+        # Последнюю отображенную фразу не закрываем, даже если она одна
+        # больше лимита
+        while self.mapped_bytes > self.max_bytes and len(self._mapped) > 1:
+            name, mapped = self._mapped.popitem(last=False)
+            self.mapped_bytes -= len(mapped)
+            self.evictions += 1
+            # Срезы, отданные звонкам, держат отображение живым —
+            # закроется вместе с ними
+            try:
+                mapped.close()
+            except BufferError:
+                pass
+
+    def get(self, name: str) -> Optional[memoryview]:
+        """slin фразы без копирования или None, если фразы нет."""
+        mapped = self._mapped.get(name)
+        if mapped is not None:
+            self._mapped.move_to_end(name)
+            self.hits += 1
+            return memoryview(mapped)
+        self.misses += 1
+        mapped = self._map(name)
+        return memoryview(mapped) if mapped is not None else None
+
+    @property
+    def hit_rate(self) -> float:
+        requests = self.hits + self.misses
+        return self.hits / requests if requests else 0.0
+
+    @property
+    def stats(self) -> dict:
+        return {
+            'phrases': len(self.phrases),
+            'mapped': len(self._mapped),
+            'mapped_bytes': self.mapped_bytes,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'hit_rate': self.hit_rate,
+        }
+
+
+phrase_cache = PhraseCache()
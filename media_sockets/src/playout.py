@@ -0,0 +1,358 @@
+import asyncio
+import logging
+import time
+from dataclasses import dataclass, asdict
+from typing import Callable, Optional
+
+from src.constants import (DRAIN_CHUNK_SIZE, FRAME_DURATION,
+                           PLAYOUT_MAX_BURST, PLAYOUT_BUFFER_BYTES,
+                           PLAYOUT_OVERFLOW_POLICY, READER_HEADER_SIZE,
+                           PLAYOUT_WRITE_HIGH_WATER)
+from src.ring_buffer import RingBuffer
+from src.utils import AudioConverter
+
+OVERFLOW_POLICIES = ('pause', 'drop_oldest')
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class PlayoutStats:
+    """Статистика воспроизведения одного звонка."""
+
+    frames_sent: int = 0
+    underruns: int = 0
+    late_frames: int = 0
+    max_lag: float = 0.0
+    total_lag: float = 0.0
+    # Переполнение буфера: выброшено байт (drop_oldest), сколько раз
+    # и сколько секунд чтение OpenAI стояло (pause), максимум заполнения
+    dropped_bytes: int = 0
+    pauses: int = 0
+    paused_time: float = 0.0
+    high_water: int = 0
+    # Фреймы, выброшенные из-за полного буфера записи транспорта
+    backlog_drops: int = 0
+
+    @property
+    def avg_lag(self) -> float:
+        return self.total_lag / self.frames_sent if self.frames_sent else 0.0
+
+    def as_dict(self) -> dict:
+        stats = asdict(self)
+        stats['avg_lag'] = self.avg_lag
+        return stats
+
+
+class PlayoutStream:
+    """
+    Исходящий поток одного звонка: кольцевой буфер PCM 8 kHz
+    фиксированной емкости, нарезаемый на фреймы по 20 мс, которые
+    отправляет общий PlayoutScheduler.
+    """
+
+    def __init__(self, writer, frame_size: int = DRAIN_CHUNK_SIZE,
+                 on_start: Optional[Callable[[float], None]] = None,
+                 on_drained: Optional[Callable[[float], None]] = None,
+                 capacity: int = PLAYOUT_BUFFER_BYTES,
+                 overflow: str = PLAYOUT_OVERFLOW_POLICY):
+        """
+        on_start(t) вызывается, когда после простоя в сокет записан
+        первый фрейм, on_drained(t) — когда доигран весь ответ
+        (t — момент, когда абонент услышит его конец).
+        capacity — бюджет буфера в байтах, overflow — политика
+        переполнения для put(): pause или drop_oldest.
+        """
+        if overflow not in OVERFLOW_POLICIES:
+            raise ValueError(f'Неизвестная политика переполнения: {overflow}')
+        self.writer = writer
+        # Размер буфера записи: у StreamWriter — его транспорта,
+        # в режиме протокола writer сам и есть транспорт
+        self._write_buffer_size = getattr(
+            getattr(writer, 'transport', writer),
+            'get_write_buffer_size', None)
+        # tap(pcm, deadline) получает каждый отправленный фрейм (запись)
+        self.tap: Optional[Callable[[memoryview, float], None]] = None
+        self.on_start = on_start
+        self.on_drained = on_drained
+        self.frame_size = frame_size
+        self.overflow = overflow
+        self.buffer = RingBuffer(capacity - capacity % frame_size)
+        self._writable = asyncio.Event()
+        # Растет при каждом clear(): ожидающий put() понимает, что его
+        # аудио уже не нужно
+        self._generation = 0
+        self.stats = PlayoutStats()
+        # Номер тика планировщика для следующего фрейма,
+        # None — поток простаивает.
+        self.next_tick: Optional[int] = None
+        self.response_done = False
+        self.scheduler: Optional['PlayoutScheduler'] = None
+        # Счетчики байт PCM: принято в поток, реально отправлено и
+        # выброшено при переполнении
+        self.bytes_fed = 0
+        self.bytes_sent = 0
+        self.bytes_dropped = 0
+        # Дедлайн последнего отправленного фрейма
+        self.last_deadline = 0.0
+
+    def feed(self, pcm_data) -> None:
+        """
+        Добавляет PCM в очередь на воспроизведение, не дожидаясь места:
+        при переполнении выбрасывается самое старое несыгранное аудио.
+        """
+        if not pcm_data:
+            return
+        overflow = len(pcm_data) - self.buffer.free
+        if overflow > 0:
+            # Выбрасываем целыми фреймами, чтобы не сбить их границы
+            dropped = self.buffer.discard(
+                overflow + -overflow % self.frame_size)
+            self.bytes_dropped += dropped
+            self.stats.dropped_bytes += dropped
+            if len(pcm_data) > self.buffer.capacity:
+                skipped = len(pcm_data) - self.buffer.capacity
+                self.bytes_fed += skipped
+                self.bytes_dropped += skipped
+                self.stats.dropped_bytes += skipped
+                pcm_data = pcm_data[skipped:]
+        self._write(pcm_data)
+
+    async def put(self, pcm_data) -> None:
+        """
+        Добавляет PCM с учетом политики переполнения. При pause ждет,
+        пока планировщик освободит место, — вызывающий (чтение OpenAI)
+        стоит, и WebSocket сам притормаживает сервер. Если поток за это
+        время сбросили (перебивание), остаток аудио не нужен.
+        """
+        if self.overflow == 'drop_oldest':
+            self.feed(pcm_data)
+            return
+        pcm_data = memoryview(pcm_data)
+        generation = self._generation
+        while pcm_data:
+            if not self.buffer.free:
+                self.stats.pauses += 1
+                started = time.monotonic()
+                self._writable.clear()
+                await self._writable.wait()
+                self.stats.paused_time += time.monotonic() - started
+                if generation != self._generation:
+                    return
+            written = self._write(pcm_data[:self.buffer.free])
+            pcm_data = pcm_data[written:]
+
+    def _write(self, pcm_data) -> int:
+        written = self.buffer.write(pcm_data)
+        self.bytes_fed += written
+        self.stats.high_water = max(self.stats.high_water, len(self.buffer))
+        # Новое аудио после mark_done — уже следующий ответ
+        self.response_done = False
+        if self.scheduler:
+            self.scheduler.wake()
+        return written
+
+    @property
+    def bytes_consumed(self) -> int:
+        """Позиция воспроизведения: отправлено плюс выброшено."""
+        return self.bytes_sent + self.bytes_dropped
+
+    @property
+    def footprint(self) -> int:
+        """Память, выделенная под буфер потока, байт."""
+        return self.buffer.capacity
+
+    def mark_done(self) -> None:
+        """Ответ закончен: опустевший буфер не считается недогрузом."""
+        if not self.buffer and self.next_tick is None:
+            # Поток уже простаивает (ответ доигран раньше response.done)
+            if self.on_drained:
+                self.on_drained(self.silence_at())
+            return
+        self.response_done = True
+
+    def clear(self) -> None:
+        """Сбрасывает все, что еще не отправлено."""
+        self.bytes_fed -= len(self.buffer)
+        self.buffer.clear()
+        self.next_tick = None
+        self.response_done = False
+        self._generation += 1
+        self._writable.set()
+
+    def silence_at(self) -> float:
+        """Когда доиграет последний уже отправленный фрейм."""
+        frame_duration = (
+            self.scheduler.frame_duration if self.scheduler else 0.0)
+        return max(time.monotonic(), self.last_deadline + frame_duration)
+
+    @property
+    def buffered_frames(self) -> int:
+        return len(self.buffer) // self.frame_size
+
+    def _take_frame(self) -> bytes:
+        frame = self.buffer.read(self.frame_size)
+        self._writable.set()
+        self.bytes_sent += len(frame)
+        if len(frame) < self.frame_size:
+            # Остаток в конце ответа дополняем тишиной до полного фрейма
+            frame += bytes(self.frame_size - len(frame))
+        return AudioConverter.create_audio_packet(frame)
+
+    def _on_empty(self) -> None:
+        """Буфер опустел: поток уходит в простой."""
+        if self.next_tick is not None:
+            if not self.response_done:
+                self.stats.underruns += 1
+            elif self.on_drained:
+                self.on_drained(self.silence_at())
+            self.next_tick = None
+            self.response_done = False
+
+    def _has_frame(self) -> bool:
+        """Есть целый фрейм, либо хвост ответа, который пора доиграть."""
+        return len(self.buffer) >= self.frame_size or (
+            bool(self.buffer) and self.response_done)
+
+    def _frames_due(self, tick: int, scheduler: 'PlayoutScheduler') -> int:
+        frames_due = tick - self.next_tick + 1
+        if frames_due > scheduler.max_burst:
+            # Цикл стоял слишком долго: догоняем ограниченной пачкой,
+            # а остальное отставание списываем, сдвигая часы потока.
+            self.stats.late_frames += frames_due - scheduler.max_burst
+            self.next_tick = tick - scheduler.max_burst + 1
+            frames_due = scheduler.max_burst
+        return frames_due
+
+    def _next_packet(self, scheduler: 'PlayoutScheduler',
+                     now: float) -> bytes:
+        """Пакет фрейма текущего тика потока; двигает часы потока."""
+        deadline = scheduler.deadline(self.next_tick)
+        lag = now - deadline
+        self.stats.total_lag += lag
+        self.stats.max_lag = max(self.stats.max_lag, lag)
+        if lag > scheduler.frame_duration:
+            self.stats.late_frames += 1
+        packet = self._take_frame()
+        self.last_deadline = deadline
+        self.next_tick += 1
+        if self.tap:
+            self.tap(memoryview(packet)[READER_HEADER_SIZE:], deadline)
+        return packet
+
+    def _backlogged(self) -> bool:
+        return bool(self._write_buffer_size) and (
+            self._write_buffer_size() > PLAYOUT_WRITE_HIGH_WATER)
+
+    def _drop_frames(self, frames_due: int) -> None:
+        """
+        Транспорт не успевает отправлять: фреймы этого тика выбрасываем
+        (часы потока идут дальше), чтобы буфер записи не рос без предела.
+        """
+        while frames_due and self._has_frame():
+            dropped = self.buffer.discard(self.frame_size)
+            self.bytes_dropped += dropped
+            self.stats.dropped_bytes += dropped
+            self.stats.backlog_drops += 1
+            self._writable.set()
+            self.next_tick += 1
+            frames_due -= 1
+
+    def service(self, tick: int, scheduler: 'PlayoutScheduler',
+                now: float) -> None:
+        """Отправляет фреймы, дедлайн которых наступил к тику `tick`."""
+        if self.writer.is_closing():
+            self.clear()
+            return
+        if not self.buffer:
+            self._on_empty()
+            return
+        starting = self.next_tick is None
+        if starting:
+            if not self._has_frame():
+                return
+            self.next_tick = tick
+
+        frames_due = self._frames_due(tick, scheduler)
+        if self._backlogged():
+            self._drop_frames(frames_due)
+            return
+        packets = []
+        while frames_due and self._has_frame():
+            packets.append(self._next_packet(scheduler, now))
+            frames_due -= 1
+
+        if packets:
+            self.stats.frames_sent += len(packets)
+            self.writer.writelines(packets)
+            if starting and self.on_start:
+                self.on_start(time.monotonic())
+        elif frames_due:
+            # Дедлайн наступил, а целого фрейма нет
+            self.stats.underruns += 1
+            self.next_tick = None
+
+
+class PlayoutScheduler:
+    """
+    Один планировщик на процесс, обслуживающий исходящие потоки всех
+    звонков. Фреймы отправляются по абсолютным дедлайнам общей сетки
+    тиков от монотонных часов, поэтому задержки записи не
+    накапливаются, а число задач не растет с числом звонков.
+    """
+
+    def __init__(self, frame_duration: float = FRAME_DURATION,
+                 max_burst: int = PLAYOUT_MAX_BURST):
+        self.frame_duration = frame_duration
+        self.max_burst = max_burst
+        self.streams: set[PlayoutStream] = set()
+        self._origin = time.monotonic()
+        self._task: Optional[asyncio.Task] = None
+        self._wakeup: Optional[asyncio.Event] = None
+
+    def deadline(self, tick: int) -> float:
+        return self._origin + tick * self.frame_duration
+
+    def register(self, stream: PlayoutStream) -> None:
+        stream.scheduler = self
+        self.streams.add(stream)
+        if self._task is None or self._task.done():
+            self._wakeup = asyncio.Event()
+            self._task = asyncio.create_task(self._run())
+
+    def unregister(self, stream: PlayoutStream) -> None:
+        self.streams.discard(stream)
+        stream.scheduler = None
+
+    def wake(self) -> None:
+        if self._wakeup:
+            self._wakeup.set()
+
+    def _is_idle(self) -> bool:
+        return not any(
+            stream.buffer or stream.next_tick is not None
+            for stream in self.streams
+        )
+
+    async def _run(self):
+        while True:
+            if self._is_idle():
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                # Заново привязываем сетку, чтобы первый фрейм ушел сразу
+                self._origin = time.monotonic()
+
+            now = time.monotonic()
+            tick = int((now - self._origin) / self.frame_duration)
+            for stream in tuple(self.streams):
+                try:
+                    stream.service(tick, self, now)
+                except Exception as e:
+                    logger.error(f"Ошибка отправки аудио: {e}")
+                    stream.clear()
+
+            delay = self.deadline(tick + 1) - time.monotonic()
+            await asyncio.sleep(max(delay, 0))
+
+
+playout_scheduler = PlayoutScheduler()
@@ -0,0 +1,258 @@
+import atexit
+import logging
+import os
+import threading
+import time
+import wave
+from collections import deque
+from dataclasses import dataclass, asdict
+from datetime import date
+from typing import Optional
+
+import numpy as np
+
+from src import codec
+from src.constants import (RECORDING_DIR, RECORDING_QUEUE_LIMIT,
+                           RECORDING_POLL_INTERVAL, RECORDING_DELAY,
+                           DEFAULT_SAMPLE_RATE, DEFAULT_SAMPLE_WIDTH,
+                           READER_PAYLOAD_SIZE)
+
+logger = logging.getLogger(__name__)
+
+# Каналы стерео-записи: слева абонент, справа бот
+CALLER, BOT = 0, 1
+CHANNELS = 2
+
+
+@dataclass
+class RecorderStats:
+    """Статистика потока записи процесса."""
+
+    open_files: int = 0
+    written_frames: int = 0
+    dropped_frames: int = 0
+    errors: int = 0
+
+    def as_dict(self) -> dict:
+        return asdict(self)
+
+
+class CallRecording:
+    """
+    Запись одного звонка со стороны event loop: только складывает
+    фреймы в очередь писателя, ничего не пишет и не ждет.
+    """
+
+    def __init__(self, writer: 'RecordingWriter', call_id: str):
+        self.writer = writer
+        self.call_id = call_id
+        self.started = time.monotonic()
+        self.path = os.path.join(
+            RECORDING_DIR, date.today().isoformat(), f'{call_id}.wav')
+        self.dropped_frames = 0
+        writer.submit_control(('open', self, self.started))
+
+    def caller(self, alaw, at: Optional[float] = None) -> None:
+        """Входящий фрейм абонента (A-law, копируется)."""
+        self.writer.submit(self, CALLER, at or time.monotonic(),
+                           bytes(alaw))
+
+    def bot(self, pcm: bytes, at: float) -> None:
+        """Исходящий фрейм бота (slin) с дедлайном его отправки."""
+        self.writer.submit(self, BOT, at, pcm)
+
+    def close(self) -> None:
+        self.writer.submit_control(('close', self, time.monotonic()))
+
+
+class _RecordingFile:
+    """Состояние файла записи внутри потока писателя."""
+
+    def __init__(self, recording: CallRecording):
+        self.recording = recording
+        os.makedirs(os.path.dirname(recording.path), exist_ok=True)
+        self.wav = wave.open(recording.path, 'wb')
+        self.wav.setnchannels(CHANNELS)
+        self.wav.setsampwidth(DEFAULT_SAMPLE_WIDTH)
+        self.wav.setframerate(DEFAULT_SAMPLE_RATE)
+        # Уже записанные в файл отсчеты и ожидающие PCM16 по каналам
+        self.written = 0
+        self.pending = [bytearray(), bytearray()]
+
+    def _end(self, channel: int) -> int:
+        return self.written + len(self.pending[channel]) // 2
+
+    def _position(self, at: float) -> int:
+        return round((at - self.recording.started) * DEFAULT_SAMPLE_RATE)
+
+    def add(self, channel: int, at: float, pcm: bytes) -> None:
+        gap = self._position(at) - self._end(channel)
+        # Паузы короче фрейма — джиттер прихода, их не заполняем
+        if gap >= READER_PAYLOAD_SIZE:
+            self.pending[channel] += bytes(gap * DEFAULT_SAMPLE_WIDTH)
+        self.pending[channel] += pcm
+
+    def flush(self, until: Optional[float] = None) -> None:
+        """
+        Дополняет каналы тишиной до момента until (все, что старше,
+        уже не придет) и дописывает в файл общий для каналов отрезок.
+        """
+        if until is not None:
+            target = self._position(until)
+            for channel in (CALLER, BOT):
+                missing = target - self._end(channel)
+                if missing > 0:
+                    self.pending[channel] += bytes(
+                        missing * DEFAULT_SAMPLE_WIDTH)
+        samples = min(len(pending) for pending in self.pending) // 2
+        if not samples:
+            return
+        stereo = np.empty((samples, CHANNELS), dtype=np.int16)
+        size = samples * DEFAULT_SAMPLE_WIDTH
+        for channel in (CALLER, BOT):
+            pending = self.pending[channel]
+            stereo[:, channel] = np.frombuffer(pending, np.int16, samples)
+            del pending[:size]
+        # wave дописывает данные и сразу правит заголовок: файл
+        # корректен даже если процесс упадет посреди звонка
+        self.wav.writeframes(stereo.tobytes())
+        self.written += samples
+
+    def close(self, at: float) -> None:
+        self.flush(at)
+        # Хвост канала, ушедшего вперед, дописываем с тишиной в другом
+        longest = max(self._end(CALLER), self._end(BOT))
+        for channel in (CALLER, BOT):
+            self.pending[channel] += bytes(
+                (longest - self._end(channel)) * DEFAULT_SAMPLE_WIDTH)
+        self.flush()
+        self.wav.close()
+
+
+class RecordingWriter:
+    """
+    Отдельный поток, пишущий записи звонков на диск.
+
+    Event loop передает фреймы через deque: append/popleft в CPython
+    атомарны, так что обмен идет без блокировок и ожидания. Если
+    писатель не успевает и очередь длиннее queue_limit, новые аудио-
+    фреймы выбрасываются (с подсчетом), а не копятся в памяти.
+    """
+
+    def __init__(self, queue_limit: int = RECORDING_QUEUE_LIMIT):
+        self.queue_limit = queue_limit
+        self.queue: deque = deque()
+        self.stats = RecorderStats()
+        self._files: dict[CallRecording, _RecordingFile] = {}
+        self._thread: Optional[threading.Thread] = None
+        self._stopping = False
+
+    def start_recording(self, call_id: str) -> CallRecording:
+        if self._thread is None:
+            self._thread = threading.Thread(
+                target=self._run, name='call-recorder', daemon=True)
+            self._thread.start()
+            atexit.register(self.stop)
+        return CallRecording(self, call_id)
+
+    def submit(self, recording: CallRecording, channel: int, at: float,
+               pcm: bytes) -> None:
+        if len(self.queue) >= self.queue_limit:
+            recording.dropped_frames += 1
+            self.stats.dropped_frames += 1
+            return
+        self.queue.append((recording, channel, at, pcm))
+
+    def submit_control(self, item: tuple) -> None:
+        """Открытие/закрытие файла: в очередь всегда, без лимита."""
+        self.queue.append(item)
+
+    @property
+    def queue_depth(self) -> int:
+        return len(self.queue)
+
+    def report(self) -> dict:
+        return {'queue_depth': self.queue_depth, **self.stats.as_dict()}
+
+    def stop(self) -> None:
+        """Дописывает очередь и закрывает все файлы."""
+        if self._thread is None:
+            return
+        self._stopping = True
+        self._thread.join()
+        self._thread = None
+
+    def _run(self) -> None:
+        while True:
+            processed = self._drain()
+            now = time.monotonic()
+            for recording_file in tuple(self._files.values()):
+                self._safely(recording_file.flush, now - RECORDING_DELAY)
+            if self._stopping and not self.queue:
+                for recording_file in tuple(self._files.values()):
+                    self._safely(recording_file.close, now)
+                self._files.clear()
+                return
+            if not processed:
+                time.sleep(RECORDING_POLL_INTERVAL)
+
+    def _drain(self) -> int:
+        # Не больше, чем было в очереди на входе, чтобы между пачками
+        # успевать дописывать файлы
+        processed = len(self.queue)
+        for _ in range(processed):
+            # Ошибка на одном фрейме не должна останавливать поток:
+            # иначе пропадут все следующие записи узла
+            self._safely(self._process, self.queue.popleft())
+        return processed
+
+    def _process(self, item: tuple) -> None:
+        if item[0] == 'open':
+            self._open(item[1])
+        elif item[0] == 'close':
+            self._close(item[1], item[2])
+        else:
+            self._add(*item)
+
+    def _open(self, recording: CallRecording) -> None:
+        try:
+            self._files[recording] = _RecordingFile(recording)
+            self.stats.open_files = len(self._files)
+        except OSError as e:
+            self.stats.errors += 1
+            logger.error(f"Не удалось открыть запись {recording.path}: {e}")
+
+    def _close(self, recording: CallRecording, at: float) -> None:
+        recording_file = self._files.pop(recording, None)
+        self.stats.open_files = len(self._files)
+        if recording_file is None:
+            return
+        if self._safely(recording_file.close, at):
+            logger.info(
+                f"Запись звонка сохранена: {recording.path}, "
+                f"потеряно фреймов: {recording.dropped_frames}")
+
+    def _add(self, recording: CallRecording, channel: int, at: float,
+             data: bytes) -> None:
+        recording_file = self._files.get(recording)
+        if recording_file is None:
+            return
+        if channel == CALLER:
+            data = codec.alaw_decode(data).tobytes()
+        recording_file.add(channel, at, data)
+        self.stats.written_frames += 1
+
+    def _safely(self, func, *args) -> bool:
+        try:
+            func(*args)
+            return True
+        except (OSError, wave.Error) as e:
+            self.stats.errors += 1
+            logger.error(f"Ошибка записи звонка: {e}")
+        except Exception:
+            self.stats.errors += 1
+            logger.exception("Ошибка в потоке записи звонков")
+        return False
+
+
+recording_writer = RecordingWriter()
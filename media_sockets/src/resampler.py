@@ -0,0 +1,93 @@
+from typing import Optional
+
+import numpy as np
+
+from src.constants import (RESAMPLER_HALF_TAPS, RESAMPLER_KAISER_BETA,
+                           RESAMPLER_FRACTION_BITS, DEFAULT_SAMPLE_WIDTH)
+
+
+class StreamingResampler:
+    """
+    Потоковый полифазный дециматор PCM16 (например 24 kHz -> 8 kHz).
+
+    Один объект на звонок: история фильтра переносится между чанками,
+    поэтому результат не зависит от того, пришли данные одним куском
+    или множеством мелких дельт. Коэффициенты фильтра квантуются в
+    целые числа (Q-формат), а свертка считается во float64 — все
+    промежуточные значения остаются точными целыми, так что итог
+    бит-в-бит одинаков при любом разбиении входа.
+    """
+
+    _taps_cache: dict[tuple[int, int], np.ndarray] = {}
+
+    def __init__(self, sr_in: int, sr_out: int):
+        if sr_in % sr_out:
+            raise ValueError(
+                f'Поддерживается только целочисленная децимация, '
+                f'получено {sr_in} -> {sr_out}')
+        self.sr_in = sr_in
+        self.sr_out = sr_out
+        self.factor = sr_in // sr_out
+        self.taps = self._design_taps(self.factor, RESAMPLER_HALF_TAPS)
+        self.history_size = len(self.taps) - 1
+        self.reset()
+
+    @classmethod
+    def _design_taps(cls, factor: int, half_taps: int) -> np.ndarray:
+        """
+        Считает (один раз на процесс) ФНЧ с окном Кайзера, как в
+        resample_poly, и возвращает его развернутым и квантованным.
+        """
+        key = (factor, half_taps)
+        taps = cls._taps_cache.get(key)
+        if taps is None:
+            half_len = half_taps * factor
+            n = np.arange(-half_len, half_len + 1, dtype=np.float64)
+            cutoff = 1.0 / factor
+            taps = cutoff * np.sinc(cutoff * n)
+            taps *= np.kaiser(len(n), RESAMPLER_KAISER_BETA)
+            taps /= taps.sum()
+            taps = np.round(taps[::-1] * (1 << RESAMPLER_FRACTION_BITS))
+            taps.flags.writeable = False
+            cls._taps_cache[key] = taps
+        return taps
+
+    def reset(self) -> None:
+        """Сбрасывает историю фильтра (например, после прерывания)."""
+        self._history = np.zeros(self.history_size, dtype=np.float64)
+        self._phase = 0
+        self._odd_byte: Optional[int] = None
+
+    @property
+    def footprint(self) -> int:
+        return self._history.nbytes
+
+    def process(self, pcm_in: bytes) -> bytes:
+        """Ресэмплирует очередной чанк PCM16 и возвращает PCM16."""
+        if self._odd_byte is not None:
+            pcm_in = bytes((self._odd_byte,)) + bytes(pcm_in)
+            self._odd_byte = None
+        if len(pcm_in) % DEFAULT_SAMPLE_WIDTH:
+            self._odd_byte = pcm_in[-1]
+            pcm_in = memoryview(pcm_in)[:-1]
+        if not pcm_in:
+            return b''
+
+        samples = np.frombuffer(pcm_in, dtype=np.int16)
+        extended = np.empty(self.history_size + len(samples),
+                            dtype=np.float64)
+        extended[:self.history_size] = self._history
+        extended[self.history_size:] = samples
+
+        windows = np.lib.stride_tricks.sliding_window_view(
+            extended, len(self.taps))[self._phase::self.factor]
+        next_phase = self._phase + len(windows) * self.factor
+        self._phase = next_phase - (len(extended) - self.history_size)
+        self._history = extended[-self.history_size:].copy()
+
+        if not len(windows):
+            return b''
+        scale = float(1 << RESAMPLER_FRACTION_BITS)
+        out = np.floor(windows @ self.taps / scale + 0.5)
+        np.clip(out, -32768, 32767, out=out)
+        return out.astype(np.int16).tobytes()
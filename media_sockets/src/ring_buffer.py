@@ -0,0 +1,58 @@
+class RingBuffer:
+    """
+    Кольцевой буфер байт фиксированной емкости. Память выделяется один
+    раз при создании, запись и чтение копируют не больше двух отрезков.
+    """
+
+    def __init__(self, capacity: int):
+        self._buffer = bytearray(capacity)
+        self._view = memoryview(self._buffer)
+        self._read = 0
+        self._size = 0
+
+    @property
+    def capacity(self) -> int:
+        return len(self._buffer)
+
+    @property
+    def free(self) -> int:
+        return self.capacity - self._size
+
+    def __len__(self) -> int:
+        return self._size
+
+    def write(self, data) -> int:
+        """Записывает сколько поместится, возвращает число байт."""
+        count = min(len(data), self.free)
+        if not count:
+            return 0
+        start = (self._read + self._size) % self.capacity
+        first = min(count, self.capacity - start)
+        self._view[start:start + first] = data[:first]
+        if count > first:
+            self._view[:count - first] = data[first:count]
+        self._size += count
+        return count
+
+    def read(self, count: int) -> bytes:
+        """Забирает до count байт из начала буфера."""
+        count = min(count, self._size)
+        first = min(count, self.capacity - self._read)
+        data = self._view[self._read:self._read + first].tobytes()
+        if count > first:
+            data += self._view[:count - first].tobytes()
+        self.discard(count)
+        return data
+
+    def discard(self, count: int) -> int:
+        """Отбрасывает до count байт из начала буфера."""
+        count = min(count, self._size)
+        self._read = (self._read + count) % self.capacity
+        self._size -= count
+        if not self._size:
+            self._read = 0
+        return count
+
+    def clear(self) -> None:
+        self._read = 0
+        self._size = 0
@@ -0,0 +1,169 @@
+import asyncio
+import json
+import logging
+import ssl
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Optional
+
+import websockets
+from websockets.protocol import State
+
+from src.constants import (OPENAI_API_KEY, REALTIME_URL, SESSION_POOL_SIZE,
+                           SESSION_POOL_IDLE_TTL, SESSION_READY_TIMEOUT)
+
+logger = logging.getLogger(__name__)
+
+ssl_context = ssl.create_default_context()
+ssl_context.check_hostname = False
+ssl_context.verify_mode = ssl.CERT_NONE
+
+
+async def open_realtime_session(
+        session_config: dict) -> websockets.ClientConnection:
+    """Открывает WebSocket к OpenAI Realtime и отправляет session.update."""
+    logger.info(f"Connecting to WebSocket: {REALTIME_URL}")
+    headers = {
+        "Authorization": f"Bearer {OPENAI_API_KEY}",
+        "OpenAI-Beta": "realtime=v1"
+    }
+    ws = await websockets.connect(
+        REALTIME_URL, additional_headers=headers,
+        ssl=ssl_context if REALTIME_URL.startswith('wss://') else None)
+    logger.info("Successfully connected to OpenAI Realtime API")
+    await ws.send(json.dumps({
+        "type": "session.update",
+        "session": session_config
+    }))
+    return ws
+
+
+@dataclass
+class PooledSession:
+    """Подключенная и настроенная сессия, ожидающая звонка."""
+
+    ws: websockets.ClientConnection
+    config: dict
+    # Сессия, как ее подтвердил сервер в session.updated
+    session: dict = field(default_factory=dict)
+    ready_at: float = field(default_factory=time.monotonic)
+
+    @property
+    def is_open(self) -> bool:
+        return self.ws.state is State.OPEN
+
+
+class RealtimeSessionPool:
+    """
+    Пул заранее подключенных и настроенных сессий OpenAI Realtime на
+    процесс. Звонок забирает готовую сессию за O(1), а пул в фоне
+    добирает сессии до target_size и закрывает простоявшие дольше
+    idle_ttl.
+    """
+
+    def __init__(self, session_config: dict,
+                 target_size: int = SESSION_POOL_SIZE,
+                 idle_ttl: float = SESSION_POOL_IDLE_TTL):
+        self.session_config = session_config
+        self.target_size = target_size
+        self.idle_ttl = idle_ttl
+        self.ready: deque[PooledSession] = deque()
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+        self.ready_times: deque[float] = deque(maxlen=100)
+        self._task: Optional[asyncio.Task] = None
+        self._wakeup = asyncio.Event()
+
+    def start(self) -> None:
+        if self.target_size and self._task is None:
+            self._task = asyncio.create_task(self._maintain())
+
+    async def stop(self) -> None:
+        if self._task:
+            self._task.cancel()
+        while self.ready:
+            await self.ready.popleft().ws.close()
+
+    async def acquire(self) -> Optional[PooledSession]:
+        """Отдает готовую сессию или None, если пул пуст."""
+        while self.ready:
+            session = self.ready.popleft()
+            if session.is_open:
+                self.hits += 1
+                self._wakeup.set()
+                return session
+            await session.ws.close()
+        if self.target_size:
+            self.misses += 1
+            self._wakeup.set()
+        return None
+
+    async def _maintain(self) -> None:
+        while True:
+            try:
+                await self._expire()
+                missing = self.target_size - len(self.ready)
+                if missing > 0:
+                    sessions = await asyncio.gather(
+                        *(self._open() for _ in range(missing)),
+                        return_exceptions=True)
+                    for session in sessions:
+                        if isinstance(session, Exception):
+                            logger.error(
+                                f"Не удалось подготовить сессию: {session}")
+                        else:
+                            self.ready.append(session)
+            except Exception as e:
+                logger.error(f"Ошибка пула сессий: {e}")
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(
+                    self._wakeup.wait(), timeout=self.idle_ttl / 10)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _expire(self) -> None:
+        now = time.monotonic()
+        # Самые старые сессии в начале очереди
+        while self.ready and (
+                not self.ready[0].is_open
+                or now - self.ready[0].ready_at > self.idle_ttl):
+            self.expired += 1
+            await self.ready.popleft().ws.close()
+
+    async def _open(self) -> PooledSession:
+        started = time.monotonic()
+        ws = await open_realtime_session(self.session_config)
+        try:
+            session = await asyncio.wait_for(
+                self._wait_session_updated(ws), SESSION_READY_TIMEOUT)
+        except BaseException:
+            await ws.close()
+            raise
+        pooled = PooledSession(ws, self.session_config, session)
+        self.ready_times.append(pooled.ready_at - started)
+        return pooled
+
+    @staticmethod
+    async def _wait_session_updated(ws) -> dict:
+        while True:
+            event = json.loads(await ws.recv())
+            if event.get("type") == "session.updated":
+                return event["session"]
+            if event.get("type") == "error":
+                raise RuntimeError(event["error"].get("message"))
+
+    @property
+    def stats(self) -> dict:
+        return {
+            'ready': len(self.ready),
+            'target_size': self.target_size,
+            'hits': self.hits,
+            'misses': self.misses,
+            'expired': self.expired,
+            'avg_time_to_ready': (
+                sum(self.ready_times) / len(self.ready_times)
+                if self.ready_times else 0.0),
+        }
@@ -0,0 +1,138 @@
+import logging
+import multiprocessing
+import os
+import signal
+import time
+from multiprocessing.sharedctypes import RawArray
+from typing import Callable, Optional
+
+from src.constants import (WORKER_RESTART_DELAY, WORKER_POLL_INTERVAL,
+                           WORKER_STATS_INTERVAL)
+
+logger = logging.getLogger(__name__)
+
+
+class CallCounter:
+    """
+    Число активных звонков в процессе. У воркера супервизора значение
+    дублируется в его ячейку общей памяти (пишет только сам воркер,
+    поэтому блокировка не нужна).
+    """
+
+    def __init__(self):
+        self.value = 0
+        self._shared = None
+        self._index = 0
+
+    def attach(self, shared, index: int) -> None:
+        self._shared = shared
+        self._index = index
+        self._publish()
+
+    def increment(self) -> None:
+        self.value += 1
+        self._publish()
+
+    def decrement(self) -> None:
+        self.value -= 1
+        self._publish()
+
+    @property
+    def total(self) -> int:
+        """Звонки всех воркеров (или этого процесса без супервизора)."""
+        if self._shared is None:
+            return self.value
+        return sum(self._shared)
+
+    def _publish(self) -> None:
+        if self._shared is not None:
+            self._shared[self._index] = self.value
+
+
+call_counter = CallCounter()
+
+
+class Supervisor:
+    """
+    Запускает N воркеров (каждый со своим event loop'ом), слушающих
+    один порт через SO_REUSEPORT — ядро распределяет между ними новые
+    соединения. Упавший воркер перезапускается; число активных звонков
+    каждого воркера лежит в общей памяти.
+    """
+
+    def __init__(self, worker_count: int, target: Callable[[int], None]):
+        self.worker_count = worker_count
+        self.target = target
+        self._context = multiprocessing.get_context('fork')
+        self.active_calls = RawArray('i', worker_count)
+        self.workers: list[Optional[multiprocessing.Process]] = (
+            [None] * worker_count)
+        self.restarts = [0] * worker_count
+        self._stopping = False
+
+    def _run_worker(self, index: int) -> None:
+        # Сигналы остановки в воркере — поведение по умолчанию
+        signal.signal(signal.SIGINT, signal.SIG_DFL)
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+        call_counter.attach(self.active_calls, index)
+        self.target(index)
+
+    def _start_worker(self, index: int) -> None:
+        self.active_calls[index] = 0
+        process = self._context.Process(
+            target=self._run_worker, args=(index,),
+            name=f'audiosocket-worker-{index}')
+        process.start()
+        self.workers[index] = process
+        logger.info(f"Воркер {index} запущен, pid {process.pid}")
+
+    def _check_workers(self) -> None:
+        for index, process in enumerate(self.workers):
+            if process.is_alive():
+                continue
+            self.restarts[index] += 1
+            logger.error(
+                f"Воркер {index} (pid {process.pid}) завершился с кодом "
+                f"{process.exitcode}, перезапуск #{self.restarts[index]}")
+            time.sleep(WORKER_RESTART_DELAY)
+            if not self._stopping:
+                self._start_worker(index)
+
+    def _stop(self, signum, frame) -> None:
+        self._stopping = True
+
+    @property
+    def stats(self) -> dict:
+        return {
+            'active_calls': list(self.active_calls),
+            'restarts': list(self.restarts),
+        }
+
+    def run(self) -> None:
+        signal.signal(signal.SIGINT, self._stop)
+        signal.signal(signal.SIGTERM, self._stop)
+        logger.info(
+            f"Супервизор pid {os.getpid()}: {self.worker_count} воркеров")
+        for index in range(self.worker_count):
+            self._start_worker(index)
+
+        last_stats = time.monotonic()
+        while not self._stopping:
+            time.sleep(WORKER_POLL_INTERVAL)
+            if self._stopping:
+                break
+            self._check_workers()
+            if time.monotonic() - last_stats >= WORKER_STATS_INTERVAL:
+                last_stats = time.monotonic()
+                logger.info(f"Воркеры: {self.stats}")
+        self.shutdown()
+
+    def shutdown(self) -> None:
+        logger.info("Остановка воркеров")
+        for process in self.workers:
+            if process.is_alive():
+                process.terminate()
+        for process in self.workers:
+            process.join(WORKER_RESTART_DELAY * 5)
+            if process.is_alive():
+                process.kill()
@@ -0,0 +1,89 @@
+import asyncio
+import logging
+from typing import Callable, Iterator, Optional
+
+from src.constants import READER_BUFFER_SIZE, PARSER_BUFFER_SIZE
+from src.utils import AudioSocketParser
+
+logger = logging.getLogger(__name__)
+
+Packets = Iterator[tuple[int, int, memoryview]]
+
+
+class StreamPacketReader:
+    """Читает пакеты AudioSocket из asyncio.StreamReader."""
+
+    def __init__(self, reader: asyncio.StreamReader):
+        self.reader = reader
+        self.parser = AudioSocketParser()
+
+    async def read_packets(self) -> Optional[Packets]:
+        """Ждет данные и отдает все целые пакеты. None — конец потока."""
+        data = await self.reader.read(READER_BUFFER_SIZE)
+        if not data:
+            return None
+        self.parser.feed(data)
+        return self.parser.packets()
+
+
+class AudioSocketProtocol(asyncio.BufferedProtocol):
+    """
+    AudioSocket-соединение на asyncio.BufferedProtocol.
+
+    Транспорт читает прямо в заранее выделенный буфер парсера, без
+    промежуточных bytes на каждый recv. Для AudioWebSocketClient
+    протокол выступает reader'ом (read_packets), а транспорт — writer'ом:
+    плейаут отправляет фреймы пачкой через transport.writelines.
+    """
+
+    def __init__(self, client_factory: Callable):
+        self.client_factory = client_factory
+        self.parser = AudioSocketParser()
+        self.transport: Optional[asyncio.Transport] = None
+        self.task: Optional[asyncio.Task] = None
+        self._data_ready = asyncio.Event()
+        self._closed = False
+        self._eof_delivered = False
+        self._reading_paused = False
+
+    def connection_made(self, transport: asyncio.Transport) -> None:
+        self.transport = transport
+        client = self.client_factory(self, transport)
+        self.task = asyncio.create_task(client.run())
+
+    def get_buffer(self, sizehint: int) -> memoryview:
+        return self.parser.writable(max(sizehint, READER_BUFFER_SIZE))
+
+    def buffer_updated(self, nbytes: int) -> None:
+        self.parser.commit(nbytes)
+        if len(self.parser) > PARSER_BUFFER_SIZE and not self._reading_paused:
+            # Клиент не успевает разбирать пакеты — не даем буферу расти
+            self._reading_paused = True
+            self.transport.pause_reading()
+        self._data_ready.set()
+
+    def eof_received(self) -> bool:
+        self._closed = True
+        self._data_ready.set()
+        return False
+
+    def connection_lost(self, exc: Optional[Exception]) -> None:
+        if exc:
+            logger.warning(f"AudioSocket соединение разорвано: {exc}")
+        self._closed = True
+        self._data_ready.set()
+
+    async def read_packets(self) -> Optional[Packets]:
+        """Ждет данные и отдает все целые пакеты. None — конец потока."""
+        await self._data_ready.wait()
+        if self._closed:
+            # Отдаем последние целые пакеты один раз, затем конец потока
+            if self._eof_delivered:
+                return None
+            self._eof_delivered = True
+            return self.parser.packets()
+        self._data_ready.clear()
+        if self._reading_paused:
+            self._reading_paused = False
+            self.transport.resume_reading()
+        return self.parser.packets()
@@ -0,0 +1,83 @@
+import asyncio
+import base64
+import logging
+from typing import Awaitable, Callable, Optional
+
+from src.constants import (UPLINK_WINDOW_MS, INPUT_BYTES_PER_MS,
+                           BYTES_ENCODING)
+
+logger = logging.getLogger(__name__)
+
+
+class UplinkAggregator:
+    """
+    Склеивает входящие 20 мс фреймы в одно сообщение
+    input_audio_buffer.append на окно window_ms.
+
+    Окно отправляется, когда набралось целиком, когда сработал таймер
+    (фреймы перестали приходить) или по явному flush() на границе речи.
+    """
+
+    def __init__(self, send: Callable[[str], Awaitable],
+                 window_ms: int = UPLINK_WINDOW_MS):
+        self.send = send
+        self.window_ms = window_ms
+        self.window_bytes = window_ms * INPUT_BYTES_PER_MS
+        self.buffer = bytearray()
+        self.frames_in = 0
+        self.messages_out = 0
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._flush_task: Optional[asyncio.Task] = None
+
+    async def push(self, payload) -> None:
+        """Добавляет фрейм и отправляет окно, если оно заполнено."""
+        self.buffer += payload
+        self.frames_in += 1
+        if len(self.buffer) >= self.window_bytes:
+            await self.flush()
+        elif self._timer is None:
+            self._timer = asyncio.get_running_loop().call_later(
+                self.window_ms / 1000, self._on_timer)
+
+    def _on_timer(self) -> None:
+        self._timer = None
+        if self.buffer and self._flush_task is None:
+            self._flush_task = asyncio.create_task(self.flush())
+            self._flush_task.add_done_callback(self._on_flush_done)
+
+    def _on_flush_done(self, task: asyncio.Task) -> None:
+        self._flush_task = None
+        if not task.cancelled() and task.exception():
+            logger.error(
+                f"Ошибка отправки аудио по таймеру: {task.exception()}")
+
+    async def flush(self) -> None:
+        """Отправляет накопленное аудио, не дожидаясь конца окна."""
+        self._cancel_timer()
+        if not self.buffer:
+            return
+        audio = base64.b64encode(self.buffer).decode(BYTES_ENCODING)
+        self.buffer.clear()
+        self.messages_out += 1
+        # base64 не требует экранирования, поэтому json.dumps не нужен
+        await self.send(
+            '{"type": "input_audio_buffer.append", "audio": "%s"}' % audio)
+
+    def _cancel_timer(self) -> None:
+        if self._timer:
+            self._timer.cancel()
+            self._timer = None
+
+    def close(self) -> None:
+        self._cancel_timer()
+        if self._flush_task:
+            self._flush_task.cancel()
+        self.buffer.clear()
+
+    @property
+    def stats(self) -> dict:
+        return {
+            'frames_in': self.frames_in,
+            'messages_out': self.messages_out,
+            'window_ms': self.window_ms,
+        }
@@ -1,29 +1,32 @@
 from pydub import AudioSegment
-import audioop
-import struct
-from typing import Optional
+from typing import Iterator
+
+from src import codec
 
 from src.constants import (DEFAULT_SAMPLE_RATE, CHANNEL_COUNT,
-                           DEFAULT_SAMPLE_WIDTH)
+                           DEFAULT_SAMPLE_WIDTH, READER_HEADER_SIZE,
+                           PARSER_BUFFER_SIZE, PARSER_MAX_BUFFER_SIZE)
 
 
 class AudioConverter:
     """Класс для конвертации аудио в разные форматы."""
 
     @staticmethod
-    def convert_to_raw(mp3_file) -> bytes:
-        """Достаем из аудио mp3 -> RAW PCM данные в одном канале и 16-бит
-        глубиной."""
-        audio_fragment = AudioSegment.from_mp3(mp3_file)
-        audio_fragment.set_frame_rate(DEFAULT_SAMPLE_RATE).set_channels(
-            CHANNEL_COUNT)
-        audio_fragment.set_sample_width(DEFAULT_SAMPLE_WIDTH)
+    def convert_to_raw(audio_file) -> bytes:
+        """Достаем из аудио (mp3, wav, ...) -> RAW PCM данные 8 kHz в одном
+        канале и 16-бит глубиной."""
+        audio_fragment = (
+            AudioSegment.from_file(audio_file)
+            .set_frame_rate(DEFAULT_SAMPLE_RATE)
+            .set_channels(CHANNEL_COUNT)
+            .set_sample_width(DEFAULT_SAMPLE_WIDTH)
+        )
         return audio_fragment.raw_data
 
     @staticmethod
     def alaw_to_pcm(alaw_data):
         """Конвертация A-law в 16-bit PCM"""
-        return audioop.alaw2lin(alaw_data, DEFAULT_SAMPLE_WIDTH)
+        return codec.alaw_decode(alaw_data).tobytes()
 
     @staticmethod
     def create_audio_packet(pcm_data: bytes) -> bytes:
@@ -35,44 +38,73 @@ class AudioConverter:
         payload_length = len(pcm_data).to_bytes(2, byteorder="big")
         return packet_type + payload_length + pcm_data
 
-    @staticmethod
-    def resample_audio(pcm_in: bytes, sr_in: int, sr_out: int) -> bytes:
-        """Ресэмплирует PCM16 аудио с sr_in в sr_out."""
-        import numpy as np
-        from scipy.signal import resample_poly
-        from fractions import Fraction
 
-        data_int16 = np.frombuffer(pcm_in, dtype=np.int16)
-        data_float = data_int16.astype(np.float32)
+class AudioSocketParser:
+    """
+    Парсер потока AudioSocket: [тип][длина_payload][payload].
 
-        ratio = Fraction(sr_out, sr_in).limit_denominator(1000)
-        up = ratio.numerator
-        down = ratio.denominator
+    Буфер выделяется один раз и переиспользуется: данные пишутся в его
+    свободный хвост, а payload отдается срезами memoryview без
+    копирования. Срезы действительны до следующей записи в парсер.
+    """
 
-        data_resampled = resample_poly(data_float, up, down)
-        return data_resampled.astype(np.int16).tobytes()
+    def __init__(self, capacity: int = PARSER_BUFFER_SIZE):
+        self.buffer = bytearray(capacity)
+        self._view = memoryview(self.buffer)
+        self._start = 0
+        self._end = 0
 
+    def __len__(self) -> int:
+        return self._end - self._start
 
-class AudioSocketParser:
+    @property
+    def capacity(self) -> int:
+        return len(self.buffer)
 
-    def __init__(self):
-        self.buffer = bytearray()
-
-    def parse_packet(self) -> Optional[tuple[int, int, bytes]]:
+    def writable(self, size_hint: int = 1) -> memoryview:
+        """
+        Возвращает свободный хвост буфера не меньше size_hint байт.
+        Недочитанный хвост переносится в начало только когда места не
+        хватает, поэтому копирование амортизировано, а не на каждый пакет.
+        """
+        if self._start == self._end:
+            self._start = self._end = 0
+        if len(self.buffer) - self._end < size_hint:
+            pending = self.buffer[self._start:self._end]
+            if len(pending) + size_hint > len(self.buffer):
+                if len(pending) + size_hint > PARSER_MAX_BUFFER_SIZE:
+                    raise BufferError(
+                        f'Буфер парсера AudioSocket превысил '
+                        f'{PARSER_MAX_BUFFER_SIZE} байт')
+                self.buffer = bytearray(min(
+                    max(2 * len(self.buffer), len(pending) + size_hint),
+                    PARSER_MAX_BUFFER_SIZE))
+                self._view = memoryview(self.buffer)
+            self.buffer[:len(pending)] = pending
+            self._start, self._end = 0, len(pending)
+        return self._view[self._end:]
+
+    def commit(self, nbytes: int) -> None:
+        """Отмечает nbytes, записанных в хвост из writable()."""
+        self._end += nbytes
+
+    def feed(self, data: bytes) -> None:
+        """Копирует принятые данные в буфер."""
+        self.writable(len(data))[:len(data)] = data
+        self.commit(len(data))
+
+    def packets(self) -> Iterator[tuple[int, int, memoryview]]:
         """
-        Пытаемся распарсить пакет из буфера.
+        Отдает все целые пакеты из буфера.
         Возвращает: (тип, длина_payload, payload)
         """
-        if len(self.buffer) < 3:
-            return None
-
-        header = self.buffer[:3]
-        obj_type = header[0]
-        payload_length = struct.unpack('>H', header[1:3])[0]
-
-        total_length = 3 + payload_length
-        if len(self.buffer) < total_length:
-            return None
-        payload = bytes(self.buffer[3:3 + payload_length])
-        del self.buffer[:total_length]
-        return obj_type, payload_length, payload
+        while self._end - self._start >= READER_HEADER_SIZE:
+            buffer, start = self.buffer, self._start
+            payload_length = (buffer[start + 1] << 8) | buffer[start + 2]
+            payload_start = start + READER_HEADER_SIZE
+            payload_end = payload_start + payload_length
+            if payload_end > self._end:
+                break
+            self._start = payload_end
+            yield (buffer[start], payload_length,
+                   self._view[payload_start:payload_end])
@@ -0,0 +1,142 @@
+import logging
+from collections import deque
+from dataclasses import dataclass, asdict
+from typing import Awaitable, Callable
+
+import numpy as np
+
+from src import codec
+from src.constants import (DEFAULT_SAMPLE_RATE, FRAME_DURATION,
+                           LOCAL_VAD_ENABLED, LOCAL_VAD_AGGRESSIVENESS,
+                           LOCAL_VAD_SPEECH_START_MS, LOCAL_VAD_HANGOVER_MS,
+                           LOCAL_VAD_PADDING_MS)
+
+try:
+    import webrtcvad
+except ImportError:
+    webrtcvad = None
+
+logger = logging.getLogger(__name__)
+
+FRAME_MS = int(FRAME_DURATION * 1000)
+# Длины фреймов (в отсчетах 8 kHz), которые принимает webrtcvad
+VAD_FRAME_SAMPLES = (80, 160, 240)
+
+
+@dataclass
+class VADConfig:
+    """Настройки локального VAD, задаются на каждый звонок."""
+
+    enabled: bool = LOCAL_VAD_ENABLED
+    # Агрессивность webrtcvad: 0 (мягко) .. 3 (строго)
+    aggressiveness: int = LOCAL_VAD_AGGRESSIVENESS
+    # Сколько речи подряд нужно, чтобы считать, что абонент заговорил
+    speech_start_ms: int = LOCAL_VAD_SPEECH_START_MS
+    # Сколько тишины после речи еще отправлять в OpenAI. Должно быть
+    # больше silence_duration_ms серверного VAD, иначе он не увидит
+    # конец реплики.
+    hangover_ms: int = LOCAL_VAD_HANGOVER_MS
+    # Сколько тишины перед речью отправить вместе с началом фразы
+    padding_ms: int = LOCAL_VAD_PADDING_MS
+    suppress_silence: bool = True
+    barge_in: bool = True
+
+
+@dataclass
+class VADStats:
+    frames_in: int = 0
+    frames_suppressed: int = 0
+    speech_segments: int = 0
+    barge_ins: int = 0
+
+    def as_dict(self) -> dict:
+        return asdict(self)
+
+
+class LocalVAD:
+    """
+    Локальный VAD на входящем аудио.
+
+    Глушит длинные паузы (оставляя padding до и hangover после речи),
+    чтобы не гонять тишину в OpenAI, и сразу сообщает о начале речи,
+    чтобы прервать ответ бота, не дожидаясь серверного
+    input_audio_buffer.speech_started.
+    """
+
+    def __init__(self, config: VADConfig,
+                 sink: Callable[[bytes], Awaitable],
+                 on_speech_start: Callable[[], Awaitable],
+                 on_speech_end: Callable[[], Awaitable]):
+        self.config = config
+        self.sink = sink
+        self.on_speech_start = on_speech_start
+        self.on_speech_end = on_speech_end
+        self.vad = webrtcvad.Vad(config.aggressiveness)
+        self.stats = VADStats()
+        self.in_speech = False
+        self.suppressing = False
+        self._voiced_ms = 0
+        self._silence_ms = 0
+        self._padding: deque[bytes] = deque(
+            maxlen=max(config.padding_ms // FRAME_MS, 1))
+        self._pcm = np.empty(max(VAD_FRAME_SAMPLES), dtype=np.int16)
+
+    @classmethod
+    def create(cls, config: VADConfig, *args):
+        """Возвращает LocalVAD или None, если VAD выключен/недоступен."""
+        if not config.enabled:
+            return None
+        if webrtcvad is None:
+            logger.warning("webrtcvad не установлен, локальный VAD выключен")
+            return None
+        return cls(config, *args)
+
+    def is_speech(self, frame) -> bool:
+        if len(frame) not in VAD_FRAME_SAMPLES:
+            # Нестандартный фрейм VAD не оценит — считаем его речью
+            return True
+        pcm = codec.alaw_decode(frame, self._pcm)
+        return self.vad.is_speech(pcm.tobytes(), DEFAULT_SAMPLE_RATE)
+
+    async def process(self, frame) -> None:
+        """Пропускает фрейм через VAD и отдает его в sink, если нужно."""
+        # frame может быть memoryview буфера протокола: копируем его до
+        # первого await, пока парсер не перезаписал буфер
+        frame = bytes(frame)
+        self.stats.frames_in += 1
+        if self.is_speech(frame):
+            self._voiced_ms += FRAME_MS
+            self._silence_ms = 0
+        else:
+            self._voiced_ms = 0
+            self._silence_ms += FRAME_MS
+
+        if not self.in_speech and (
+                self._voiced_ms >= self.config.speech_start_ms):
+            await self._start_speech()
+        elif self.in_speech and (
+                self._silence_ms >= self.config.hangover_ms):
+            self.in_speech = False
+            await self.on_speech_end()
+
+        if not self.in_speech and self.config.suppress_silence and (
+                self._silence_ms >= self.config.hangover_ms):
+            self.suppressing = True
+
+        if self.suppressing:
+            # Придерживаем последние padding_ms, более старое выбрасываем
+            if len(self._padding) == self._padding.maxlen:
+                self.stats.frames_suppressed += 1
+            self._padding.append(frame)
+        else:
+            await self.sink(frame)
+
+    async def _start_speech(self) -> None:
+        self.in_speech = True
+        self.suppressing = False
+        self.stats.speech_segments += 1
+        # Отправляем придержанную тишину перед началом фразы
+        while self._padding:
+            await self.sink(self._padding.popleft())
+        if self.config.barge_in:
+            await self.on_speech_start()
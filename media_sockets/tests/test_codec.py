@@ -0,0 +1,60 @@
+"""
+Сверка G.711 кодека (src/codec) с audioop бит-в-бит: все 256 кодов
+и все 65536 значений PCM16, оба закона, с out= и без.
+
+Запуск из каталога media_sockets:
+    python -m pytest tests
+"""
+import numpy as np
+import pytest
+
+from src import codec
+
+audioop = pytest.importorskip(
+    'audioop', reason='audioop удален из интерпретатора, сверять не с чем')
+
+ALL_CODES = bytes(range(256))
+ALL_SAMPLES = np.arange(65536, dtype=np.uint16).tobytes()
+# Запас в out: кодек должен писать только в начало массива
+OUT_SLACK = 16
+
+LAWS = {
+    'alaw': (codec.alaw_decode, codec.alaw_encode,
+             audioop.alaw2lin, audioop.lin2alaw),
+    'ulaw': (codec.ulaw_decode, codec.ulaw_encode,
+             audioop.ulaw2lin, audioop.lin2ulaw),
+}
+
+
+@pytest.fixture(params=LAWS, ids=str)
+def law(request):
+    return LAWS[request.param]
+
+
+def test_decode_matches_audioop(law):
+    decode, _, decode_ref, _ = law
+    assert decode(ALL_CODES).tobytes() == decode_ref(ALL_CODES, 2)
+
+
+def test_encode_matches_audioop(law):
+    _, encode, _, encode_ref = law
+    assert encode(ALL_SAMPLES).tobytes() == encode_ref(ALL_SAMPLES, 2)
+
+
+def test_decode_into_out(law):
+    decode, _, decode_ref, _ = law
+    out = np.full(len(ALL_CODES) + OUT_SLACK, -1, dtype=np.int16)
+    result = decode(ALL_CODES, out)
+    assert np.shares_memory(result, out)
+    assert result.tobytes() == decode_ref(ALL_CODES, 2)
+    assert (out[len(ALL_CODES):] == -1).all()
+
+
+def test_encode_into_out(law):
+    _, encode, _, encode_ref = law
+    samples = len(ALL_SAMPLES) // 2
+    out = np.full(samples + OUT_SLACK, 0xAA, dtype=np.uint8)
+    result = encode(ALL_SAMPLES, out)
+    assert np.shares_memory(result, out)
+    assert result.tobytes() == encode_ref(ALL_SAMPLES, 2)
+    assert (out[samples:] == 0xAA).all()
@@ -0,0 +1,54 @@
+"""Быстрый разбор response.audio.delta не зависит от порядка полей."""
+import base64
+import json
+
+import pytest
+
+from src.events import parse_audio_delta
+
+AUDIO = bytes(range(256)) * 4
+DELTA = base64.b64encode(AUDIO).decode()
+FIELDS = {
+    'type': 'response.audio.delta',
+    'event_id': 'event_' + 'x' * 80,
+    'response_id': 'resp_1',
+    'item_id': 'item_1',
+    'output_index': 0,
+    'content_index': 0,
+    'delta': DELTA,
+}
+
+
+def compact(event: dict) -> bytes:
+    return json.dumps(event, separators=(',', ':')).encode()
+
+
+@pytest.mark.parametrize('order', [
+    ('type', 'event_id', 'response_id', 'item_id', 'delta'),
+    # event_id с длинным id первым: тип далеко от начала сообщения
+    ('event_id', 'response_id', 'item_id', 'output_index', 'type', 'delta'),
+    # тип после аудио
+    ('event_id', 'delta', 'item_id', 'response_id', 'type'),
+], ids=['type_first', 'event_id_first', 'type_last'])
+def test_audio_delta_any_key_order(order):
+    message = compact({key: FIELDS[key] for key in order})
+    delta = parse_audio_delta(message)
+    assert delta is not None
+    assert delta.response_id == 'resp_1'
+    assert delta.item_id == 'item_1'
+    assert base64.b64decode(delta.delta) == AUDIO
+
+
+def test_transcript_delta_is_not_audio():
+    message = compact({'event_id': FIELDS['event_id'],
+                       'type': 'response.audio_transcript.delta',
+                       'delta': 'Здравствуйте'})
+    assert parse_audio_delta(message) is None
+
+
+def test_unexpected_format_falls_back():
+    # Не компактный JSON: быстрый путь отказывается, сообщение уйдет
+    # через json.loads
+    message = json.dumps(FIELDS).encode()
+    assert parse_audio_delta(message) is None
+    assert json.loads(message)['delta'] == DELTA
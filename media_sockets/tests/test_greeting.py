@@ -0,0 +1,158 @@
+"""
+Приветствие из кэша фраз: играет с первого фрейма абонента (после
+ответа), не прерывается VAD и попадает в диалог, только когда доиграно.
+"""
+import asyncio
+import uuid
+
+import pytest
+
+import main
+from src.constants import AUDIO_TYPE, READER_PAYLOAD_SIZE, UUID_TYPE
+
+GREETING_TEXT = 'Здравствуйте!'
+GREETING_FRAMES = 5
+
+
+class FakeTransport:
+    def __init__(self):
+        self.packets = 0
+
+    def write(self, data):
+        self.packets += 1
+
+    def writelines(self, packets):
+        self.packets += len(packets)
+
+    def is_closing(self):
+        return False
+
+    def get_write_buffer_size(self):
+        return 0
+
+    def close(self):
+        pass
+
+
+class FakeReader:
+    class parser:
+        capacity = 0
+
+
+class FakeSession:
+    async def send(self, message):
+        pass
+
+    async def close(self):
+        pass
+
+
+@pytest.fixture
+def greeting(monkeypatch):
+    pcm = memoryview(bytes(READER_PAYLOAD_SIZE * 2 * GREETING_FRAMES))
+    monkeypatch.setitem(
+        main.phrase_cache.texts, main.GREETING_PHRASE, GREETING_TEXT)
+    monkeypatch.setattr(main.phrase_cache, 'get', lambda name: pcm)
+
+
+def run_call(scenario):
+    """Звонок с подмененными OpenAI и журналом; scenario(client, sent)."""
+    async def call():
+        client = main.AudioWebSocketClient(
+            FakeReader(), FakeTransport(), instructions='')
+        sent = []
+
+        async def connect():
+            client.ws = FakeSession()
+
+        async def send_event(event):
+            sent.append(event)
+
+        async def receive_events():
+            await asyncio.sleep(3600)
+
+        client.connect = connect
+        client.send_event = send_event
+        client.receive_events = receive_events
+        client.journal_transcript = (
+            lambda role, text, *args: sent.append((role, text)))
+        try:
+            await scenario(client, sent)
+        finally:
+            await client.cleanup()
+    asyncio.run(call())
+
+
+async def answer(client):
+    await client.handle_packet(
+        UUID_TYPE, 16, memoryview(uuid.uuid4().bytes))
+    await client.handle_packet(
+        AUDIO_TYPE, READER_PAYLOAD_SIZE, memoryview(
+            bytes(READER_PAYLOAD_SIZE)))
+
+
+async def played(client):
+    await asyncio.wait_for(asyncio.shield(client.greeting_played), 2)
+    await asyncio.sleep(0)
+
+
+def test_greeting_waits_for_first_audio_frame(greeting):
+    async def scenario(client, sent):
+        await client.handle_packet(
+            UUID_TYPE, 16, memoryview(uuid.uuid4().bytes))
+        await asyncio.sleep(0.1)
+        assert not client.greeting_started
+        assert client.audio_handler.playout.stats.frames_sent == 0
+        assert sent == []
+    run_call(scenario)
+
+
+def test_greeting_announced_after_playout(greeting):
+    async def scenario(client, sent):
+        await answer(client)
+        assert client.greeting_playing
+        assert sent == []
+        await played(client)
+        assert client.greeting_played.result() is True
+        assert not client.greeting_playing
+        assert sent[0]['type'] == 'conversation.item.create'
+        assert sent[0]['item']['content'][0]['text'] == GREETING_TEXT
+        assert sent[1] == ('assistant', GREETING_TEXT)
+        assert (client.audio_handler.playout.stats.frames_sent
+                == GREETING_FRAMES)
+    run_call(scenario)
+
+
+def test_speech_does_not_cut_greeting(greeting):
+    async def scenario(client, sent):
+        await answer(client)
+        # «Алло?» сразу после ответа: и локальный, и серверный VAD
+        await client.handle_speech_started({})
+        await client.on_local_speech_start()
+        assert client.greeting_playing
+        await played(client)
+        assert client.greeting_played.result() is True
+        assert (client.audio_handler.playout.stats.frames_sent
+                == GREETING_FRAMES)
+    run_call(scenario)
+
+
+def test_greeting_not_announced_when_cut(greeting):
+    async def scenario(client, sent):
+        await answer(client)
+        client.audio_handler.stop_playback()
+        await played(client)
+        assert client.greeting_played.result() is False
+        assert sent == []
+    run_call(scenario)
+
+
+def test_no_greeting_in_cache(monkeypatch):
+    monkeypatch.setattr(main.phrase_cache, 'get', lambda name: None)
+
+    async def scenario(client, sent):
+        await answer(client)
+        await played(client)
+        assert client.greeting_played.result() is False
+        assert sent == []
+    run_call(scenario)
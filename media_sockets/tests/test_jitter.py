@@ -0,0 +1,98 @@
+"""
+Джиттер-буфер входящего аудио (src/jitter): пачки и задержки пакетов
+сглаживаются в ровный поток без перестановки фреймов, опоздавшие
+фреймы не сдвигают поток, провалы маскируются.
+
+Запуск из каталога media_sockets:
+    python -m pytest tests
+"""
+from src.constants import (FRAME_DURATION, JITTER_CONCEAL_LIMIT,
+                           JITTER_MAX_FRAMES, JITTER_MIN_FRAMES,
+                           READER_PAYLOAD_SIZE)
+from src.jitter import JitterBuffer
+
+
+def frame(value: int) -> bytes:
+    return bytes([value]) * READER_PAYLOAD_SIZE
+
+
+def test_fills_to_min_depth_before_playing():
+    jitter = JitterBuffer()
+    for i in range(JITTER_MIN_FRAMES - 1):
+        jitter.put(frame(i), arrival=i * FRAME_DURATION)
+        assert jitter.get() is None
+    jitter.put(frame(9), arrival=JITTER_MIN_FRAMES * FRAME_DURATION)
+    assert jitter.get() == frame(0)
+
+
+def test_bursty_arrival_keeps_frame_order():
+    jitter = JitterBuffer()
+    # Пакеты приходят пачками по 4 раз в 80 мс — на выходе ровно
+    # по фрейму на слот и в исходном порядке
+    out = []
+    for burst in range(10):
+        for i in range(4):
+            jitter.put(frame(burst * 4 + i),
+                       arrival=burst * 4 * FRAME_DURATION)
+        for _ in range(4):
+            out.append(jitter.get())
+    played = [f[0] for f in out if f is not None]
+    assert played == sorted(played)
+    assert len(set(played)) == len(played)
+    assert jitter.target_depth > JITTER_MIN_FRAMES
+    assert jitter.stats.late_frames == 0
+
+
+def test_gap_is_concealed_and_late_frame_does_not_shift_stream():
+    jitter = JitterBuffer()
+    for i in range(JITTER_MIN_FRAMES):
+        jitter.put(frame(i + 1), arrival=i * FRAME_DURATION)
+    assert jitter.get() == frame(1)
+    assert jitter.get() == frame(2)
+    # Буфер пуст: сначала повтор последнего фрейма, потом тишина
+    assert jitter.get() == frame(2)
+    assert jitter.get() == jitter.silence
+    assert jitter.stats.concealed_frames == 2
+    # Фреймы замаскированных слотов считаются опоздавшими и идут
+    # следом по порядку
+    for i in range(4):
+        jitter.put(frame(10 + i), arrival=(4 + i) * FRAME_DURATION)
+    assert jitter.stats.late_frames == 2
+    assert [jitter.get() for _ in range(4)] == [
+        frame(10 + i) for i in range(4)]
+
+
+def test_late_frame_over_target_is_dropped():
+    jitter = JitterBuffer()
+    for i in range(JITTER_MIN_FRAMES):
+        jitter.put(frame(i + 1), arrival=i * FRAME_DURATION)
+    for _ in range(JITTER_MIN_FRAMES + 1):
+        jitter.get()
+    # Буфер уже на целевой глубине: фрейм замаскированного слота
+    # не добавляет задержку, а выбрасывается
+    for i in range(JITTER_MIN_FRAMES):
+        jitter.frames.append(frame(20 + i))
+    jitter.put(frame(30), arrival=JITTER_MIN_FRAMES * FRAME_DURATION)
+    assert jitter.stats.late_frames == 1
+    assert jitter.stats.dropped_frames == 1
+    assert frame(30) not in jitter.frames
+
+
+def test_long_gap_refills_buffer():
+    jitter = JitterBuffer()
+    for i in range(JITTER_MIN_FRAMES):
+        jitter.put(frame(i), arrival=i * FRAME_DURATION)
+    for _ in range(JITTER_MIN_FRAMES + JITTER_CONCEAL_LIMIT):
+        jitter.get()
+    assert not jitter.playing
+    jitter.put(frame(7), arrival=1.0)
+    assert jitter.get() is None
+
+
+def test_depth_is_bounded():
+    jitter = JitterBuffer()
+    for i in range(JITTER_MAX_FRAMES + 5):
+        jitter.put(frame(i), arrival=0.0)
+    assert len(jitter.frames) == JITTER_MAX_FRAMES
+    assert jitter.stats.dropped_frames == 5
+    assert jitter.frames[-1] == frame(JITTER_MAX_FRAMES + 4)
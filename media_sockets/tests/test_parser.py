@@ -0,0 +1,105 @@
+"""
+Парсер AudioSocket (src/utils.AudioSocketParser): пакеты, разрезанные
+между чтениями в любом месте, пакеты на границе буфера, перенос хвоста
+и рост буфера до PARSER_MAX_BUFFER_SIZE.
+
+Запуск из каталога media_sockets:
+    python -m pytest tests
+"""
+import pytest
+
+from src.constants import (AUDIO_TYPE, HANGUP_TYPE, PARSER_MAX_BUFFER_SIZE,
+                           READER_HEADER_SIZE, UUID_TYPE)
+from src.utils import AudioSocketParser
+
+
+def packet(kind: int, payload: bytes) -> bytes:
+    return bytes([kind]) + len(payload).to_bytes(2, 'big') + payload
+
+
+def stream() -> tuple[bytes, list[tuple[int, bytes]]]:
+    expected = [(UUID_TYPE, bytes(range(16)))]
+    expected += [(AUDIO_TYPE, bytes([i]) * 320) for i in range(20)]
+    expected.append((HANGUP_TYPE, b''))
+    return b''.join(packet(k, p) for k, p in expected), expected
+
+
+def drain(parser: AudioSocketParser) -> list[tuple[int, bytes]]:
+    # Срезы действительны только до следующей записи — копируем сразу
+    return [(kind, bytes(payload)) for kind, length, payload
+            in parser.packets()]
+
+
+def feed_in_chunks(parser, data: bytes, size: int) -> list:
+    received = []
+    for pos in range(0, len(data), size):
+        parser.feed(data[pos:pos + size])
+        received += drain(parser)
+    return received
+
+
+@pytest.mark.parametrize('size', [1, 2, 3, 4, 161, 323, 1000, 4096])
+def test_split_packets_are_reassembled(size):
+    data, expected = stream()
+    parser = AudioSocketParser(capacity=1024)
+    assert feed_in_chunks(parser, data, size) == expected
+    assert len(parser) == 0
+
+
+def test_partial_header_and_payload_wait_for_rest():
+    parser = AudioSocketParser()
+    frame = packet(AUDIO_TYPE, b'\x01' * 320)
+    parser.feed(frame[:2])
+    assert drain(parser) == []
+    parser.feed(frame[2:READER_HEADER_SIZE + 100])
+    assert drain(parser) == []
+    assert len(parser) == READER_HEADER_SIZE + 100
+    parser.feed(frame[READER_HEADER_SIZE + 100:])
+    assert drain(parser) == [(AUDIO_TYPE, b'\x01' * 320)]
+
+
+def test_packet_ending_exactly_at_buffer_boundary():
+    frame = packet(AUDIO_TYPE, b'\x02' * 320)
+    parser = AudioSocketParser(capacity=2 * len(frame))
+    parser.feed(frame + frame)
+    assert drain(parser) == [(AUDIO_TYPE, b'\x02' * 320)] * 2
+    # Буфер пуст: следующая запись снова идет с начала, без роста
+    parser.feed(frame)
+    assert drain(parser) == [(AUDIO_TYPE, b'\x02' * 320)]
+    assert parser.capacity == 2 * len(frame)
+
+
+def test_tail_is_moved_to_start_without_growing():
+    frame = packet(AUDIO_TYPE, b'\x03' * 320)
+    capacity = 2 * len(frame)
+    parser = AudioSocketParser(capacity=capacity)
+    # Полтора пакета: хвост половинки упирается в конец буфера
+    parser.feed(frame + frame[:len(frame) // 2])
+    assert drain(parser) == [(AUDIO_TYPE, b'\x03' * 320)]
+    parser.feed(frame[len(frame) // 2:] + frame)
+    assert drain(parser) == [(AUDIO_TYPE, b'\x03' * 320)] * 2
+    assert parser.capacity == capacity
+
+
+def test_writable_and_commit():
+    frame = packet(AUDIO_TYPE, b'\x04' * 160)
+    parser = AudioSocketParser(capacity=64)
+    tail = parser.writable(len(frame))
+    assert len(tail) >= len(frame)
+    tail[:len(frame)] = frame
+    parser.commit(len(frame))
+    assert drain(parser) == [(AUDIO_TYPE, b'\x04' * 160)]
+
+
+def test_buffer_grows_for_long_packet():
+    payload = bytes(range(256)) * 40
+    parser = AudioSocketParser(capacity=1024)
+    assert feed_in_chunks(parser, packet(AUDIO_TYPE, payload), 700) == [
+        (AUDIO_TYPE, payload)]
+    assert parser.capacity >= len(payload) + READER_HEADER_SIZE
+
+
+def test_buffer_limit():
+    parser = AudioSocketParser(capacity=1024)
+    with pytest.raises(BufferError):
+        parser.feed(bytes(PARSER_MAX_BUFFER_SIZE + 1))
@@ -0,0 +1,110 @@
+"""Исходящий поток звонка: переполнение буфера и медленный транспорт."""
+import asyncio
+import time
+
+import pytest
+
+from src.constants import DRAIN_CHUNK_SIZE, PLAYOUT_WRITE_HIGH_WATER
+from src.playout import PlayoutScheduler, PlayoutStream
+
+FRAME = DRAIN_CHUNK_SIZE
+
+
+class FakeTransport:
+    def __init__(self):
+        self.packets = []
+        self.write_buffer = 0
+
+    def writelines(self, packets):
+        self.packets.extend(packets)
+
+    def is_closing(self):
+        return False
+
+    def get_write_buffer_size(self):
+        return self.write_buffer
+
+
+def frames(*values: int) -> bytes:
+    """Фреймы PCM, каждый заполнен своим байтом — чтобы различать."""
+    return b''.join(bytes([value]) * FRAME for value in values)
+
+
+def payloads(transport: FakeTransport) -> list[int]:
+    return [packet[-1] for packet in transport.packets]
+
+
+def service(stream: PlayoutStream, ticks: int) -> None:
+    scheduler = PlayoutScheduler()
+    for tick in range(ticks):
+        stream.service(tick, scheduler, time.monotonic())
+
+
+def test_slow_transport_drops_frames_instead_of_buffering():
+    transport = FakeTransport()
+    stream = PlayoutStream(transport)
+    stream.feed(frames(1, 2, 3, 4))
+    scheduler = PlayoutScheduler()
+    stream.service(0, scheduler, time.monotonic())
+    transport.write_buffer = PLAYOUT_WRITE_HIGH_WATER + 1
+    stream.service(1, scheduler, time.monotonic())
+    stream.service(2, scheduler, time.monotonic())
+    transport.write_buffer = 0
+    stream.service(3, scheduler, time.monotonic())
+    # Фреймы 2 и 3 выброшены на своих тиках, часы потока не отстали
+    assert payloads(transport) == [1, 4]
+    assert stream.stats.backlog_drops == 2
+    assert stream.bytes_consumed == 4 * FRAME
+
+
+def test_drop_oldest_keeps_newest_audio():
+    stream = PlayoutStream(FakeTransport(), capacity=3 * FRAME,
+                           overflow='drop_oldest')
+    stream.feed(frames(1, 2, 3))
+    stream.feed(frames(4, 5))
+    assert stream.buffer.read(5 * FRAME) == frames(3, 4, 5)
+    assert stream.stats.dropped_bytes == 2 * FRAME
+    # Позиция воспроизведения учитывает выброшенное
+    assert stream.bytes_dropped == 2 * FRAME
+
+
+def test_drop_oldest_longer_than_buffer():
+    stream = PlayoutStream(FakeTransport(), capacity=2 * FRAME,
+                           overflow='drop_oldest')
+    stream.feed(frames(1, 2, 3, 4))
+    assert stream.buffer.read(4 * FRAME) == frames(3, 4)
+    assert stream.bytes_fed == 4 * FRAME
+
+
+def test_pause_waits_for_room():
+    async def scenario():
+        transport = FakeTransport()
+        stream = PlayoutStream(transport, capacity=2 * FRAME,
+                               overflow='pause')
+        put = asyncio.create_task(stream.put(frames(1, 2, 3)))
+        await asyncio.sleep(0)
+        assert not put.done()
+        assert stream.stats.pauses == 1
+        service(stream, 1)
+        await asyncio.wait_for(put, 1)
+        service(stream, 3)
+        assert payloads(transport) == [1, 2, 3]
+        assert stream.stats.dropped_bytes == 0
+    asyncio.run(scenario())
+
+
+def test_pause_abandons_audio_after_clear():
+    async def scenario():
+        stream = PlayoutStream(FakeTransport(), capacity=FRAME,
+                               overflow='pause')
+        put = asyncio.create_task(stream.put(frames(1, 2)))
+        await asyncio.sleep(0)
+        stream.clear()
+        await asyncio.wait_for(put, 1)
+        assert not stream.buffer
+    asyncio.run(scenario())
+
+
+def test_unknown_overflow_policy():
+    with pytest.raises(ValueError):
+        PlayoutStream(FakeTransport(), overflow='block')
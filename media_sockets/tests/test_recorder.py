@@ -0,0 +1,28 @@
+"""Поток записи звонков переживает ошибки на отдельных фреймах."""
+import time
+import wave
+
+from src import codec, recorder
+from src.recorder import BOT, RecordingWriter
+
+FRAME = bytes([codec.ALAW_SILENCE]) * 160
+
+
+def test_bad_frame_does_not_stop_writer(tmp_path, monkeypatch):
+    monkeypatch.setattr(recorder, 'RECORDING_DIR', str(tmp_path))
+    writer = RecordingWriter()
+
+    broken = writer.start_recording('broken')
+    # Фрейм, на котором падает запись в файл
+    writer.submit(broken, BOT, time.monotonic(), None)
+    broken.close()
+
+    good = writer.start_recording('good')
+    for _ in range(10):
+        good.caller(FRAME)
+    good.close()
+    writer.stop()
+
+    assert writer.stats.errors == 1
+    with wave.open(good.path, 'rb') as wav:
+        assert wav.getnframes() >= 10 * len(FRAME)